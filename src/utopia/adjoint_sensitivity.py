@@ -0,0 +1,157 @@
+# This file contains the adjoint (derivative-based) sensitivities of the steady state results: the derivatives of a scalar output with respect to every rate constant and every emission are obtained with one solve of the transposed mass balance reusing the LU factorization of the interactions matrix
+
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+from utopia.preprocessing.fill_interactions_df import (
+    eliminationProcesses,
+    interaction_pairs,
+    interaction_rate,
+)
+
+
+def output_weights_vector(model, output):
+    """Weights (in the order of SpeciesList) of a scalar output defined as a weighted sum of the steady state mass (g) of the species. output can be a compartment name (total mass in that compartment), a list of species codes (their total mass), a dictionary of weights by species code or an array of weights of every species"""
+    species_index = model.species_index
+
+    if isinstance(output, str):
+        if output not in species_index.compartment_names:
+            raise ValueError(f"Unknown compartment: {output}")
+        return (
+            species_index.compartment == species_index.compartment_names.index(output)
+        ).astype(float)
+
+    if isinstance(output, dict):
+        weights = np.zeros(len(model.SpeciesList))
+        weights[species_index.positions(list(output))] = list(output.values())
+        return weights
+
+    output = np.asarray(output)
+    if output.dtype.kind in "OU":
+        weights = np.zeros(len(model.SpeciesList))
+        weights[species_index.positions(output)] = 1.0
+        return weights
+
+    if output.shape != (len(model.SpeciesList),):
+        raise ValueError(
+            f"The output weights must have one value per species ({len(model.SpeciesList)})"
+        )
+    return output.astype(float)
+
+
+def solve_adjoint(model, weights):
+    """Solves the adjoint (transposed) steady state mass balance K^T·λ = w for the weights of a scalar output, reusing the LU factorization of the interactions matrix of the model (see utopiaModel.factorize_interactions)"""
+    return model.factorize_interactions().solve(np.asarray(weights, dtype=float), trans="T")
+
+
+def rate_constant_entries(RateConstants):
+    """(rate constant name, position) of every entry of the RateConstants dictionary of a particle (position is the index of the value in the lists of rate constants such as k_fragmentation and None for scalar rate constants)"""
+    entries = []
+    for name, value in RateConstants.items():
+        if type(value) in [list, tuple]:
+            entries += [(name, position) for position in range(len(value))]
+        else:
+            entries.append((name, None))
+    return entries
+
+
+def unit_rate_constants(RateConstants, name, position):
+    """Copy of the RateConstants dictionary of a particle with all the values set to zero except the entry (name, position), set to one"""
+    unit = {
+        k: [0] * len(v) if type(v) in [list, tuple] else 0
+        for k, v in RateConstants.items()
+    }
+    if position is None:
+        unit[name] = 1
+    else:
+        unit[name][position] = 1
+    return unit
+
+
+def interactions_column_derivatives(
+    sp2, receiving_particles, receiving_pairs, surfComp_list
+):
+    """Derivatives of the column of the interactions matrix of the emitting species sp2 with respect to each entry of its rate constants. The interactions matrix is linear in the rate constants, so the derivatives are the column assembled with each entry set to one and the others to zero. Returns a list of ((name, position), diagonal derivative, off-diagonal derivatives in the order of receiving_pairs)"""
+    RateConstants = sp2.RateConstants
+    derivatives = []
+    try:
+        for name, position in rate_constant_entries(RateConstants):
+            sp2.RateConstants = unit_rate_constants(RateConstants, name, position)
+            diagonal = eliminationProcesses([sp2], [sp2.Pcode])[0]
+            off_diagonal = [
+                interaction_rate(sp1, sp2, inbox, surfComp_list)
+                for sp1, (_, _, inbox) in zip(receiving_particles, receiving_pairs)
+            ]
+            derivatives.append(((name, position), diagonal, off_diagonal))
+    finally:
+        sp2.RateConstants = RateConstants
+    return derivatives
+
+
+def adjoint_sensitivities(model, output):
+    """Derivatives of a scalar output of the steady state (a weighted sum of the mass of the species, see output_weights_vector) with respect to every entry of the RateConstants of every particle and to the emission (g/s) of every species, from one solve of the transposed mass balance. As K·m = -e, with K^T·λ = w the derivatives are dJ/dk = -λ^T·(dK/dk)·m and dJ/de = -λ. The model has to be run with a steady state solver first.
+
+    Returns
+    -------
+    rate_constants_sensitivities : pandas.DataFrame
+        One row per rate constant entry with the species code, compartment, rate constant name, position in the list of rate constants (-1 for scalar rate constants), value, derivative of the output and normalised sensitivity (elasticity: relative change of the output per relative change of the rate constant).
+    emissions_sensitivities : pandas.Series
+        Derivative of the output (g) with respect to the emission of every species (g/s), indexed by species code.
+    """
+    if getattr(model, "R", None) is None:
+        raise ValueError("The model has to be run (steady state) before estimating sensitivities")
+
+    particles = model.system_particle_object_list
+    surfComp_list = [c for c in model.dict_comp if "Surface" in c]
+
+    weights = output_weights_vector(model, output)
+    mass = model.R["mass_g"].to_numpy(dtype=float)
+    output_value = weights @ mass
+    adjoint = solve_adjoint(model, weights)
+
+    pairs_by_emitter = defaultdict(list)
+    for pair in interaction_pairs(particles):
+        pairs_by_emitter[pair[1]].append(pair)
+
+    rows = {
+        "species": [],
+        "Compartment": [],
+        "rate_constant": [],
+        "position": [],
+        "value": [],
+        "derivative": [],
+    }
+    for j, sp2 in enumerate(particles):
+        receiving_pairs = pairs_by_emitter[j]
+        receiving = np.array([i for i, _, _ in receiving_pairs], dtype=int)
+        receiving_particles = [particles[i] for i in receiving]
+
+        for (name, position), diagonal, off_diagonal in interactions_column_derivatives(
+            sp2, receiving_particles, receiving_pairs, surfComp_list
+        ):
+            value = sp2.RateConstants[name]
+            if position is not None:
+                value = value[position]
+            rows["species"].append(sp2.Pcode)
+            rows["Compartment"].append(sp2.Pcompartment.Cname)
+            rows["rate_constant"].append(name)
+            rows["position"].append(-1 if position is None else position)
+            rows["value"].append(0 if value is None else value)
+            rows["derivative"].append(
+                -mass[j]
+                * (diagonal * adjoint[j] + np.dot(off_diagonal, adjoint[receiving]))
+            )
+
+    rate_constants_sensitivities = pd.DataFrame(rows)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate_constants_sensitivities["elasticity"] = (
+            rate_constants_sensitivities["value"]
+            * rate_constants_sensitivities["derivative"]
+            / output_value
+        )
+
+    emissions_sensitivities = pd.Series(
+        -adjoint, index=model.SpeciesList, name="derivative"
+    )
+
+    return rate_constants_sensitivities, emissions_sensitivities
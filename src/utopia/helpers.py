@@ -1,11 +1,21 @@
+import itertools
+import string
 import numpy as np
 import pandas as pd
 
 
-def generate_fsd_matrix(FI):
+def generate_size_codes(N_sizeBins):
+    """Size codes of the size bins used in the species codes (e.g. "eA0_Utopia"): one letter per size bin (a-z) or two letters (aa, ab...) when there are more than 26 size bins"""
+    letters = string.ascii_lowercase
+    if N_sizeBins <= len(letters):
+        return list(letters[:N_sizeBins])
+    return ["".join(c) for c in itertools.product(letters, repeat=2)][:N_sizeBins]
+
+
+def generate_fsd_matrix(FI, N_sizeBins=5):
     # function to generate the FSD matrix (generates a fragemntation matrix based on the selected fragmentation style determined by FI)
-    # Initialize a 5x5 matrix with zeros
-    matrix = np.zeros((5, 5))
+    # Rows are the fragmenting size bins and columns the recieving ones (the smallest size bin first). The distribution of the first five size bins is given by the fragmentation style, larger size bins keep the distribution of the fifth one shifted to the size bins just below them (mass to the smallest size bin and to the three next smaller size bins)
+    matrix = np.zeros((max(N_sizeBins, 5), max(N_sizeBins, 5)))
     c1 = 0.2
     c2 = 0.15
     c3 = 0.1
@@ -26,7 +36,32 @@ def generate_fsd_matrix(FI):
     matrix[4, 0] = matrix[3, 0] + (0.5 * matrix[4, 1]) + (0.25 * matrix[4, 2])
     matrix[4, 3] = 1 - matrix[4, 0] - matrix[4, 1] - matrix[4, 2]
 
-    return matrix
+    rows = np.arange(5, N_sizeBins)
+    matrix[rows, 0] = matrix[4, 0]
+    matrix[rows, rows - 3] = matrix[4, 1]
+    matrix[rows, rows - 2] = matrix[4, 2]
+    matrix[rows, rows - 1] = matrix[4, 3]
+
+    return matrix[:N_sizeBins, :N_sizeBins]
+
+
+def object_attributes(obj):
+    """Dictionary of the attributes of an object, including those stored in __slots__ (e.g. particle and compartment objects)"""
+    attributes = dict(getattr(obj, "__dict__", {}))
+    for cls in type(obj).__mro__:
+        for name in cls.__dict__.get("__slots__", ()):
+            if name not in attributes and hasattr(obj, name):
+                attributes[name] = getattr(obj, name)
+    return attributes
+
+
+def number_particle(p):
+    """Particle object whose volume and density convert the mass of particle p to particle number: the particle itself for free and biofouled microplastics and the free microplastic for the heteroaggregated ones (heterMP and heterBiofMP)"""
+    if "SPM" in p.Pname:
+        if "BF" in p.Pname:
+            return p.parentMP.parentMP
+        return p.parentMP
+    return p
 
 
 # function to convert mass to number
@@ -42,6 +77,14 @@ def num_to_mass(number, volume_m3, density_kg_m3):
     return mass_g
 
 
+def effective_volume_density(system_particle_object_list):
+    """Arrays of the volume (m3) and density (kg/m3) used to convert mass into particle number for each particle in the system, those of its number_particle"""
+    number_particles = [number_particle(p) for p in system_particle_object_list]
+    volume_m3 = np.array([p.Pvolume_m3 for p in number_particles], dtype=float)
+    density_kg_m3 = np.array([p.Pdensity_kg_m3 for p in number_particles], dtype=float)
+    return volume_m3, density_kg_m3
+
+
 # Function to handle summing lists and individual elements
 def handle_value(value):
     if isinstance(value, list):
@@ -0,0 +1,283 @@
+# This file contains the incremental update of a model after a change of some input parameters: the dependencies of the rate constants of each process on the model inputs and of the interactions matrix entries on the processes are tracked so that only the affected rate constants are recomputed and only the affected matrix entries are patched
+
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from utopia.objects.particle_table import ParticleTable
+import utopia.preprocessing.RC_generator as RC_generator
+import utopia.preprocessing.RC_generator_vectorized as RC_generator_vectorized
+from utopia.preprocessing.generate_rate_constants import rate_constant_value
+from utopia.preprocessing.fill_interactions_df import (
+    eliminationProcesses,
+    interaction_pairs,
+    interaction_rate,
+)
+
+# Input parameters that change the properties of the particle objects (the inputs of the rate constant functions given by particle_arrays) instead of a model attribute
+particle_property_parameters = {"MPdensity_kg_m3": ["Pdensity_kg_m3"]}
+
+
+def update_particle_densities(model):
+    """Updates in place the density of the particle objects of the model after a change of the microplastics density (MPdensity_kg_m3): the density of the free MPs is set and the density of the biofouled and heteroaggregated particles recalculated from their parent particles"""
+
+    def set_density(p):
+        if hasattr(p, "parentMP"):
+            set_density(p.parentMP)
+            p.calc_density()
+        else:
+            p.Pdensity_kg_m3 = model.MPdensity_kg_m3
+
+    for p in model.system_particle_object_list:
+        set_density(p)
+    model.particles_df["density_kg_m3"] = model.MPdensity_kg_m3
+    model.particle_table = ParticleTable.from_particles(
+        model.system_particle_object_list, model.species_index, model.MPforms_list
+    )
+
+
+def updatable_parameters(model):
+    """Input parameters (data keys) that can be changed in a model that has already been built: the numeric inputs read by the rate constant functions (see process_dependencies) and those that change the particle properties (see particle_property_parameters). The other inputs (e.g. MP_composition or emiss_dict_g_s) require building a new model"""
+    if getattr(model, "process_dependencies", None) is None:
+        model.process_dependencies = process_dependencies(model)
+    reads = set().union(*model.process_dependencies.values())
+
+    return [
+        parameter
+        for parameter, value in model.data.items()
+        if (parameter in reads or parameter in particle_property_parameters)
+        and isinstance(value, (int, float))
+        and not isinstance(value, bool)
+    ]
+
+
+def set_parameters(model, parameters):
+    """Sets the values of model input parameters (data keys, see updatable_parameters) in the model data and attributes. The model data dictionary is copied before it is changed so the data given to the model is not modified"""
+    updatable = updatable_parameters(model)
+    values = {}
+    for parameter, value in parameters.items():
+        if parameter not in model.data:
+            raise KeyError(f"Unknown model parameter: {parameter}")
+        if parameter not in updatable:
+            raise ValueError(
+                f"The model parameter {parameter} cannot be updated without building a new model. Parameters that can be updated: {', '.join(updatable)}"
+            )
+        try:
+            values[parameter] = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(
+                f"The value of the model parameter {parameter} must be a number, got {value!r}"
+            ) from None
+
+    model.data = dict(model.data)
+    for parameter, value in values.items():
+        model.data[parameter] = value
+        setattr(model, parameter, value)
+
+    if "MPdensity_kg_m3" in parameters:
+        update_particle_densities(model)
+
+
+class RecordingModel:
+    """Proxy of a model that records the names of the attributes read through it (e.g. by the rate constant functions)"""
+
+    def __init__(self, model):
+        self._model = model
+        self.reads = set()
+
+    def __getattr__(self, name):
+        self.reads.add(name)
+        return getattr(self._model, name)
+
+
+class RecordingArrays(dict):
+    """Dictionary of particle arrays (see particle_arrays) that records the keys read from it"""
+
+    def __init__(self, arrays):
+        super().__init__(arrays)
+        self.reads = set()
+
+    def __getitem__(self, key):
+        self.reads.add(key)
+        return super().__getitem__(key)
+
+
+def model_processes(model):
+    """Processes of the compartments of the model in order of appearance"""
+    processes = []
+    for particle in model.system_particle_object_list:
+        for proc in particle.Pcompartment.processess:
+            if proc not in processes:
+                processes.append(proc)
+    return processes
+
+
+def process_dependencies(model):
+    """Model attributes (input parameters such as t_half_deg_free or FI, config, compartments...) and particle properties read by the rate constant function of each process, recorded by evaluating the functions of RC_generator_vectorized once. Returns a dictionary {process: set of names}"""
+    p = RC_generator_vectorized.particle_arrays(model)
+
+    dependencies = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for proc in model_processes(model):
+            recording_model = RecordingModel(model)
+            recording_arrays = RecordingArrays(p)
+            getattr(RC_generator_vectorized, proc)(recording_arrays, recording_model)
+            dependencies[proc] = recording_model.reads | recording_arrays.reads
+
+    return dependencies
+
+
+def parameter_processes(model, parameters):
+    """Processes whose rate constants depend on any of the given input parameters (data keys)"""
+    if getattr(model, "process_dependencies", None) is None:
+        model.process_dependencies = process_dependencies(model)
+
+    names = set(parameters)
+    for parameter in parameters:
+        names.update(particle_property_parameters.get(parameter, []))
+
+    return [
+        proc
+        for proc, reads in model.process_dependencies.items()
+        if reads & names or "data" in reads
+    ]
+
+
+def process_matrix_entries(model):
+    """Off-diagonal entries of the interactions matrix populated by the rate constants of each process. As the matrix is linear in the rate constants, the entries of a process are the nonzero entries of the column of the emitting particle assembled with the rate constants of the process set to one and the others to zero. Returns a dictionary {process: {emitting position: [(receiving position, inbox)]}} (inbox as in interaction_pairs)"""
+    particles = model.system_particle_object_list
+    surfComp_list = [c for c in model.dict_comp if "Surface" in c]
+
+    pairs_by_emitter = defaultdict(list)
+    for i, j, inbox in interaction_pairs(particles):
+        pairs_by_emitter[j].append((i, inbox))
+
+    entries = defaultdict(dict)
+    for j, sp2 in enumerate(particles):
+        RateConstants = sp2.RateConstants
+        try:
+            for name in RateConstants:
+                sp2.RateConstants = {
+                    k: (
+                        [int(k == name)] * len(v)
+                        if type(v) in [list, tuple]
+                        else int(k == name)
+                    )
+                    for k, v in RateConstants.items()
+                }
+                receiving = [
+                    (i, inbox)
+                    for i, inbox in pairs_by_emitter[j]
+                    if interaction_rate(particles[i], sp2, inbox, surfComp_list) != 0
+                ]
+                if receiving:
+                    entries[name[2:]][j] = receiving
+        finally:
+            sp2.RateConstants = RateConstants
+
+    return dict(entries)
+
+
+def update_rate_constants(model, processes):
+    """Recomputes the rate constants of the given processes for all the particles of the model (with the rate constants engine of the model). Returns a dictionary {particle position: set of processes whose rate constants changed}"""
+    particles = model.system_particle_object_list
+    changed = defaultdict(set)
+
+    if model.rate_constants_engine == "loop":
+        for j, particle in enumerate(particles):
+            for proc in processes:
+                if proc in particle.Pcompartment.processess:
+                    k = getattr(RC_generator, proc)(particle, model)
+                    if k != particle.RateConstants["k_" + proc]:
+                        particle.RateConstants["k_" + proc] = k
+                        changed[j].add(proc)
+    else:
+        p = RC_generator_vectorized.particle_arrays(model)
+        for proc in processes:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                k_array = getattr(RC_generator_vectorized, proc)(p, model)
+            model.rate_constants_arrays["k_" + proc] = k_array
+            for j, particle in enumerate(particles):
+                if proc in particle.Pcompartment.processess:
+                    k = rate_constant_value(k_array[j])
+                    if k != particle.RateConstants["k_" + proc]:
+                        particle.RateConstants["k_" + proc] = k
+                        changed[j].add(proc)
+
+    return dict(changed)
+
+
+def matrix_entry_positions(matrix):
+    """Position in the data array of a CSR matrix of each stored entry ({(row, column): position})"""
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    return dict(zip(zip(rows.tolist(), matrix.indices.tolist()), range(matrix.nnz)))
+
+
+def set_matrix_entries(model, values):
+    """Writes new values ({(receiving position, emitting position): value}) into the interactions matrix of the model: in place in the stored entries of the sparse matrix (entries that were zero and are not stored are added to a new matrix) and in the dense or sparse-backed interactions dataframe"""
+    matrix = getattr(model, "interactions_matrix", None)
+    if matrix is not None:
+        if getattr(model, "interactions_matrix_positions", (None,))[0] is not matrix:
+            model.interactions_matrix_positions = (
+                matrix,
+                matrix_entry_positions(matrix),
+            )
+        positions = model.interactions_matrix_positions[1]
+
+        new_entries = {}
+        for entry, value in values.items():
+            position = positions.get(entry)
+            if position is not None:
+                matrix.data[position] = value
+            elif value != 0:
+                new_entries[entry] = value
+
+        if new_entries:
+            rows, cols = zip(*new_entries)
+            model.interactions_matrix = (
+                matrix
+                + sparse.csr_matrix(
+                    (list(new_entries.values()), (rows, cols)), shape=matrix.shape
+                )
+            ).tocsr()
+
+    if model.matrix_assembly == "sparse":
+        model.interactions_df = pd.DataFrame.sparse.from_spmatrix(
+            model.interactions_matrix, index=model.SpeciesList, columns=model.SpeciesList
+        )
+    else:
+        for (i, j), value in values.items():
+            model.interactions_df.iat[i, j] = value
+
+
+def patch_interactions_matrix(model, changed):
+    """Recomputes the entries of the interactions matrix affected by the rate constants that changed ({particle position: set of processes}, see update_rate_constants): the diagonal (losses) of each changed particle and the entries populated by its changed processes (see process_matrix_entries). The LU factorization and the exponential propagator of the model are discarded."""
+    if getattr(model, "process_matrix_entries", None) is None:
+        model.process_matrix_entries = process_matrix_entries(model)
+
+    particles = model.system_particle_object_list
+    surfComp_list = [c for c in model.dict_comp if "Surface" in c]
+
+    values = {}
+    for j, processes in changed.items():
+        sp2 = particles[j]
+        values[(j, j)] = eliminationProcesses([sp2], [sp2.Pcode])[0]
+        for proc in processes:
+            for i, inbox in model.process_matrix_entries.get(proc, {}).get(j, []):
+                values[(i, j)] = interaction_rate(
+                    particles[i], sp2, inbox, surfComp_list
+                )
+
+    set_matrix_entries(model, values)
+    model.interactions_lu = None
+    model.exponential_propagator = None
+
+    return values
+
+
+def update_parameters(model, parameters):
+    """Updates the rate constants and the interactions matrix of a model that has already been built after a change of some input parameters ({data key: value}): only the processes that depend on the changed parameters are recomputed (see process_dependencies) and only the matrix entries populated by the rate constants that changed are patched. Returns the dictionary of particle positions and processes whose rate constants changed"""
+    set_parameters(model, parameters)
+    changed = update_rate_constants(model, parameter_processes(model, parameters))
+    patch_interactions_matrix(model, changed)
+    return changed
@@ -0,0 +1,153 @@
+# This file contains the cache of model objects and interaction matrices: models whose inputs only differ in their emissions (or exact repeats) reuse the particle objects, rate constants, interactions matrix and its factorization of a previous run instead of regenerating them
+
+import hashlib
+import json
+import pickle
+from collections import OrderedDict
+from pathlib import Path
+
+# Version of the cached entries (to be increased when the model objects or the assembly of the interactions matrix change so that on-disk entries of older versions are not reused)
+CACHE_VERSION = 2
+
+# Config keys that control the cache or the console output and do not affect the model objects
+cache_config_keys = ["use_cache", "cache_size", "cache_dir", "print_particles"]
+
+# Data keys of the emissions (they do not affect the rate constants nor the interactions matrix)
+emission_data_keys = ["emiss_dict_g_s", "emission_schedule"]
+
+# Model attributes generated by generate_objects, the rate constants generators and the assembly of the interactions matrix that are stored in the cache
+cached_objects = [
+    "system_particle_object_list",
+    "SpeciesList",
+    "spm",
+    "dict_comp",
+    "particles_properties_df",
+    "species_index",
+    "particle_table",
+    "rate_constants_arrays",
+]
+
+
+def model_inputs_key(model):
+    """Canonical hash (sha256) of every input of the model that affects the rate constants and the interactions matrix: the config (without the cache options), the data without the emissions and the contents of the compartments input files (and of the box connectivity file in the spatial version)"""
+    config = {k: v for k, v in model.config.items() if k not in cache_config_keys}
+    data = {k: v for k, v in model.data.items() if k not in emission_data_keys}
+
+    digest = hashlib.sha256()
+    digest.update(
+        json.dumps(
+            {"version": CACHE_VERSION, "config": config, "data": data},
+            sort_keys=True,
+            default=str,
+        ).encode()
+    )
+
+    input_files = [model.comp_input_file_name, model.comp_interactFile_name]
+    if isinstance(model.box_connectivity, (str, Path)):
+        input_files.append(model.box_connectivity)
+    for file_name in input_files:
+        digest.update(str(file_name).encode())
+        digest.update((model.base_path / file_name).read_bytes())
+
+    return digest.hexdigest()
+
+
+class InteractionsCache:
+    """Least recently used cache of model objects (pickled particle objects, compartments, species list and index and rate constants), interaction matrices and their sparse LU factorization, keyed on the hash of the model inputs (see model_inputs_key). Entries are kept in memory (at most maxsize entries) and, if cache_dir is given, also written to disk as pickle files (without the factorization, which cannot be pickled and is recomputed when needed)."""
+
+    def __init__(self, maxsize=16, cache_dir=None):
+        self.maxsize = maxsize
+        self.cache_dir = None if cache_dir is None else Path(cache_dir)
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries or (
+            self.cache_dir is not None and self.entry_path(key).exists()
+        )
+
+    def entry_path(self, key):
+        return self.cache_dir / f"{key}.pkl"
+
+    def get(self, key):
+        """Cached entry of a key (moved to the end of the LRU order) or None if it is neither in memory nor on disk"""
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+
+        if self.cache_dir is not None and self.entry_path(key).exists():
+            with open(self.entry_path(key), "rb") as f:
+                entry = pickle.load(f)
+            entry["interactions_lu"] = None
+            self.add(key, entry)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        return None
+
+    def add(self, key, entry):
+        """Adds an entry to the memory cache evicting the least recently used entries"""
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def put(self, key, model):
+        """Stores the objects and (a copy of the) interactions matrix of a model (after the assembly of the interactions matrix and before solving it). Returns the new entry"""
+        entry = {
+            "objects": pickle.dumps(
+                {name: getattr(model, name, None) for name in cached_objects},
+                protocol=pickle.HIGHEST_PROTOCOL,
+            ),
+            "interactions_matrix": copy_or_none(
+                getattr(model, "interactions_matrix", None)
+            ),
+            "interactions_df": model.interactions_df.copy(),
+            "interactions_lu": None,
+        }
+        self.add(key, entry)
+
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            disk_entry = {k: v for k, v in entry.items() if k != "interactions_lu"}
+            with open(self.entry_path(key), "wb") as f:
+                pickle.dump(disk_entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        return entry
+
+    def clear(self):
+        """Empties the memory cache (the on-disk entries are kept)"""
+        self.entries.clear()
+
+
+# Caches of the process by cache directory (None for the memory only cache)
+_caches = {}
+
+
+def get_cache(config):
+    """Cache selected by the config keys "cache_size" (maximum number of entries kept in memory, 16 by default) and "cache_dir" (optional directory of on-disk entries)"""
+    cache_dir = config.get("cache_dir")
+    if cache_dir not in _caches:
+        _caches[cache_dir] = InteractionsCache(cache_dir=cache_dir)
+    cache = _caches[cache_dir]
+    cache.maxsize = config.get("cache_size", cache.maxsize)
+    return cache
+
+
+def restore_from_cache(model, entry):
+    """Sets the objects and interactions matrix of a cache entry as model attributes. The particle objects are unpickled and the matrices copied for each model so that the results and incremental updates (see incremental_update) of different models do not overwrite each other; the factorization is shared"""
+    for name, value in pickle.loads(entry["objects"]).items():
+        setattr(model, name, value)
+    model.interactions_matrix = copy_or_none(entry["interactions_matrix"])
+    model.interactions_df = entry["interactions_df"].copy()
+    model.interactions_lu = entry["interactions_lu"]
+
+
+def copy_or_none(matrix):
+    return None if matrix is None else matrix.copy()
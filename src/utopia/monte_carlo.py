@@ -0,0 +1,175 @@
+# This file contains the Monte Carlo uncertainty engine: samples of the model input parameters are evaluated in parallel reusing the model objects of each worker
+
+import os
+import copy
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from scipy import stats
+from scipy.sparse import linalg as sparse_linalg
+from utopia.utopia import utopiaModel
+from utopia.preprocessing.generate_rate_constants import (
+    generate_rate_constants,
+    generate_rate_constants_vectorized,
+)
+from utopia.preprocessing.fill_interactions_df import fillInteractions_fun_OOP_sparse
+from utopia.solver_steady_state import emission_scenarios_array, solve_SS_scenarios
+from utopia.incremental_update import set_parameters
+
+
+def sample_parameters(distributions, n_samples, seed=None):
+    """Draws n_samples values of each model input parameter (data keys such as t_half_deg_free, FI or MPdensity_kg_m3) from its distribution. A distribution can be a frozen scipy.stats distribution, a dictionary with the name of a scipy.stats distribution and its parameters (e.g. {"distribution": "uniform", "loc": 0, "scale": 1}) or a sequence of n_samples values. Returns a dataframe (samples x parameters)."""
+    rng = np.random.default_rng(seed)
+
+    samples = {}
+    for parameter, distribution in distributions.items():
+        if isinstance(distribution, dict):
+            kwargs = dict(distribution)
+            distribution = getattr(stats, kwargs.pop("distribution"))(**kwargs)
+        if hasattr(distribution, "rvs"):
+            values = distribution.rvs(size=n_samples, random_state=rng)
+        else:
+            values = np.asarray(distribution, dtype=float)
+            if len(values) != n_samples:
+                raise ValueError(
+                    f"{len(values)} values given for {parameter}, {n_samples} samples requested"
+                )
+        samples[parameter] = values
+
+    return pd.DataFrame(samples)
+
+
+def factorize_sample(model, parameters):
+    """LU factorization of the interactions matrix of the model for one set of parameter values, reusing the objects (compartments and particles) of a model that has already been run: only the rate constants and the interactions matrix are recomputed"""
+    set_parameters(model, parameters)
+
+    if model.rate_constants_engine == "loop":
+        generate_rate_constants(model)
+    else:
+        generate_rate_constants_vectorized(model)
+
+    interactions_matrix, _ = fillInteractions_fun_OOP_sparse(
+        model.system_particle_object_list, model.SpeciesList, model.dict_comp
+    )
+    return sparse_linalg.splu(interactions_matrix.tocsc())
+
+
+def evaluate_sample(model, parameters, emissions=None):
+    """Steady state mass (g) of every species (in the order of SpeciesList) for one set of parameter values (see factorize_sample). emissions can be a precomputed emission vector or 2-D array (species x scenarios, g/s), by default the model emissions."""
+    lu_factorization = factorize_sample(model, parameters)
+
+    if emissions is None:
+        emissions = emission_scenarios_array(model, [model.emiss_dict_g_s])[:, 0]
+
+    return solve_SS_scenarios(lu_factorization, emissions)
+
+
+# Warmed-up model of each worker process (built once by the pool initializer)
+_worker_model = None
+_worker_emissions = None
+
+
+def _init_worker(config, data):
+    global _worker_model, _worker_emissions
+    _worker_model = utopiaModel(config=copy.deepcopy(config), data=copy.deepcopy(data))
+    _worker_model.run()
+    _worker_emissions = emission_scenarios_array(
+        _worker_model, [_worker_model.emiss_dict_g_s]
+    )[:, 0]
+
+
+def _evaluate_chunk(indices, parameters_list):
+    masses = np.array(
+        [
+            evaluate_sample(_worker_model, parameters, _worker_emissions)
+            for parameters in parameters_list
+        ]
+    )
+    return indices, masses
+
+
+class MonteCarloResults:
+    """Results of a Monte Carlo run: the parameter samples (dataframe samples x parameters) and the steady state mass (g) of every species for every sample in a preallocated 2-D array (samples x species, in the order of SpeciesList) that can be memory-mapped to a .npy file."""
+
+    def __init__(self, samples, mass_g, SpeciesList, species_index):
+        self.samples = samples
+        self.mass_g = mass_g
+        self.SpeciesList = SpeciesList
+        self.species_index = species_index
+
+    def mass_by_compartment(self):
+        """Total mass (g) per compartment for every sample (dataframe samples x compartments)"""
+        compartments = self.species_index.compartment_names
+        mass_comp = np.zeros((self.mass_g.shape[0], len(compartments)))
+        for c in range(len(compartments)):
+            mass_comp[:, c] = self.mass_g[:, self.species_index.compartment == c].sum(
+                axis=1
+            )
+        return pd.DataFrame(mass_comp, index=self.samples.index, columns=compartments)
+
+    def to_dataframe(self):
+        """Mass of every species for every sample as a dataframe (samples x species)"""
+        return pd.DataFrame(
+            np.asarray(self.mass_g), index=self.samples.index, columns=self.SpeciesList
+        )
+
+
+def run_monte_carlo(
+    samples,
+    config=None,
+    data=None,
+    n_workers=None,
+    chunk_size=None,
+    output_file=None,
+):
+    """Runs the model for every sample of parameter values (dataframe samples x parameters, see sample_parameters) across a pool of n_workers processes (by default the number of CPUs, 1 runs the samples in the current process). Each worker builds and runs the model once (config and data dictionaries, by default the package defaults) and then only recomputes the rate constants, interactions matrix and steady state for its samples. The results of each chunk of samples are written as they arrive into a preallocated array (samples x species), memory-mapped to output_file (.npy) if given. Returns a MonteCarloResults object."""
+    samples = pd.DataFrame(samples).reset_index(drop=True)
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+
+    # Species of the model (the model run also checks the inputs before starting the workers)
+    _init_worker(config, data)
+    model = _worker_model
+
+    shape = (len(samples), len(model.SpeciesList))
+    if output_file is None:
+        mass_g = np.empty(shape)
+    else:
+        mass_g = np.lib.format.open_memmap(
+            output_file, mode="w+", dtype=float, shape=shape
+        )
+
+    parameters_list = samples.to_dict(orient="records")
+    if chunk_size is None:
+        chunk_size = max(1, int(np.ceil(len(samples) / (4 * n_workers))))
+    chunks = [
+        np.arange(start, min(start + chunk_size, len(samples)))
+        for start in range(0, len(samples), chunk_size)
+    ]
+
+    if n_workers <= 1:
+        for indices in chunks:
+            indices, masses = _evaluate_chunk(
+                indices, [parameters_list[i] for i in indices]
+            )
+            mass_g[indices] = masses
+    else:
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            initializer=_init_worker,
+            initargs=(model.config, model.data),
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _evaluate_chunk, indices, [parameters_list[i] for i in indices]
+                )
+                for indices in chunks
+            ]
+            for future in as_completed(futures):
+                indices, masses = future.result()
+                mass_g[indices] = masses
+
+    if output_file is not None:
+        mass_g.flush()
+
+    return MonteCarloResults(samples, mass_g, model.SpeciesList, model.species_index)
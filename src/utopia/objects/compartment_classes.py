@@ -2,6 +2,22 @@
 class Compartment:
     """Class Compartment (parent class) generates compartment objects that belong by default to an assigned model box (Cbox). Each compartment contains four different particle objects corresponding to the 4 described aggregation states of UTOPIA (freeMP, heterMP, biofMP, heterBiofMP) and the processes that can occur in the compartment are listed under the processess attribute. Each compartment has a set of connexions withing the UTOPIA box listed in the conexions attribute wich will be asigned by reading on the conexions input file of the model."""
 
+    # Attributes of the compartment objects (declared as slots: the objects have no __dict__ so new attributes have to be added here)
+    __slots__ = (
+        "Cname",
+        "Cdepth_m",
+        "Clength_m",
+        "Cwidth_m",
+        "Cvolume_m3",
+        "CsurfaceArea_m2",
+        "particles",
+        "processess",
+        "connexions",
+        "box_connexions",
+        "CBox",
+        "Ccode",
+    )
+
     def __init__(
         self,
         Cname,
@@ -35,6 +51,7 @@ class Compartment:
             "rising",
         ]
         self.connexions = []
+        self.box_connexions = {}  # flows (m3/s) to the same compartment of other model boxes
 
     def assign_box(self, Box):
         self.CBox = Box
@@ -83,6 +100,8 @@ class Compartment:
 
 class compartment_water(Compartment):
 
+    __slots__ = ("SPM_mgL", "flowVelocity_m_s", "waterFlow_m3_s", "T_K", "G")
+
     def __init__(
         self,
         Cname,
@@ -121,6 +140,8 @@ class compartment_water(Compartment):
 
 class compartment_surfaceSea_water(Compartment):
 
+    __slots__ = ("SPM_mgL", "flowVelocity_m_s", "waterFlow_m3_s", "T_K", "G")
+
     def __init__(
         self,
         Cname,
@@ -160,6 +181,8 @@ class compartment_surfaceSea_water(Compartment):
 
 
 class compartment_sediment(Compartment):
+    __slots__ = ()
+
     def __init__(
         self,
         Cname,
@@ -181,6 +204,8 @@ class compartment_sediment(Compartment):
 
 
 class compartment_soil_surface(Compartment):
+    __slots__ = ()
+
     def __init__(
         self,
         Cname,
@@ -208,6 +233,8 @@ class compartment_soil_surface(Compartment):
 
 
 class compartment_deep_soil(Compartment):
+    __slots__ = ()
+
     def __init__(
         self,
         Cname,
@@ -235,6 +262,8 @@ class compartment_deep_soil(Compartment):
 
 
 class compartment_air(Compartment):
+    __slots__ = ("T_K", "wind_speed_m_s", "I_rainfall_mm", "flowVelocity_m_s")
+
     def __init__(
         self,
         Cname,
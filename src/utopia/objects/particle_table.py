@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+from utopia.helpers import effective_volume_density
+
+
+class ParticleTable:
+    """Class ParticleTable stores the properties and steady state results of every species of the model as columns (NumPy arrays in the order of the SpeciesList) instead of one Particulates object per species, so that they can be used in array operations without per-particle attribute access. Single species can still be reached through lightweight views (table[i] or table["eA0_Utopia"]) that expose the columns under the attribute names of the particle objects (e.g. table[i].Pvolume_m3).
+
+    The particle objects remain the source of truth: the property columns are copied from them when the table is built (from_particles) and the table has to be rebuilt when the particle properties change (e.g. the density in incremental_update), while the steady state columns are set by the solvers (steady_state_results) next to the attributes of the objects."""
+
+    # Columns of the table (float columns are filled with NaN until they are computed)
+    float_columns = [
+        "radius_m",
+        "diameter_m",
+        "volume_m3",
+        "density_kg_m3",
+        "CSF",
+        "t_half_d",
+        "num_volume_m3",
+        "num_density_kg_m3",
+        "compartment_volume_m3",
+        "mass_SS",
+        "num_SS",
+        "C_g_m3_SS",
+        "C_num_m3_SS",
+    ]
+    int_columns = ["size", "form", "compartment", "box"]
+
+    # Attribute names of the particle objects (and compartment) and the column they are stored in
+    attribute_columns = {
+        "radius_m": "radius_m",
+        "diameter_m": "diameter_m",
+        "Pvolume_m3": "volume_m3",
+        "Pdensity_kg_m3": "density_kg_m3",
+        "CSF": "CSF",
+        "t_half_d": "t_half_d",
+        "Cvolume_m3": "compartment_volume_m3",
+        "Pmass_g_SS": "mass_SS",
+        "Pnum_SS": "num_SS",
+        "C_g_m3_SS": "C_g_m3_SS",
+        "C_num_m3_SS": "C_num_m3_SS",
+        "Pindex": None,
+        "Pcode": None,
+        "Pform": None,
+        "Psize_index": "size",
+        "Pform_index": "form",
+        "Pcomp_index": "compartment",
+        "Pbox_index": "box",
+    }
+
+    def __init__(self, species_index, form_names, **columns):
+        self.species_index = species_index
+        self.form_names = list(form_names)
+        n = len(species_index)
+        self.columns = {}
+        for name in self.float_columns:
+            values = columns.pop(name, None)
+            self.columns[name] = (
+                np.full(n, np.nan)
+                if values is None
+                else np.asarray(values, dtype=float).reshape(n)
+            )
+        for name in self.int_columns:
+            self.columns[name] = getattr(species_index, name)
+        if columns:
+            raise KeyError(f"Unknown particle table columns: {', '.join(columns)}")
+
+    @classmethod
+    def from_particles(cls, system_particle_object_list, species_index, MPforms_list):
+        """Builds the table from the particle objects of the system (in the order of the species index). The volume and density used to convert mass to particle number are those of the microplastic particle itself for freeMP and biofMP and those of the parent freeMP for the SPM-bound particles (heterMP and heterBiofMP), see number_particle"""
+        num_volume_m3, num_density_kg_m3 = effective_volume_density(
+            system_particle_object_list
+        )
+
+        return cls(
+            species_index,
+            MPforms_list,
+            radius_m=[p.radius_m for p in system_particle_object_list],
+            diameter_m=[p.diameter_m for p in system_particle_object_list],
+            volume_m3=[p.Pvolume_m3 for p in system_particle_object_list],
+            density_kg_m3=[p.Pdensity_kg_m3 for p in system_particle_object_list],
+            CSF=[p.CSF for p in system_particle_object_list],
+            t_half_d=[p.t_half_d for p in system_particle_object_list],
+            num_volume_m3=num_volume_m3,
+            num_density_kg_m3=num_density_kg_m3,
+            compartment_volume_m3=[
+                float(p.Pcompartment.Cvolume_m3) for p in system_particle_object_list
+            ],
+        )
+
+    def __len__(self):
+        return len(self.species_index)
+
+    def __repr__(self):
+        return f"ParticleTable({len(self)} species, columns: {', '.join(self.columns)})"
+
+    def __getattr__(self, name):
+        # Columns as attributes (e.g. table.volume_m3)
+        columns = self.__dict__.get("columns")
+        if columns is not None and name in columns:
+            return columns[name]
+        raise AttributeError(name)
+
+    def __getitem__(self, species):
+        """View of a species given by position or code"""
+        if isinstance(species, str):
+            species = self.species_index.position[species]
+        if not -len(self) <= species < len(self):
+            raise IndexError(f"Species position out of range: {species}")
+        return ParticleView(self, species % len(self))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield ParticleView(self, i)
+
+    @property
+    def codes(self):
+        return self.species_index.codes
+
+    def set_steady_state(self, mass_g):
+        """Sets the steady state mass (g) of every species (in the order of the SpeciesList) and computes their particle number and mass and number concentrations"""
+        mass_g = np.asarray(mass_g, dtype=float).reshape(len(self))
+        self.columns["mass_SS"] = mass_g
+        self.columns["num_SS"] = (
+            mass_g / 1000 / self.num_density_kg_m3 / self.num_volume_m3
+        )
+        self.columns["C_g_m3_SS"] = mass_g / self.compartment_volume_m3
+        self.columns["C_num_m3_SS"] = self.num_SS / self.compartment_volume_m3
+
+    def to_dataframe(self, columns=None):
+        """Dataframe of the table (all columns by default) indexed by species code"""
+        if columns is None:
+            columns = list(self.columns)
+        return pd.DataFrame(
+            {name: self.columns[name] for name in columns},
+            index=pd.Index(self.codes, name="species"),
+        )
+
+
+class ParticleView:
+    """Lightweight view of one species of a ParticleTable. Reading or setting an attribute of the particle objects (e.g. Pvolume_m3, Pmass_g_SS, Cvolume_m3) reads or writes the corresponding entry of the table columns"""
+
+    __slots__ = ("table", "index")
+
+    def __init__(self, table, index):
+        object.__setattr__(self, "table", table)
+        object.__setattr__(self, "index", index)
+
+    def __getattr__(self, name):
+        table = self.table
+        if name == "Pindex":
+            return self.index
+        if name == "Pcode":
+            return table.species_index.codes[self.index]
+        if name == "Pform":
+            return table.form_names[table.columns["form"][self.index]]
+        column = ParticleTable.attribute_columns.get(name, name)
+        if column not in table.columns:
+            raise AttributeError(name)
+        return table.columns[column][self.index].item()
+
+    def __setattr__(self, name, value):
+        column = ParticleTable.attribute_columns.get(name, name)
+        if column not in self.table.float_columns:
+            raise AttributeError(f"Cannot set particle table attribute {name}")
+        self.table.columns[column][self.index] = value
+
+    def __repr__(self):
+        return f"ParticleView({self.Pcode})"
@@ -5,6 +5,48 @@ import numpy as np
 class Particulates:
     """Class Particulates generates particulate objects, especifically microplastic particle objects. The class defines a particle object by its composition, shape and dimensions"""
 
+    # Attributes of the particle objects (declared as slots: the objects have no __dict__ so new attributes have to be added here)
+    __slots__ = (
+        # properties
+        "Pname",
+        "Pform",
+        "Pcomposition",
+        "Pdensity_kg_m3",
+        "Pshape",
+        "PdimensionX_um",
+        "PdimensionY_um",
+        "PdimensionZ_um",
+        "PdimensionX_m",
+        "PdimensionY_m",
+        "PdimensionZ_m",
+        "Pnumber_t0",
+        "radius_m",
+        "diameter_m",
+        "diameter_um",
+        "Pemiss_t_y",
+        "t_half_d",
+        "Pvolume_m3",
+        "CSF",
+        "concNum_part_m3",
+        "initial_conc_Nm3",
+        # compartment and species coding (assigned by generate_objects)
+        "Pcompartment",
+        "Pcode",
+        "Pindex",
+        "Psize_index",
+        "Pform_index",
+        "Pcomp_index",
+        "Pbox_index",
+        # rate constants and results (assigned by the rate constants generators, solvers and results processing)
+        "RateConstants",
+        "Pnumber",
+        "Pmass_g_t0",
+        "Pmass_g_SS",
+        "Pnum_SS",
+        "C_g_m3_SS",
+        "C_num_m3_SS",
+    )
+
     # constructor
     def __init__(
         self,
@@ -129,6 +171,8 @@ class Particulates:
 class ParticulatesBF(Particulates):
     "This is a class to create ParticulatesBIOFILM objects"
 
+    __slots__ = ("parentMP", "BF_density_kg_m3", "BF_thickness_um")
+
     # class attribute
     species = "particulate"
 
@@ -165,6 +209,14 @@ class ParticulatesBF(Particulates):
         self.Pshape = (
             parentMP.Pshape
         )  # to be updated for biofilm, could argue that shape is retained (unlike for SPM-bound)
+        self.calc_density()
+
+        self.PdimensionX_m = self.PdimensionX_um / 1000000  # shortest size
+        self.PdimensionY_m = self.PdimensionY_um / 1000000  # longest size
+        self.PdimensionZ_m = self.PdimensionZ_um / 1000000  # intermediate size
+
+    def calc_density(self):
+        # equation from Kooi et al for density
         self.Pdensity_kg_m3 = (
             self.parentMP.radius_m**3 * self.parentMP.Pdensity_kg_m3
             + (
@@ -173,16 +225,13 @@ class ParticulatesBF(Particulates):
             )
             * self.BF_density_kg_m3
         ) / ((self.parentMP.radius_m + (self.BF_thickness_um / 1e6)) ** 3)
-        # equation from Kooi et al for density
-
-        self.PdimensionX_m = self.PdimensionX_um / 1000000  # shortest size
-        self.PdimensionY_m = self.PdimensionY_um / 1000000  # longest size
-        self.PdimensionZ_m = self.PdimensionZ_um / 1000000  # intermediate size
 
 
 class ParticulatesSPM(Particulates):
     "This is a class to create ParticulatesSPM objects"
 
+    __slots__ = ("parentMP", "parentSPM")
+
     # class attribute
     species = "particulate"
 
@@ -199,11 +248,7 @@ class ParticulatesSPM(Particulates):
             self.t_half_d = 100000  # As per The Full multi parameterizatio
         self.parentMP = parentMP
         self.parentSPM = parentSPM
-        self.Pdensity_kg_m3 = parentMP.Pdensity_kg_m3 * (
-            parentMP.Pvolume_m3 / (parentMP.Pvolume_m3 + parentSPM.Pvolume_m3)
-        ) + parentSPM.Pdensity_kg_m3 * (
-            parentSPM.Pvolume_m3 / (parentMP.Pvolume_m3 + parentSPM.Pvolume_m3)
-        )
+        self.calc_density()
         self.radius_m = (
             3 * (parentMP.Pvolume_m3 + parentSPM.Pvolume_m3) / (4 * math.pi)
         ) ** (
@@ -217,6 +262,15 @@ class ParticulatesSPM(Particulates):
 
     # methods
 
+    def calc_density(self):
+        parentMP = self.parentMP
+        parentSPM = self.parentSPM
+        self.Pdensity_kg_m3 = parentMP.Pdensity_kg_m3 * (
+            parentMP.Pvolume_m3 / (parentMP.Pvolume_m3 + parentSPM.Pvolume_m3)
+        ) + parentSPM.Pdensity_kg_m3 * (
+            parentSPM.Pvolume_m3 / (parentMP.Pvolume_m3 + parentSPM.Pvolume_m3)
+        )
+
     # volume calculation - currently simple version.
     # more complexity to be added later:
     # different formulas for different particle shapes.
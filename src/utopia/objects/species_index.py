@@ -0,0 +1,213 @@
+import numpy as np
+
+
+class SpeciesIndex:
+    """Class SpeciesIndex stores the integer coordinates (size, form, compartment and box index) of every species of the model in the order of the SpeciesList, so the identity of a species does not have to be decoded from its code string (e.g. "eA0_Utopia"). It provides vectorized lookups from species codes or positions to coordinates and from coordinates to positions and codes."""
+
+    def __init__(
+        self, SpeciesList, size_codes, form_codes, compartment_names, box_names, coords
+    ):
+        self.codes = np.array(SpeciesList, dtype=object)
+        self.size_codes = list(size_codes)
+        self.form_codes = list(form_codes)
+        self.compartment_names = list(compartment_names)
+        self.box_names = list(box_names)
+
+        coords = np.asarray(coords, dtype=int).reshape(-1, 4)
+        self.size = coords[:, 0]
+        self.form = coords[:, 1]
+        self.compartment = coords[:, 2]
+        self.box = coords[:, 3]
+
+        # Position of each species by code and by coordinates (-1 for combinations that are not in the model)
+        self.position = {code: i for i, code in enumerate(SpeciesList)}
+        self.position_table = np.full(
+            (
+                len(self.size_codes),
+                len(self.form_codes),
+                len(self.compartment_names),
+                len(self.box_names),
+            ),
+            -1,
+            dtype=int,
+        )
+        self.position_table[self.size, self.form, self.compartment, self.box] = (
+            np.arange(len(SpeciesList))
+        )
+
+    @classmethod
+    def from_particles(
+        cls,
+        system_particle_object_list,
+        size_names,
+        size_codes,
+        form_codes,
+        MPforms_list,
+        compartment_names,
+        box_names,
+    ):
+        """Builds the species index from the particle objects of the system (after generate_system_species_list has assigned their Pcode). The size of each particle is taken from the position of its name in the particles dataframe (mp1, mp2...)"""
+        return cls.from_particle_attributes(
+            [
+                (
+                    p.Pcode,
+                    p.Pname,
+                    p.Pform,
+                    p.Pcompartment.Cname,
+                    p.Pcompartment.CBox.Bname,
+                )
+                for p in system_particle_object_list
+            ],
+            size_names,
+            size_codes,
+            form_codes,
+            MPforms_list,
+            compartment_names,
+            box_names,
+        )
+
+    @classmethod
+    def from_particle_dicts(
+        cls,
+        particle_dicts,
+        size_names,
+        size_codes,
+        form_codes,
+        MPforms_list,
+        compartment_names,
+        box_names,
+    ):
+        """Builds the species index from the particle dictionaries of the JSON version of the model (with the Pcode, Pname, Pform, Pcompartment_Cname and Pcompartment_CBox_Bname entries)"""
+        return cls.from_particle_attributes(
+            [
+                (
+                    p["Pcode"],
+                    p["Pname"],
+                    p["Pform"],
+                    p["Pcompartment_Cname"],
+                    p["Pcompartment_CBox_Bname"],
+                )
+                for p in particle_dicts
+            ],
+            size_names,
+            size_codes,
+            form_codes,
+            MPforms_list,
+            compartment_names,
+            box_names,
+        )
+
+    @classmethod
+    def from_particle_attributes(
+        cls,
+        particles,
+        size_names,
+        size_codes,
+        form_codes,
+        MPforms_list,
+        compartment_names,
+        box_names,
+    ):
+        """Builds the species index from the (code, name, form, compartment name, box name) of every particle"""
+        size_position = {s: i for i, s in enumerate(size_names)}
+        form_position = {f: i for i, f in enumerate(MPforms_list)}
+        compartment_position = {c: i for i, c in enumerate(compartment_names)}
+        box_position = {b: i for i, b in enumerate(box_names)}
+
+        coords = [
+            (
+                size_position[name.split("_")[0]],
+                form_position[form],
+                compartment_position[compartment],
+                box_position[box],
+            )
+            for _, name, form, compartment, box in particles
+        ]
+
+        return cls(
+            [code for code, _, _, _, _ in particles],
+            size_codes,
+            form_codes,
+            compartment_names,
+            box_names,
+            coords,
+        )
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __repr__(self):
+        return (
+            f"SpeciesIndex({len(self)} species: {len(self.size_codes)} sizes x "
+            f"{len(self.form_codes)} forms x {len(self.compartment_names)} compartments x "
+            f"{len(self.box_names)} boxes)"
+        )
+
+    def positions(self, codes):
+        """Positions (in SpeciesList) of a species code or of a list/array of species codes"""
+        if isinstance(codes, str):
+            return self.position[codes]
+        return np.array([self.position[c] for c in codes], dtype=int)
+
+    def coordinates(self, species):
+        """(size, form, compartment, box) integer coordinates of species given by code(s) or position(s)"""
+        if isinstance(species, str) or (
+            not np.isscalar(species) and len(species) and isinstance(species[0], str)
+        ):
+            species = self.positions(species)
+        return (
+            self.size[species],
+            self.form[species],
+            self.compartment[species],
+            self.box[species],
+        )
+
+    def lookup(self, size, form, compartment, box=0):
+        """Positions of the species with the given coordinates (integers or arrays of integers, broadcast together). -1 where the combination is not in the model"""
+        return self.position_table[size, form, compartment, box]
+
+    def code(self, size, form, compartment, box=0):
+        """Species codes of the given coordinates. Raises a KeyError if a combination of coordinates is not in the model"""
+        positions = self.lookup(size, form, compartment, box)
+        missing = np.asarray(positions) < 0
+        if missing.any():
+            coordinates = np.broadcast_arrays(size, form, compartment, box)
+            missing_coordinates = sorted(
+                set(zip(*[c[missing].tolist() for c in coordinates]))
+            )
+            raise KeyError(
+                f"No species with (size, form, compartment, box) coordinates {', '.join(map(str, missing_coordinates))}"
+            )
+        return self.codes[positions]
+
+    def compartment_of(self, species=None):
+        """Compartment names of the species (given by code(s) or position(s), all species by default)"""
+        if species is None:
+            compartment = self.compartment
+        else:
+            compartment = self.coordinates(species)[2]
+        return np.array(self.compartment_names, dtype=object)[compartment]
+
+    def size_code_of(self, species=None):
+        """Size codes of the species (given by code(s) or position(s), all species by default)"""
+        if species is None:
+            size = self.size
+        else:
+            size = self.coordinates(species)[0]
+        return np.array(self.size_codes, dtype=object)[size]
+
+    def select(self, size=None, form=None, compartment=None, box=None):
+        """Boolean mask of the species matching the given coordinates (integers, codes or names; None matches all)"""
+        mask = np.ones(len(self), dtype=bool)
+        for values, names, selected in [
+            (self.size, self.size_codes, size),
+            (self.form, self.form_codes, form),
+            (self.compartment, self.compartment_names, compartment),
+            (self.box, self.box_names, box),
+        ]:
+            if selected is None:
+                continue
+            if isinstance(selected, str):
+                selected = names.index(selected)
+            mask &= values == selected
+        return mask
@@ -2,48 +2,122 @@ import math
 import pandas as pd
 import os
 import numpy as np
-from utopia.globalConstants import *
+from utopia.globalConstants import (
+    density_seaWater_kg_m3,
+    density_w_21C_kg_m3,
+    g_m_s2,
+    k_B_J_K,
+    mu_w_21C_kg_ms,
+)
 from utopia.helpers import generate_fsd_matrix
 
 
+# Constant factors of the rate constant functions (defined once at module level so they are not rebuilt for every particle)
+
+discorporation_MP_form_factors = {
+    "freeMP": 1,
+    "heterMP": 10,
+    "biofMP": 0.5,
+    "heterBiofMP": 5,
+}
+discorporation_compartment_factors = {
+    "Ocean_Surface_Water": 1,
+    "Ocean_Mixed_Water": 10,
+    "Ocean_Column_Water": 10,
+    "Coast_Surface_Water": 1,
+    "Coast_Column_Water": 10,
+    "Surface_Freshwater": 1,
+    "Bulk_Freshwater": 10,
+    "Sediment_Freshwater": 100,
+    "Sediment_Ocean": 100,
+    "Sediment_Coast": 100,
+    "Beaches_Soil_Surface": 10,
+    "Beaches_Deep_Soil": 100,
+    "Background_Soil_Surface": 10,
+    "Background_Soil": 100,
+    "Impacted_Soil_Surface": 10,
+    "Impacted_Soil": 100,
+    "Air": 1000,
+}
+
+fragmentation_MP_form_factors = {
+    "freeMP": 1,
+    "heterMP": 100,
+    "biofMP": 2,
+    "heterBiofMP": 200,
+}
+fragmentation_compartment_factors = {
+    "Ocean_Surface_Water": 1,
+    "Ocean_Mixed_Water": 10,
+    "Ocean_Column_Water": 10,
+    "Coast_Surface_Water": 1,
+    "Coast_Column_Water": 10,
+    "Surface_Freshwater": 1,
+    "Bulk_Freshwater": 10,
+    "Sediment_Freshwater": 100,
+    "Sediment_Ocean": 100,
+    "Sediment_Coast": 100,
+    "Beaches_Soil_Surface": 10,
+    "Beaches_Deep_Soil": 100,
+    "Background_Soil_Surface": 10,
+    "Background_Soil": 100,
+    "Impacted_Soil_Surface": 10,
+    "Impacted_Soil": 100,
+    "Air": 0,
+}
+
+alpha_heter = {
+    "freeMP": 0.01,
+    "heterMP": 0,
+    "biofMP": 0.02,
+    "heterBiofMP": 0,
+}  # REF value: Besseling et al. 2017
+
+t_biof_growth_days_comp = {
+    "Ocean_Surface_Water": 10,
+    "Ocean_Mixed_Water": 30,
+    "Ocean_Column_Water": 300,
+    "Coast_Surface_Water": 10,
+    "Coast_Column_Water": 30,
+    "Surface_Freshwater": 10,
+    "Bulk_Freshwater": 30,
+    "Sediment_Freshwater": 0,
+    "Sediment_Ocean": 0,
+    "Sediment_Coast": 0,
+    "Beaches_Soil_Surface": 0,
+    "Beaches_Deep_Soil": 0,
+    "Background_Soil_Surface": 0,
+    "Background_Soil": 0,
+    "Impacted_Soil_Surface": 0,
+    "Impacted_Soil": 0,
+    "Air": 0,
+}
+biofouling_MP_form_factor = {
+    "freeMP": 1,
+    "heterMP": 1,
+    "biofMP": 0,
+    "heterBiofMP": 0,
+}  # indicates in wich aggregation states the biofouling process is considered
+
+
 def discorporation(particle, model):
     # Process by wich the particle looses is corporeal ("particle") form (eq to degradation) though degradation into monomers and oligomers and other degradation products such as carboxylic acids. It is considered an elimination process in this model as UTOPIA only keeps track of the particulate material .
     # t_half_deg is provided as input in days and is converted to seconds. It refers to the degradation half-life of free MPs in the biggest size fraction and in the surface water compartments.
     # List of asumptions
     # The degradation rate of MPs is size, compartment and aggregation state dependent.
-    # 1) Compartment: The degradation rates are slower in the deeper water compartments as well as in the soil and sediment compartments as described by the factors provided in the dict below.
+    # 1) Compartment: The degradation rates are slower in the deeper water compartments as well as in the soil and sediment compartments as described by the factors provided in the discorporation dicts above.
 
-    # 2) Aggregation state: The degradation rates are slower in the heteroaggregated particles (10x) but faster when biofouled (2x faster) as described by the factors provided in the dict below. Degradation in Air is also considered slower (to be revisited).
+    # 2) Aggregation state: The degradation rates are slower in the heteroaggregated particles (10x) but faster when biofouled (2x faster) as described by the factors provided in the discorporation dicts above. Degradation in Air is also considered slower (to be revisited).
 
     # 3) Size: The degradation rate is scaled by the surface area to volume ratio, so that smaller particles degrade faster. In this case scale the taken degradation rate of the 50um particles since we use the data from Pfohl et al. 2022 (degradation rate of 6.3 x 10-6 for particles of TPU-ether arom in the size range between 50-200um. We asume this value as discorporation rate for the 50 um MP plastics in free form)
 
-    MP_form_factors = {"freeMP": 1, "heterMP": 10, "biofMP": 0.5, "heterBiofMP": 5}
-    compartment_factors = {
-        "Ocean_Surface_Water": 1,
-        "Ocean_Mixed_Water": 10,
-        "Ocean_Column_Water": 10,
-        "Coast_Surface_Water": 1,
-        "Coast_Column_Water": 10,
-        "Surface_Freshwater": 1,
-        "Bulk_Freshwater": 10,
-        "Sediment_Freshwater": 100,
-        "Sediment_Ocean": 100,
-        "Sediment_Coast": 100,
-        "Beaches_Soil_Surface": 10,
-        "Beaches_Deep_Soil": 100,
-        "Background_Soil_Surface": 10,
-        "Background_Soil": 100,
-        "Impacted_Soil_Surface": 10,
-        "Impacted_Soil": 100,
-        "Air": 1000,
-    }
     MP_size_deg_factors = (50**2) / (particle.diameter_um**2)
 
     # degradation half-life of MPs used as input is in days
     t_half_d = (
         model.t_half_deg_free
-        * compartment_factors[particle.Pcompartment.Cname]
-        * MP_form_factors[particle.Pform]
+        * discorporation_compartment_factors[particle.Pcompartment.Cname]
+        * discorporation_MP_form_factors[particle.Pform]
         * MP_size_deg_factors
     )
     # degradation rate constant
@@ -71,30 +145,10 @@ def fragmentation(particle, model):
 
     # 3) Size: Bigger particles fragment faster than smaller particles. The fragmentation rate is scaled by the particle diameter.
 
-    MP_form_factors = {"freeMP": 1, "heterMP": 100, "biofMP": 2, "heterBiofMP": 200}
-    compartment_factors = {
-        "Ocean_Surface_Water": 1,
-        "Ocean_Mixed_Water": 10,
-        "Ocean_Column_Water": 10,
-        "Coast_Surface_Water": 1,
-        "Coast_Column_Water": 10,
-        "Surface_Freshwater": 1,
-        "Bulk_Freshwater": 10,
-        "Sediment_Freshwater": 100,
-        "Sediment_Ocean": 100,
-        "Sediment_Coast": 100,
-        "Beaches_Soil_Surface": 10,
-        "Beaches_Deep_Soil": 100,
-        "Background_Soil_Surface": 10,
-        "Background_Soil": 100,
-        "Impacted_Soil_Surface": 10,
-        "Impacted_Soil": 100,
-        "Air": 0,
-    }
     t_frag_d = (
         float(model.t_frag_gen_FreeSurfaceWater)
-        * MP_form_factors[particle.Pform]
-        * compartment_factors[particle.Pcompartment.Cname]
+        * fragmentation_MP_form_factors[particle.Pform]
+        * fragmentation_compartment_factors[particle.Pcompartment.Cname]
     )
 
     if t_frag_d == 0:
@@ -109,15 +163,17 @@ def fragmentation(particle, model):
 
     # The distribution of mass is expressed via the fragment size distribution matrix fsd (https://microplastics-cluster.github.io/fragment-mnp/advanced-usage/fragment-size-distribution.html) that is estimated from the fragmentation style of the plastic type (FI).
     # In this matrix the smallest size fraction is in the first possition and we consider no fragmentation for this size class
-    fsd = generate_fsd_matrix(model.FI)
-    size_positions = {chr(i): i - ord("a") for i in range(ord("a"), ord("e") + 1)}
+    fsd = generate_fsd_matrix(model.FI, len(model.size_codes))
 
-    k_frag = frag_rate * fsd[size_positions[particle.Pcode[0]]]
+    k_frag = frag_rate * fsd[particle.Psize_index]
 
     return k_frag.tolist()
 
 
-from utopia.preprocessing.rc_settling import *
+from utopia.preprocessing.rc_settling import (
+    calculate_rising_velocity,
+    calculate_settling_velocity,
+)
 
 
 def settling(particle, model):
@@ -130,7 +186,8 @@ def settling(particle, model):
     else:
         w_den_kg_m3 = density_seaWater_kg_m3
 
-    settlingMethod = "Stokes"
+    # "Stokes" or "drag_regimes" (Stokes, intermediate or Newton regime depending on the Reynolds number, see rc_settling.py)
+    settlingMethod = model.config.get("settling_method", "Stokes")
 
     # Settling occurs in all aquatic compartments which should be specified in the comprtment class
     # if particle.Pcompartment.Cname in ["Sediment", "Agricultural Soil","Urban Soil"...]
@@ -145,6 +202,14 @@ def settling(particle, model):
             * g_m_s2
             * (float(particle.radius_m)) ** 2
         )
+    elif settlingMethod == "drag_regimes":
+        vSet_m_s = calculate_settling_velocity(
+            d_p=float(particle.diameter_m),
+            rho_p=float(particle.Pdensity_kg_m3),
+            rho_f=w_den_kg_m3,
+            mu=mu_w_21C_kg_ms,
+            g=g_m_s2,
+        )
     else:
         print("Error: cannot calculate settling other than Stokes yet")
         # print error message settling methods other than Stokes
@@ -195,7 +260,7 @@ def rising(particle, model):
 
     ### OLD VERSION to be changed by the below approach ?###
 
-    settlingMethod = "Stokes"
+    settlingMethod = model.config.get("settling_method", "Stokes")
 
     # Rising only occus in the lower water compartments wich for UTOPIA are: ["Ocean Mixed Water",
     # "Ocean Column Water","Coast Column Water","Bulk FreshWater"]
@@ -221,6 +286,14 @@ def rising(particle, model):
                 * g_m_s2
                 * (float(particle.radius_m)) ** 2
             )
+        elif settlingMethod == "drag_regimes":
+            vSet_m_s = calculate_rising_velocity(
+                d_p=float(particle.diameter_m),
+                rho_p=float(particle.Pdensity_kg_m3),
+                rho_f=w_den_kg_m3,
+                mu=mu_w_21C_kg_ms,
+                g=g_m_s2,
+            )
         else:
             print("Error: cannot calculate settling other than Stokes yet")
         # print error message settling methods other than Stokes
@@ -288,13 +361,6 @@ def heteroaggregation(particle, model):
 
     # Assumptions: Heteroaggegation happens to free and biofouled particles. It is hypothesized that biofilm increases the attachment efficiency of a plastic particle, reflected in two times higher values of  for biofiouled plastic particles compared to the pristine form. We assumed there is no heteroaggregation in the sediment or any soil compartment and neither in air (this is already reflected in the particle, if the particle belongs to any of these compartments there wont be heteroaggregation included as process for the particle).
 
-    alpha_heter = {
-        "freeMP": 0.01,
-        "heterMP": 0,
-        "biofMP": 0.02,
-        "heterBiofMP": 0,
-    }  # REF value: Besseling et al. 2017
-
     # heteroaggregation rate constants
     """heteroaggregation requires to particles to collide and interact favorably for the collision to result in attachment
     the heteroaggregation rate constants is therefore composed of two parts, 1) a collision rate constant and 2) and attachement efficiency (alpha) (representing the probability of attachement).
@@ -376,13 +442,6 @@ def heteroaggregate_breackup(particle, model):
 
     # Kbreackup is calculated based on Kheter of the free and biofouled MPs
 
-    alpha_heter = {
-        "freeMP": 0.01,
-        "heterMP": 0,
-        "biofMP": 0.02,
-        "heterBiofMP": 0,
-    }  # REF value: Besseling et al. 2017
-
     # first the different collision mechanisms are calculated
 
     k_peri = (
@@ -541,35 +600,9 @@ def biofouling(particle, model):
 
     # 2) Aggregation state: Biofouling is modelled to occur in free and heteroaggregated particles
 
-    t_biof_growth_days_comp = {
-        "Ocean_Surface_Water": 10,
-        "Ocean_Mixed_Water": 30,
-        "Ocean_Column_Water": 300,
-        "Coast_Surface_Water": 10,
-        "Coast_Column_Water": 30,
-        "Surface_Freshwater": 10,
-        "Bulk_Freshwater": 30,
-        "Sediment_Freshwater": 0,
-        "Sediment_Ocean": 0,
-        "Sediment_Coast": 0,
-        "Beaches_Soil_Surface": 0,
-        "Beaches_Deep_Soil": 0,
-        "Background_Soil_Surface": 0,
-        "Background_Soil": 0,
-        "Impacted_Soil_Surface": 0,
-        "Impacted_Soil": 0,
-        "Air": 0,
-    }
-    MP_form_factor = {
-        "freeMP": 1,
-        "heterMP": 1,
-        "biofMP": 0,
-        "heterBiofMP": 0,
-    }  # indicates in wich aggregation states the biofouling process is considered
-
     t_biof_growth_d = (
         t_biof_growth_days_comp[particle.Pcompartment.Cname]
-        * MP_form_factor[particle.Pform]
+        * biofouling_MP_form_factor[particle.Pform]
     )
     if t_biof_growth_d == 0:
         k_biof = 0
@@ -738,11 +771,7 @@ def wind_trasport(particle, model):
 
 
 def dry_deposition(particle, model):
-    from utopia.preprocessing.dry_deposition_MS import (
-        ReynoldsNumberFromStokes,
-        kineticCstdrySettlingNewtonSphere,
-        get_settling,
-    )
+    from utopia.preprocessing.dry_deposition_MS import cached_settling_velocities
 
     # particles depossition from air to soil or water compartments
     air_v_m_s = 2  # Assuming average wind speed of 2 m/s
@@ -755,16 +784,10 @@ def dry_deposition(particle, model):
 
     if particle.Pshape == "sphere":
 
-        # Example usage
+        # Settling velocity from the iterative Reynolds number/drag coefficient solution (memoized on diameter and density)
         d = particle.diameter_m
         rho = particle.Pdensity_kg_m3
-        Rep = ReynoldsNumberFromStokes(d, rho)
-
-        initial_Rep = ReynoldsNumberFromStokes(d, rho)
-        initial_Settling = kineticCstdrySettlingNewtonSphere(
-            d, rho, Rep
-        )  # Initial guess for settling velocity
-        settling_velocity = get_settling(initial_Settling, d, rho, initial_Rep)
+        settling_velocity = cached_settling_velocities(d, rho)
         # print("Final settling velocity:", settling_velocity, ReynoldsNumberFromVg(d, rho, settling_velocity))
 
         v_dd = settling_velocity
@@ -829,16 +852,10 @@ def dry_deposition(particle, model):
 
     # dd_rate = 7.91e-6
 
-    dd_rate_dict = {
-        "e": v_dd / 500,
-        "d": v_dd / 500,
-        "c": v_dd / 500,
-        "b": v_dd / 500,
-        "a": v_dd / 500,
-    }
+    dd_rate_dict = dict.fromkeys(model.size_codes, v_dd / 500)
     # Half of the air column depth (500m) is used to calculate the dry deposition rate constant. Assuming a planetary boundary hight of 1000m (Potentially make it different for different size classes)
     k_dry_depossition = [
-        dd_rate_dict[particle.Pcode[0]]
+        dd_rate_dict[model.size_codes[particle.Psize_index]]
         * (
             float(model.dict_comp[c].CsurfaceArea_m2)
             / float(model.dict_comp["Air"].CsurfaceArea_m2)
@@ -861,16 +878,10 @@ def wet_deposition(particle, model):
     t_wet = 12 * 60 * 60  # seconds
     k_wet = 2 * (t_dry + t_wet) / (t_dry**2)
 
-    wd_rate_dict = {
-        "e": k_wet,
-        "d": k_wet,
-        "c": k_wet,
-        "b": k_wet,
-        "a": k_wet,
-    }
+    wd_rate_dict = dict.fromkeys(model.size_codes, k_wet)
 
     k_wet_depossition = [
-        wd_rate_dict[particle.Pcode[0]]
+        wd_rate_dict[model.size_codes[particle.Psize_index]]
         * (
             float(model.dict_comp[c].CsurfaceArea_m2)
             / float(model.dict_comp["Air"].CsurfaceArea_m2)
@@ -892,15 +903,9 @@ def sea_spray_aerosol(particle, model):
         particle.Pcompartment.Cdepth_m
     )
 
-    ssa_rate_dict = {
-        "a": ssa_rate,
-        "b": ssa_rate,
-        "c": ssa_rate,
-        "d": ssa_rate,
-        "e": ssa_rate,
-    }
+    ssa_rate_dict = dict.fromkeys(model.size_codes, ssa_rate)
 
-    k_sea_spray_aerosol = ssa_rate_dict[particle.Pcode[0]] / float(
+    k_sea_spray_aerosol = ssa_rate_dict[model.size_codes[particle.Psize_index]] / float(
         particle.Pcompartment.Cdepth_m
     )
 
@@ -932,3 +937,13 @@ def sequestration_deep_soils(particle, model):
     )
 
     return k_sequestration_deep_soils
+
+
+def box_transport(particle, model):
+    # Transport of particles to the same compartment of other model boxes (advection between river sections or regions or sediment transport) given by the flows of the box connectivity table. The rate constant is the total outflow to other boxes: it is split between the recieving boxes in proportion to their flows when filling the interactions matrix
+
+    k_box_transport = sum(particle.Pcompartment.box_connexions.values()) / float(
+        particle.Pcompartment.Cvolume_m3
+    )
+
+    return k_box_transport
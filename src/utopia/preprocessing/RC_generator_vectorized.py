@@ -0,0 +1,373 @@
+import math
+import numpy as np
+from utopia.globalConstants import (
+    density_seaWater_kg_m3,
+    density_w_21C_kg_m3,
+    g_m_s2,
+    k_B_J_K,
+    mu_w_21C_kg_ms,
+)
+from utopia.helpers import generate_fsd_matrix
+from utopia.preprocessing.rc_settling import (
+    calculate_settling_velocity_array,
+    calculate_rising_velocity_array,
+)
+from utopia.preprocessing.RC_generator import (
+    discorporation_MP_form_factors,
+    discorporation_compartment_factors,
+    fragmentation_MP_form_factors,
+    fragmentation_compartment_factors,
+    alpha_heter,
+    t_biof_growth_days_comp,
+    biofouling_MP_form_factor,
+)
+
+# Batched version of RC_generator: every process is computed for all the particles of the system at once from struct-of-arrays inputs (one NumPy array per particle property). Each function returns a dense array with one row per particle (a 1-D array for scalar rate constants and a 2-D array for the processes that return a list of rate constants). The operations follow the same order as in RC_generator so the values are identical to the ones of the per-particle functions.
+
+
+def particle_arrays(model):
+    """Builds the struct-of-arrays inputs of the vectorized rate constant functions from model.system_particle_object_list: particle diameter, radius, density, form index, size index and compartment index together with the properties of the compartment of each particle (NaN where the compartment does not define them)."""
+    particles = model.system_particle_object_list
+
+    def comp_attr(attr):
+        return np.array(
+            [float(getattr(p.Pcompartment, attr, np.nan) or 0) for p in particles]
+        )
+
+    arrays = {
+        "Cname": np.array([p.Pcompartment.Cname for p in particles]),
+        "Pform": np.array([p.Pform for p in particles]),
+        "form_index": model.species_index.form,
+        "size_index": model.species_index.size,
+        "compartment_index": np.array(
+            [model.particle_compartmentCoding[p.Pcompartment.Cname] for p in particles]
+        ),
+        "diameter_um": np.array([float(p.diameter_um) for p in particles]),
+        "diameter_m": np.array([float(p.diameter_m) for p in particles]),
+        "radius_m": np.array([float(p.radius_m) for p in particles]),
+        "Pdensity_kg_m3": np.array([float(p.Pdensity_kg_m3) for p in particles]),
+        "Cdepth_m": comp_attr("Cdepth_m"),
+        "Cvolume_m3": comp_attr("Cvolume_m3"),
+        "waterFlow_m3_s": comp_attr("waterFlow_m3_s"),
+        "T_K": comp_attr("T_K"),
+        "G": comp_attr("G"),
+        "SPM_mgL": comp_attr("SPM_mgL"),
+    }
+    # Density of the water of the compartment (used in the settling velocities)
+    arrays["w_den_kg_m3"] = np.where(
+        np.char.find(arrays["Cname"], "Freshwater") >= 0,
+        density_w_21C_kg_m3,
+        density_seaWater_kg_m3,
+    )
+
+    return arrays
+
+
+def lookup(dictionary, keys, default=np.nan):
+    """Maps an array of keys (compartment names or MP forms) to the values of a dictionary"""
+    return np.array([dictionary.get(k, default) for k in keys], dtype=float)
+
+
+def discorporation(p, model):
+    MP_size_deg_factors = (50**2) / (p["diameter_um"] ** 2)
+
+    t_half_d = (
+        model.t_half_deg_free
+        * lookup(discorporation_compartment_factors, p["Cname"])
+        * lookup(discorporation_MP_form_factors, p["Pform"])
+        * MP_size_deg_factors
+    )
+    return math.log(2) / (t_half_d * 24 * 60 * 60)
+
+
+def fragmentation(p, model):
+    t_frag_d = (
+        float(model.t_frag_gen_FreeSurfaceWater)
+        * lookup(fragmentation_MP_form_factors, p["Pform"])
+        * lookup(fragmentation_compartment_factors, p["Cname"])
+    )
+    with np.errstate(divide="ignore"):
+        frag_rate = np.where(
+            t_frag_d == 0,
+            0,
+            (1 / (t_frag_d * 24 * 60 * 60))
+            * p["diameter_um"]
+            / model.big_bin_diameter_um,
+        )
+
+    fsd = generate_fsd_matrix(model.FI, len(model.size_codes))
+
+    return frag_rate[:, None] * fsd[p["size_index"]]
+
+
+def stokes_velocity(p):
+    """Stokes settling velocity of every particle in the water of its compartment (negative for rising particles)"""
+    return (
+        2
+        / 9
+        * (p["Pdensity_kg_m3"] - p["w_den_kg_m3"])
+        / mu_w_21C_kg_ms
+        * g_m_s2
+        * (p["radius_m"]) ** 2
+    )
+
+
+def settling(p, model):
+    if model.config.get("settling_method", "Stokes") == "drag_regimes":
+        vSet_m_s = calculate_settling_velocity_array(
+            d_p=p["diameter_m"],
+            rho_p=p["Pdensity_kg_m3"],
+            rho_f=p["w_den_kg_m3"],
+            mu=mu_w_21C_kg_ms,
+            g=g_m_s2,
+        )
+    else:
+        vSet_m_s = stokes_velocity(p)
+
+    return np.where(vSet_m_s > 0, vSet_m_s / p["Cdepth_m"], 0)
+
+
+def rising(p, model):
+    rising_compartments = [
+        "Ocean_Mixed_Water",
+        "Ocean_Column_Water",
+        "Coast_Column_Water",
+        "Bulk_Freshwater",
+    ]
+    if model.config.get("settling_method", "Stokes") == "drag_regimes":
+        vSet_m_s = calculate_rising_velocity_array(
+            d_p=p["diameter_m"],
+            rho_p=p["Pdensity_kg_m3"],
+            rho_f=p["w_den_kg_m3"],
+            mu=mu_w_21C_kg_ms,
+            g=g_m_s2,
+        )
+    else:
+        vSet_m_s = stokes_velocity(p)
+    vSet_m_s = np.where(np.isin(p["Cname"], rising_compartments), vSet_m_s, 0)
+
+    return np.where(vSet_m_s < 0, -vSet_m_s / p["Cdepth_m"], 0)
+
+
+def collision_rate(p, model):
+    """Collision rate constant of every particle with the SPM of its compartment (perikinetic, orthokinetic and differential settling contributions)"""
+    k_peri = (
+        (2 * k_B_J_K * p["T_K"])
+        / (3 * mu_w_21C_kg_ms)
+        * (p["radius_m"] + model.spm.radius_m) ** 2
+        / (p["radius_m"] * model.spm.radius_m)
+    )
+
+    # float_power evaluates the cube with the same libm pow as the scalar functions (the SIMD power of NumPy can differ in the last digit)
+    k_ortho = 4 / 3 * p["G"] * np.float_power(p["radius_m"] + model.spm.radius_m, 3)
+
+    MP_vSet_m_s = stokes_velocity(p)
+
+    SPM_vSet_m_s = (
+        2
+        / 9
+        * (model.spm.Pdensity_kg_m3 - p["w_den_kg_m3"])
+        / mu_w_21C_kg_ms
+        * g_m_s2
+        * (model.spm.radius_m) ** 2
+    )
+
+    k_diffSettling = (
+        math.pi
+        * (p["radius_m"] + model.spm.radius_m) ** 2
+        * abs(MP_vSet_m_s - SPM_vSet_m_s)
+    )
+
+    return k_peri + k_ortho + k_diffSettling
+
+
+def SPM_number_concentration(p, model):
+    """SPM number concentration (particles/m3) of the compartment of every particle (same as model.spm.calc_numConc)"""
+    return p["SPM_mgL"] / 1000 / model.spm.Pdensity_kg_m3 / model.spm.Pvolume_m3
+
+
+def heteroaggregation(p, model):
+    alpha = lookup(alpha_heter, p["Pform"])
+    k_hetAgg = alpha * collision_rate(p, model) * SPM_number_concentration(p, model)
+
+    return np.where(alpha == 0, 0, k_hetAgg)
+
+
+def heteroaggregate_breackup(p, model):
+    # Kbreackup is calculated based on Kheter of the free and biofouled MPs
+    alpha = lookup(
+        {"heterMP": alpha_heter["freeMP"], "heterBiofMP": alpha_heter["biofMP"]},
+        p["Pform"],
+        default=0,
+    )
+    k_hetAgg = alpha * collision_rate(p, model) * SPM_number_concentration(p, model)
+
+    return np.where(alpha == 0, 0, (1 / 1000000000) * k_hetAgg)
+
+
+def advective_transport(p, model):
+    return p["waterFlow_m3_s"] / p["Cvolume_m3"]
+
+
+def mixing(p, model):
+    # Mixing from the ocean mixed water goes up and down (two rate constants), the other compartments only have one mixing rate constant (second column set to NaN)
+    flowRate_mixUP_ocean_m3_s = 0.0138 * float(
+        model.dict_comp["Ocean_Mixed_Water"].CsurfaceArea_m2
+    )
+    flowRate_mixDown_ocean_m3_s = 3.167e-8 * float(
+        model.dict_comp["Ocean_Mixed_Water"].CsurfaceArea_m2
+    )
+    flowRate_mix_coast_m3_s = 0.0138 * float(
+        model.dict_comp["Coast_Column_Water"].CsurfaceArea_m2
+    )
+    flowRateMix_freshWater_m3_s = 0.0067 * float(
+        model.dict_comp["Bulk_Freshwater"].CsurfaceArea_m2
+    )
+
+    flowRate_mix_m3_s = {
+        "Ocean_Mixed_Water": [flowRate_mixUP_ocean_m3_s, flowRate_mixDown_ocean_m3_s],
+        "Ocean_Column_Water": [flowRate_mixDown_ocean_m3_s, np.nan],
+        "Ocean_Surface_Water": [flowRate_mixUP_ocean_m3_s, np.nan],
+        "Coast_Column_Water": [flowRate_mix_coast_m3_s, np.nan],
+        "Coast_Surface_Water": [flowRate_mix_coast_m3_s, np.nan],
+        "Surface_Freshwater": [flowRateMix_freshWater_m3_s, np.nan],
+        "Bulk_Freshwater": [flowRateMix_freshWater_m3_s, np.nan],
+    }
+    flows = np.array(
+        [flowRate_mix_m3_s.get(c, [0, np.nan]) for c in p["Cname"]], dtype=float
+    )
+
+    return flows / p["Cvolume_m3"][:, None]
+
+
+def biofouling(p, model):
+    t_biof_growth_d = lookup(t_biof_growth_days_comp, p["Cname"]) * lookup(
+        biofouling_MP_form_factor, p["Pform"]
+    )
+    with np.errstate(divide="ignore"):
+        return np.where(t_biof_growth_d == 0, 0, 1 / t_biof_growth_d / 24 / 60 / 60)
+
+
+def defouling(p, model):
+    return np.zeros(len(p["Cname"]))
+
+
+def sediment_resuspension(p, model):
+    resusp_dict = {
+        "Sediment_Freshwater": 1e-9,
+        "Sediment_Coast": 1e-10,
+        "Sediment_Ocean": 1e-11,
+    }
+    return lookup(resusp_dict, p["Cname"])
+
+
+def burial(p, model):
+    burial_dict = {
+        "Sediment_Freshwater": 2.7e-9,
+        "Sediment_Coast": 1e-9,
+        "Sediment_Ocean": 5e-10,
+    }
+    return lookup(burial_dict, p["Cname"])
+
+
+def soil_air_resuspension(p, model):
+    sar_rate = (10e-10 / 60) / 60  # m/s
+    ssr_flow = sar_rate * 2500  # kg/m2s
+
+    return (ssr_flow / p["Pdensity_kg_m3"]) / p["Cdepth_m"]
+
+
+def soil_convection(p, model):
+    MTCsconv = 4.54e-7
+
+    return (MTCsconv / (60 * 60)) / p["Cdepth_m"]
+
+
+def percolation(p, model):
+    return np.zeros(len(p["Cname"]))
+
+
+def runoff_transport(p, model):
+    runooff_dict = {
+        "Beaches_Soil_Surface": 2.3e-8,
+        "Background_Soil_Surface": 2.3e-8,
+        "Impacted_Soil_Surface": 2.3e-8,
+    }
+    runoff_rate = (lookup(runooff_dict, p["Cname"]) / p["Cdepth_m"]) / (60 * 60)
+
+    # Distribution of the runoff into the recieving compartments (rows: emiting soil compartment, columns: recieving compartment)
+    fro = np.array([[0, 1], [0, 1], [1, 0], [0, 0]])
+    soilSurf_dic = {
+        "Impacted_Soil_Surface": 0,
+        "Background_Soil_Surface": 1,
+        "Beaches_Soil_Surface": 2,
+    }
+    soil_index = [soilSurf_dic.get(c, 3) for c in p["Cname"]]
+
+    return runoff_rate[:, None] * fro[soil_index]
+
+
+def beaching(p, model):
+    k_adv = p["waterFlow_m3_s"] / p["Cvolume_m3"]
+
+    return np.where(p["Cname"] == "Coast_Surface_Water", (1 / 30) * k_adv, 0)
+
+
+def wind_trasport(p, model):
+    return np.zeros(len(p["Cname"]))
+
+
+def surface_area_ratios(model):
+    """Ratio of the surface area of each surface compartment to the surface area of Air (distribution of the deposition from Air)"""
+    return np.array(
+        [
+            float(model.dict_comp[c].CsurfaceArea_m2)
+            / float(model.dict_comp["Air"].CsurfaceArea_m2)
+            for c in list(model.dict_comp.keys())
+            if "Surface" in c
+        ]
+    )
+
+
+def dry_deposition(p, model):
+    from utopia.preprocessing.dry_deposition_MS import cached_settling_velocities
+
+    # The settling velocities in air of all the particles are solved in one call (memoized on diameter and density)
+    in_air = p["Cname"] == "Air"
+    v_dd = np.full(len(in_air), np.nan)
+    v_dd[in_air] = cached_settling_velocities(
+        p["diameter_m"][in_air], p["Pdensity_kg_m3"][in_air]
+    )
+
+    return (v_dd / 500)[:, None] * surface_area_ratios(model)[None, :]
+
+
+def wet_deposition(p, model):
+    t_dry = 120 * 60 * 60
+    t_wet = 12 * 60 * 60  # seconds
+    k_wet = 2 * (t_dry + t_wet) / (t_dry**2)
+
+    return np.full(len(p["Cname"]), k_wet)[:, None] * surface_area_ratios(model)[None, :]
+
+
+def sea_spray_aerosol(p, model):
+    ssa_rate = 8e-9 / 60 / 60
+
+    return ssa_rate / p["Cdepth_m"]
+
+
+def sequestration_deep_soils(p, model):
+    MTCsconv = 4.54e-7
+
+    return (0.05 * MTCsconv / (60 * 60)) / p["Cdepth_m"]
+
+
+def box_transport(p, model):
+    box_outflow_m3_s = np.array(
+        [
+            float(sum(particle.Pcompartment.box_connexions.values()))
+            for particle in model.system_particle_object_list
+        ]
+    )
+
+    return box_outflow_m3_s / p["Cvolume_m3"]
@@ -1,4 +1,5 @@
 import numpy as np
+from collections import OrderedDict
 
 # ---- Constants dependants of Temperature, Pressure, altitud. Have to be adapted to specific regions ------------
 muAir = 1.789e-5  # [kg−1.s−1], dynamic viscosity of the air (Heigth, Temp dependent)
@@ -54,8 +55,8 @@ def dragCoefficient(d, rho, Rep):
 
     Cd[Rep <= 1] = 24.0 / Rep[Rep <= 1]
     Cd[(1 < Rep) & (Rep <= 1000.0)] = (
-        24.0 / Rep[(1 < Rep) & (Rep <= 750.0)]
-        + 5.0 / np.power(Rep[(1 < Rep) & (Rep <= 750.0)], 0.6)
+        24.0 / Rep[(1 < Rep) & (Rep <= 1000.0)]
+        + 5.0 / np.float_power(Rep[(1 < Rep) & (Rep <= 1000.0)], 0.6)
         + 0.44
     )
     Cd[(1000.0 < Rep) & (Rep <= 2.0e5)] = 0.44
@@ -130,3 +131,57 @@ def get_settling(initial_Settling, d, rho, initial_Rep):
     reynolds = ReynoldsNumberFromVg(d, rho, final_settling_velocity)
 
     return final_settling_velocity
+
+
+# Vectorized version of get_settling: every particle stops iterating when its own settling velocity has converged, so the result is the same as calling get_settling for each particle
+def get_settling_batch(d, rho, tolerance=0.001, max_iterations=20):
+    d = np.asarray(d, dtype=float)
+    rho = np.asarray(rho, dtype=float)
+
+    initial_Rep = ReynoldsNumberFromStokes(d, rho)
+    settling_old = np.array(kineticCstdrySettlingNewtonSphere(d, rho, initial_Rep))
+    settling_new = settling_old.copy()
+
+    active = np.ones(d.shape, dtype=bool)
+    for iteration in range(max_iterations):
+        idx = np.flatnonzero(active)
+        if len(idx) == 0:
+            break
+
+        reynolds = ReynoldsNumberFromVg(d[idx], rho[idx], settling_old[idx])
+        new = kineticCstdrySettlingNewtonSphere(d[idx], rho[idx], reynolds)
+        settling_new[idx] = new
+
+        converged = abs((new - settling_old[idx]) / new) < tolerance
+        settling_old[idx[~converged]] = new[~converged]
+        active[idx[converged]] = False
+
+    return settling_new
+
+
+# Memoized settling velocities in air. The settling velocity only depends on the particle diameter and density, which repeat across MP forms, size classes and model runs (e.g. emission scenarios or parameter sweeps), so solved (d, rho) pairs are kept in a bounded LRU cache
+settling_velocity_cache = OrderedDict()
+settling_velocity_cache_size = 10000
+
+
+def cached_settling_velocities(d, rho):
+    """Settling velocities in air (m/s) of particles with diameters d (m) and densities rho (kg/m3), scalars or arrays. The distinct (d, rho) pairs that are not cached yet are solved together in one get_settling_batch call."""
+    d_arr, rho_arr = np.broadcast_arrays(
+        np.asarray(d, dtype=float), np.asarray(rho, dtype=float)
+    )
+    keys = list(zip(d_arr.ravel().tolist(), rho_arr.ravel().tolist()))
+
+    missing = list(dict.fromkeys(k for k in keys if k not in settling_velocity_cache))
+    if missing:
+        missing_d, missing_rho = zip(*missing)
+        velocities = get_settling_batch(np.array(missing_d), np.array(missing_rho))
+        settling_velocity_cache.update(zip(missing, velocities.tolist()))
+
+    for k in keys:
+        settling_velocity_cache.move_to_end(k)
+    while len(settling_velocity_cache) > settling_velocity_cache_size:
+        settling_velocity_cache.popitem(last=False)
+
+    v = np.array([settling_velocity_cache[k] for k in keys]).reshape(d_arr.shape)
+
+    return float(v) if v.ndim == 0 else v
@@ -4,6 +4,14 @@
 import numpy as np
 import pandas as pd
 
+# Aggregation state transitions that can take place inside a compartment (heteroaggregation, heteroaggregate breackup, biofouling and defouling). Free and biofouled-heteroaggregated or heteroaggregated and biofouled particles never interact directly
+form_transitions = {
+    "freeMP": ["heterMP", "biofMP"],
+    "heterMP": ["freeMP", "heterBiofMP"],
+    "biofMP": ["freeMP", "heterBiofMP"],
+    "heterBiofMP": ["heterMP", "biofMP"],
+}
+
 
 def fillInteractions_fun_OOP(system_particle_object_list, SpeciesList, dict_comp):
 
@@ -35,6 +43,101 @@ def fillInteractions_fun_OOP(system_particle_object_list, SpeciesList, dict_comp
     return interactions_df_sol.transpose()
 
 
+def interaction_pairs(system_particle_object_list):
+    """Species pairs of the interactions matrix that can interact: the particles of the same compartment that can receive fragments or change aggregation state, the particles of the same size and form in the compartments listed in the connexions of the emitting compartment and, in the spatial version, in the same compartment of the boxes it is connected to. The pairs only depend on the species and compartment connexions, not on the values of the rate constants. Returns a list of (receiving position, emitting position, inbox) tuples, inbox being False for the transport between boxes."""
+
+    # Position of each species in the matrix by box, compartment and size index and MP form
+    species_position = {
+        (sp.Pbox_index, sp.Pcomp_index, sp.Psize_index, sp.Pform): i
+        for i, sp in enumerate(system_particle_object_list)
+    }
+    compartment_index = {
+        sp.Pcompartment.Cname: sp.Pcomp_index for sp in system_particle_object_list
+    }
+    box_index = {
+        sp.Pcompartment.CBox.Bname: sp.Pbox_index for sp in system_particle_object_list
+    }
+    size_indices = sorted(set(sp.Psize_index for sp in system_particle_object_list))
+
+    pairs = []
+
+    # sp2 is the emitting species and sp1 the receiving one
+    for j, sp2 in enumerate(system_particle_object_list):
+        box = sp2.Pbox_index
+        comp = sp2.Pcomp_index
+        size = sp2.Psize_index
+        form = sp2.Pform
+
+        # Fragmentation into the other size bins and changes of aggregation state
+        recieving_keys = [(box, comp, s, form) for s in size_indices if s != size]
+        recieving_keys += [(box, comp, size, f) for f in form_transitions[form]]
+
+        # Transport to the connected compartments
+        recieving_keys += [
+            (box, compartment_index[c], size, form)
+            for c in sp2.Pcompartment.connexions
+            if c in compartment_index
+        ]
+
+        for key in recieving_keys:
+            i = species_position.get(key)
+            if i is not None:
+                pairs.append((i, j, True))
+
+        # Transport to the same compartment of the connected boxes (off-diagonal blocks of the matrix)
+        for b in sp2.Pcompartment.box_connexions:
+            i = species_position.get((box_index[b], comp, size, form))
+            if i is not None:
+                pairs.append((i, j, False))
+
+    return pairs
+
+
+def interaction_rate(sp1, sp2, inbox, surfComp_list):
+    """Rate constant of the transfer from species sp2 to species sp1 (entry of the interactions matrix) for a pair given by interaction_pairs"""
+    if inbox:
+        return inboxProcess(sp1, sp2, surfComp_list)
+    return transportProcess(sp1, sp2)
+
+
+def fillInteractions_fun_OOP_sparse(system_particle_object_list, SpeciesList, dict_comp):
+    """Sparse assembly of the interactions matrix. Only the species pairs that can interact are visited (see interaction_pairs). The matrix is block-sparse: one block per box and the transport between boxes outside the diagonal blocks. Returns the matrix in CSR format (rows are the receiving species, columns the emitting ones) and a labelled (sparse backed) dataframe view of it."""
+
+    from scipy import sparse
+
+    surfComp_list = [c for c in dict_comp if "Surface" in c]
+
+    # Asign loose rates
+    elimination_rates = eliminationProcesses(system_particle_object_list, SpeciesList)
+
+    rows = list(range(len(system_particle_object_list)))
+    cols = list(range(len(system_particle_object_list)))
+    values = list(elimination_rates)
+
+    # Asign interactions rates
+    for i, j, inbox in interaction_pairs(system_particle_object_list):
+        sol = interaction_rate(
+            system_particle_object_list[i],
+            system_particle_object_list[j],
+            inbox,
+            surfComp_list,
+        )
+        if sol != 0:
+            rows.append(i)
+            cols.append(j)
+            values.append(sol)
+
+    interactions_matrix = sparse.csr_matrix(
+        (values, (rows, cols)),
+        shape=(len(SpeciesList), len(SpeciesList)),
+    )
+    interactions_df = pd.DataFrame.sparse.from_spmatrix(
+        interactions_matrix, index=SpeciesList, columns=SpeciesList
+    )
+
+    return interactions_matrix, interactions_df
+
+
 def eliminationProcesses(system_particle_object_list, SpeciesList):
     # Estimate losses (diagonal):the diagonal of the dataframe corresponds to the losses of each species
     # Add soil_convection as elimination process from deep soil compartments
@@ -81,19 +184,17 @@ def eliminationProcesses(system_particle_object_list, SpeciesList):
 
 def inboxProcess(sp1, sp2, surfComp_list):
     # If same compartment (compartment processes)
-    if sp1.Pcode[2:] == sp2.Pcode[2:]:
+    if (sp1.Pcomp_index, sp1.Pbox_index) == (sp2.Pcomp_index, sp2.Pbox_index):
         # Only different size bins --> Fragmentation
 
-        if sp1.Pcode[1:] == sp2.Pcode[1:] and sp1.Pcode[0] != sp2.Pcode[0]:
+        if sp1.Pform == sp2.Pform and sp1.Psize_index != sp2.Psize_index:
 
             # We reformulate fractionation as it is not a happening only for consecutive size Bins(bigger to next smaller) but using the fragment size distribution matrix (https://microplastics-cluster.github.io/fragment-mnp/advanced-usage/fragment-size-distribution.html)
             # We have to select the fragmentation rate corresponding to the recieving size bin from the size_dict
 
             # In this matrix the smallest size fraction is in the first possition and we consider no fragmentation for this size class
 
-            size_dict = {chr(i): i - ord("a") for i in range(ord("a"), ord("e") + 1)}
-
-            fsd_index = size_dict[sp1.Pcode[0]]
+            fsd_index = sp1.Psize_index
 
             if type(sp2.RateConstants["k_fragmentation"]) is tuple:
                 frag = sp2.RateConstants["k_fragmentation"]
@@ -104,10 +205,10 @@ def inboxProcess(sp1, sp2, surfComp_list):
 
         # Different aggergation states (same size)--> heteroagg, biofouling,defouling and agg-breackup
 
-        elif sp1.Pcode[0] == sp2.Pcode[0] and sp1.Pcode[1] != sp2.Pcode[1]:
+        elif sp1.Psize_index == sp2.Psize_index and sp1.Pform != sp2.Pform:
             # heteroaggregation from A-->B or from C-->D
-            if (sp2.Pcode[1] == "A" and sp1.Pcode[1] == "B") or (
-                sp2.Pcode[1] == "C" and sp1.Pcode[1] == "D"
+            if (sp2.Pform == "freeMP" and sp1.Pform == "heterMP") or (
+                sp2.Pform == "biofMP" and sp1.Pform == "heterBiofMP"
             ):
                 process = "heteroaggregation"
                 if process in sp2.Pcompartment.processess:
@@ -116,8 +217,8 @@ def inboxProcess(sp1, sp2, surfComp_list):
                     sol = 0
 
             # heteroaggregate breackup from B-->A and from D-->C
-            elif (sp2.Pcode[1] == "B" and sp1.Pcode[1] == "A") or (
-                sp2.Pcode[1] == "D" and sp1.Pcode[1] == "C"
+            elif (sp2.Pform == "heterMP" and sp1.Pform == "freeMP") or (
+                sp2.Pform == "heterBiofMP" and sp1.Pform == "biofMP"
             ):
                 process = "heteroaggregate_breackup"
                 if process in sp2.Pcompartment.processess:
@@ -126,8 +227,8 @@ def inboxProcess(sp1, sp2, surfComp_list):
                     sol = 0
 
             # Biofouling from A-->C or from B-->D
-            elif (sp2.Pcode[1] == "A" and sp1.Pcode[1] == "C") or (
-                sp2.Pcode[1] == "B" and sp1.Pcode[1] == "D"
+            elif (sp2.Pform == "freeMP" and sp1.Pform == "biofMP") or (
+                sp2.Pform == "heterMP" and sp1.Pform == "heterBiofMP"
             ):
                 process = "biofouling"
                 if process in sp2.Pcompartment.processess:
@@ -136,8 +237,8 @@ def inboxProcess(sp1, sp2, surfComp_list):
                     sol = 0
 
             # Defouling from C-->A or from D-->B
-            elif (sp2.Pcode[1] == "C" and sp1.Pcode[1] == "A") or (
-                sp2.Pcode[1] == "D" and sp1.Pcode[1] == "B"
+            elif (sp2.Pform == "biofMP" and sp1.Pform == "freeMP") or (
+                sp2.Pform == "heterBiofMP" and sp1.Pform == "heterMP"
             ):
                 process = "defouling"
                 if process in sp2.Pcompartment.processess:
@@ -161,7 +262,7 @@ def inboxProcess(sp1, sp2, surfComp_list):
 
         surfComp_dict = {key: index for index, key in enumerate(surfComp_list)}
 
-        if sp1.Pcode[:2] == sp2.Pcode[:2]:
+        if (sp1.Psize_index, sp1.Pform) == (sp2.Psize_index, sp2.Pform):
             process = sp2.Pcompartment.connexions[sp1.Pcompartment.Cname]
             if type(process) == list:
                 sol2 = []
@@ -226,34 +327,34 @@ def interactionProcess(
         else:
             # Same box (i.e. river section RS)--> In box processes
 
-            if sp1.Pcode.split("_")[1] == sp2.Pcode.split("_")[1]:
+            if sp1.Pbox_index == sp2.Pbox_index:
                 sol.append(inboxProcess(sp1, sp2, surfComp_list))
 
             # Different Box but same particle in same compartment (Full Multi version where more than 1 box (i.e. river sections)) -->Transport (advection or sediment transport determined by flow_connectivity file)
 
-            elif sp2.Pcode.split("_")[0] == sp1.Pcode.split("_")[0]:
-                sol.append(transportProcess(sp1, sp2, river_flows))
-                # """Pending work on transport for The Full Multi"""
+            elif (sp2.Psize_index, sp2.Pform, sp2.Pcomp_index) == (
+                sp1.Psize_index,
+                sp1.Pform,
+                sp1.Pcomp_index,
+            ):
+                sol.append(transportProcess(sp1, sp2))
             else:
                 sol.append(0)
 
     return sol
 
 
-def transportProcess(sp1, sp2, RC_df, river_flows):
-    J = int(sp1[:-3]) + 1
-    I = int(sp2[:-3]) + 1
-    flowI_df = river_flows[river_flows.Region_I == I]
-    if J in flowI_df.Region_J.tolist():
-        if sp1[-3] != "4":
-            if isinstance(RC_df[sp2]["advection"], (int, float)):
-                solution = RC_df[sp2]["advection"]
-            else:
-                idx_ad = np.where(flowI_df.Region_J == J)[0][0]
-                solution = RC_df[sp2]["advection"][idx_ad]
-        else:
-            solution = RC_df[sp2]["sedTransport"]
+def transportProcess(sp1, sp2):
+    # Transport between model boxes (advection or sediment transport given by the box connectivity table): fraction of the box transport rate constant of sp2 that goes to the box of sp1
+    flows = sp2.Pcompartment.box_connexions
+    recieving_box = sp1.Pcompartment.CBox.Bname
+    if "box_transport" in sp2.Pcompartment.processess and recieving_box in flows:
+        sol = (
+            sp2.RateConstants["k_box_transport"]
+            * flows[recieving_box]
+            / sum(flows.values())
+        )
     else:
-        solution = 0
+        sol = 0
 
-    return solution
+    return sol
@@ -1,5 +1,7 @@
 import numpy as np
 import pandas as pd
+from scipy import sparse
+from utopia.preprocessing.fill_interactions_df import interaction_pairs
 
 
 def fillInteractions_fun_OOP_dict(
@@ -31,6 +33,36 @@ def fillInteractions_fun_OOP_dict(
     return interactions_df_sol.transpose()
 
 
+def process_interaction_matrices(system_particle_object_list, SpeciesList, surfComp_list):
+    """Interactions matrix decomposed by process: one sparse matrix per process (k_* key) with the rate constants of the transfers from the emitting species (columns) to the receiving species (rows) through that process. Only the species pairs that can interact are visited (see interaction_pairs) and the zero rates of the processes that connect a pair are kept as explicit entries. Also returns the processes through which each species receives particles, in the order they are found along the emitting species."""
+    entries = {}
+    receiving_processes = [{} for _ in system_particle_object_list]
+
+    for i, j, inbox in sorted(interaction_pairs(system_particle_object_list)):
+        sp1 = system_particle_object_list[i]
+        sp2 = system_particle_object_list[j]
+        if inbox:
+            sol = inboxProcess_dict(sp1, sp2, surfComp_list)
+        else:
+            sol = transportProcess(sp1, sp2)
+        if type(sol) != dict:
+            continue
+        for process, rate in sol.items():
+            rows, cols, values = entries.setdefault(process, ([], [], []))
+            rows.append(i)
+            cols.append(j)
+            values.append(rate)
+            receiving_processes[i].setdefault(process, j)
+
+    matrices = {
+        process: sparse.csr_matrix(
+            (values, (rows, cols)), shape=(len(SpeciesList), len(SpeciesList))
+        )
+        for process, (rows, cols, values) in entries.items()
+    }
+    return matrices, [list(processes) for processes in receiving_processes]
+
+
 def eliminationProcesses(system_particle_object_list, SpeciesList):
     # Estimate losses (diagonal):the diagonal of the dataframe corresponds to the losses of each species
     # Add soil_convection as elimination process from deep soil compartments
@@ -77,19 +109,17 @@ def eliminationProcesses(system_particle_object_list, SpeciesList):
 
 def inboxProcess_dict(sp1, sp2, surfComp_list):
     # If same compartment (compartment processes)
-    if sp1.Pcode[2:] == sp2.Pcode[2:]:
+    if (sp1.Pcomp_index, sp1.Pbox_index) == (sp2.Pcomp_index, sp2.Pbox_index):
         # Only different size bins --> Fragmentation
 
-        if sp1.Pcode[1:] == sp2.Pcode[1:] and sp1.Pcode[0] != sp2.Pcode[0]:
+        if sp1.Pform == sp2.Pform and sp1.Psize_index != sp2.Psize_index:
 
             # We reformulate fractionation as it is not a happening only for consecutive size Bins(bigger to next smaller) but using the fragment size distribution matrix (https://microplastics-cluster.github.io/fragment-mnp/advanced-usage/fragment-size-distribution.html)
             # We have to select the fragmentation rate corresponding to the recieving size bin from the size_dict
 
             # In this matrix the smallest size fraction is in the first possition and we consider no fragmentation for this size class
 
-            size_dict = {chr(i): i - ord("a") for i in range(ord("a"), ord("e") + 1)}
-
-            fsd_index = size_dict[sp1.Pcode[0]]
+            fsd_index = sp1.Psize_index
 
             if type(sp2.RateConstants["k_fragmentation"]) is tuple:
                 frag = sp2.RateConstants["k_fragmentation"]
@@ -102,10 +132,10 @@ def inboxProcess_dict(sp1, sp2, surfComp_list):
 
         # Different aggergation states (same size)--> heteroagg, biofouling,defouling and agg-breackup
 
-        elif sp1.Pcode[0] == sp2.Pcode[0] and sp1.Pcode[1] != sp2.Pcode[1]:
+        elif sp1.Psize_index == sp2.Psize_index and sp1.Pform != sp2.Pform:
             # heteroaggregation from A-->B or from C-->D
-            if (sp2.Pcode[1] == "A" and sp1.Pcode[1] == "B") or (
-                sp2.Pcode[1] == "C" and sp1.Pcode[1] == "D"
+            if (sp2.Pform == "freeMP" and sp1.Pform == "heterMP") or (
+                sp2.Pform == "biofMP" and sp1.Pform == "heterBiofMP"
             ):
                 process = "heteroaggregation"
                 if process in sp2.Pcompartment.processess:
@@ -114,8 +144,8 @@ def inboxProcess_dict(sp1, sp2, surfComp_list):
                     sol = 0
 
             # heteroaggregate breackup from B-->A and from D-->C
-            elif (sp2.Pcode[1] == "B" and sp1.Pcode[1] == "A") or (
-                sp2.Pcode[1] == "D" and sp1.Pcode[1] == "C"
+            elif (sp2.Pform == "heterMP" and sp1.Pform == "freeMP") or (
+                sp2.Pform == "heterBiofMP" and sp1.Pform == "biofMP"
             ):
                 process = "heteroaggregate_breackup"
                 if process in sp2.Pcompartment.processess:
@@ -126,8 +156,8 @@ def inboxProcess_dict(sp1, sp2, surfComp_list):
                     sol = 0
 
             # Biofouling from A-->C or from B-->D
-            elif (sp2.Pcode[1] == "A" and sp1.Pcode[1] == "C") or (
-                sp2.Pcode[1] == "B" and sp1.Pcode[1] == "D"
+            elif (sp2.Pform == "freeMP" and sp1.Pform == "biofMP") or (
+                sp2.Pform == "heterMP" and sp1.Pform == "heterBiofMP"
             ):
                 process = "biofouling"
                 if process in sp2.Pcompartment.processess:
@@ -136,8 +166,8 @@ def inboxProcess_dict(sp1, sp2, surfComp_list):
                     sol = 0
 
             # Defouling from C-->A or from D-->B
-            elif (sp2.Pcode[1] == "C" and sp1.Pcode[1] == "A") or (
-                sp2.Pcode[1] == "D" and sp1.Pcode[1] == "B"
+            elif (sp2.Pform == "biofMP" and sp1.Pform == "freeMP") or (
+                sp2.Pform == "heterBiofMP" and sp1.Pform == "heterMP"
             ):
                 process = "defouling"
                 if process in sp2.Pcompartment.processess:
@@ -161,7 +191,7 @@ def inboxProcess_dict(sp1, sp2, surfComp_list):
 
         surfComp_dict = {key: index for index, key in enumerate(surfComp_list)}
 
-        if sp1.Pcode[:2] == sp2.Pcode[:2]:
+        if (sp1.Psize_index, sp1.Pform) == (sp2.Psize_index, sp2.Pform):
             process = sp2.Pcompartment.connexions[sp1.Pcompartment.Cname]
             if type(process) == list:
                 sol2 = {}
@@ -226,34 +256,34 @@ def interactionProcess_dict(
         else:
             # Same box (i.e. river section RS)--> In box processes
 
-            if sp1.Pcode.split("_")[1] == sp2.Pcode.split("_")[1]:
+            if sp1.Pbox_index == sp2.Pbox_index:
                 sol.append(inboxProcess_dict(sp1, sp2, surfComp_list))
 
             # Different Box but same particle in same compartment (Full Multi version where more than 1 box (i.e. river sections)) -->Transport (advection or sediment transport determined by flow_connectivity file)
 
-            elif sp2.Pcode.split("_")[0] == sp1.Pcode.split("_")[0]:
-                sol.append(transportProcess(sp1, sp2, river_flows))
-                # """Pending work on transport for The Full Multi"""
+            elif (sp2.Psize_index, sp2.Pform, sp2.Pcomp_index) == (
+                sp1.Psize_index,
+                sp1.Pform,
+                sp1.Pcomp_index,
+            ):
+                sol.append(transportProcess(sp1, sp2))
             else:
                 sol.append(0)
 
     return sol
 
 
-def transportProcess(sp1, sp2, RC_df, river_flows):
-    J = int(sp1[:-3]) + 1
-    I = int(sp2[:-3]) + 1
-    flowI_df = river_flows[river_flows.Region_I == I]
-    if J in flowI_df.Region_J.tolist():
-        if sp1[-3] != "4":
-            if isinstance(RC_df[sp2]["advection"], (int, float)):
-                solution = RC_df[sp2]["advection"]
-            else:
-                idx_ad = np.where(flowI_df.Region_J == J)[0][0]
-                solution = RC_df[sp2]["advection"][idx_ad]
-        else:
-            solution = RC_df[sp2]["sedTransport"]
+def transportProcess(sp1, sp2):
+    # Transport between model boxes (advection or sediment transport given by the box connectivity table): fraction of the box transport rate constant of sp2 that goes to the box of sp1
+    flows = sp2.Pcompartment.box_connexions
+    recieving_box = sp1.Pcompartment.CBox.Bname
+    if "box_transport" in sp2.Pcompartment.processess and recieving_box in flows:
+        sol = {
+            "k_box_transport": sp2.RateConstants["k_box_transport"]
+            * flows[recieving_box]
+            / sum(flows.values())
+        }
     else:
-        solution = 0
+        sol = 0
 
-    return solution
+    return sol
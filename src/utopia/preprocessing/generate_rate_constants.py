@@ -1,4 +1,6 @@
+import numpy as np
 import utopia.preprocessing.RC_generator as RC_generator
+import utopia.preprocessing.RC_generator_vectorized as RC_generator_vectorized
 
 
 def generate_rate_constants(model):
@@ -14,3 +16,45 @@ def generate_rate_constants(model):
             )
 
     return model
+
+
+def generate_rate_constants_arrays(model):
+    """Computes the rate constants of every process for all the particles of the system at once (see RC_generator_vectorized). Returns a dictionary of dense arrays per process (one row per particle in the order of system_particle_object_list). The rows of particles whose compartment does not include the process are not meaningful."""
+    p = RC_generator_vectorized.particle_arrays(model)
+
+    processes = []
+    for particle in model.system_particle_object_list:
+        for proc in particle.Pcompartment.processess:
+            if proc not in processes:
+                processes.append(proc)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "k_" + proc: getattr(RC_generator_vectorized, proc)(p, model)
+            for proc in processes
+        }
+
+
+def generate_rate_constants_vectorized(model):
+    """Generates rate constants for all processes for each particle in the system with the vectorized engine. The dense per-process arrays are kept in model.rate_constants_arrays and the RateConstants dictionary of each particle is filled from them (same structure and values as generate_rate_constants)."""
+    model.rate_constants_arrays = generate_rate_constants_arrays(model)
+
+    for i, particle in enumerate(model.system_particle_object_list):
+        particle.RateConstants = {}
+        for proc in particle.Pcompartment.processess:
+            particle.RateConstants["k_" + proc] = rate_constant_value(
+                model.rate_constants_arrays["k_" + proc][i]
+            )
+
+    return model
+
+
+def rate_constant_value(k):
+    """Value of a rate constant in the RateConstants dictionary of a particle from its row of the array of the process (a float or a list of floats)"""
+    if np.ndim(k) == 0:
+        return float(k)
+    elif np.isnan(k[-1]):
+        # Processes with a single rate constant in some compartments and several in others (mixing)
+        return float(k[0])
+    else:
+        return k.tolist()
@@ -4,23 +4,32 @@ import os
 import math
 import copy
 from pathlib import Path
-from utopia.globalConstants import *
-from utopia.objects.compartment_classes import *
-from utopia.objects.particulate_classes import *
-from utopia.objects.box_class import *
+import pandas as pd
+from utopia.objects.particulate_classes import (
+    Particulates,
+    ParticulatesBF,
+    ParticulatesSPM,
+)
+from utopia.objects.box_class import Box
+from utopia.objects.species_index import SpeciesIndex
 import json
 
-from utopia.preprocessing.readinputs_from_csv import *
+from utopia.preprocessing.readinputs_from_csv import (
+    generate_particles_from_df,
+    generate_system_species_list,
+    instantiate_compartments,
+    set_box_connexions,
+    set_interactions,
+)
 
 
 def generate_objects(model):
     """Function for generating the UTOPIA model objects: model box, model compartments and the model particles"""
-    # Boxes
-    UTOPIA = Box(model.boxName)
+    # Boxes (one UTOPIA box by default, several boxes i.e. river sections or regions in the spatial version)
+    modelBoxes = [Box(boxName) for boxName in model.boxNames_list]
+    UTOPIA = modelBoxes[model.boxNames_list.index(model.boxName)]
     # print(f"The model box {boxName} has been created")
 
-    modelBoxes = [UTOPIA]
-    
     # modelBoxes=instantiateBoxes_from_csv(boxFile)
     boxNames_list = [b.Bname for b in modelBoxes]
 
@@ -145,12 +154,21 @@ def generate_objects(model):
 
     particles_properties_df = pd.DataFrame(data=particles_properties)
 
-    # Assign compartmets to UTOPIA
+    # Assign compartmets to the model boxes
 
-    for comp in compartments:
-        UTOPIA.add_compartment(
-            copy.deepcopy(comp)
-        )  # Check if the use of copy is correct!!
+    for b in modelBoxes:
+        for comp in compartments:
+            b.add_compartment(
+                copy.deepcopy(comp)
+            )  # Check if the use of copy is correct!!
+
+    # Transport between boxes (advection or sediment transport) from the box connectivity table
+    if model.box_connectivity is not None:
+        if isinstance(model.box_connectivity, (str, Path)):
+            box_connectivity = pd.read_csv(model.base_path / model.box_connectivity)
+        else:
+            box_connectivity = pd.DataFrame(model.box_connectivity)
+        set_box_connexions(modelBoxes, box_connectivity)
 
     # print(
     #     f"The compartments {[comp.Cname for comp in UTOPIA.compartments]} have been assigned to {UTOPIA.Bname } model box"
@@ -186,7 +204,25 @@ def generate_objects(model):
         model.MPforms_list,
         compartmentNames_list,
         boxNames_list,
+        particle_sizes_coding=dict(zip(model.dict_size_coding, model.size_codes)),
+    )
+
+    # Integer (size, form, compartment, box) coordinates of every species
+    species_index = SpeciesIndex.from_particles(
+        system_particle_object_list,
+        size_names=list(model.dict_size_coding),
+        size_codes=model.size_codes,
+        form_codes=[model.particle_forms_coding[f] for f in model.MPforms_list],
+        MPforms_list=model.MPforms_list,
+        compartment_names=compartmentNames_list,
+        box_names=boxNames_list,
     )
+    for i, p in enumerate(system_particle_object_list):
+        p.Pindex = i
+        p.Psize_index = int(species_index.size[i])
+        p.Pform_index = int(species_index.form[i])
+        p.Pcomp_index = int(species_index.compartment[i])
+        p.Pbox_index = int(species_index.box[i])
 
     print("modleBoxes: ", modelBoxes)
     print("type of modelBoxes: ", type(modelBoxes))
@@ -198,6 +234,7 @@ def generate_objects(model):
         spm,
         dict_comp,
         particles_properties_df,
+        species_index,
     )
 
 
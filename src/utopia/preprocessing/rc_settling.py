@@ -1,7 +1,8 @@
 import math
+import numpy as np
 
 
-def calculate_settling_velocity(d_p, rho_p, rho_f, mu, g=9.81):
+def calculate_settling_velocity(d_p, rho_p, rho_f, mu, g=9.81, tol=1e-10, max_iter=100):
     """
     Estimates the settling velocity of a particle in water based on its size.
     Automatically selects the correct equation depending on Reynolds number.
@@ -12,6 +13,8 @@ def calculate_settling_velocity(d_p, rho_p, rho_f, mu, g=9.81):
     rho_f : Fluid density (kg/m³) (typically ~1000 kg/m³ for water)
     mu    : Dynamic viscosity of water (Pa·s or kg/(m·s)) (e.g., ~0.001 for water at 20°C)
     g     : Gravitational acceleration (m/s²) (default: 9.81 m/s²)
+    tol   : Relative tolerance of the iteration in the intermediate regime
+    max_iter : Maximum number of iterations in the intermediate regime
 
     Returns:
     v_s   : Settling velocity (m/s)
@@ -28,10 +31,14 @@ def calculate_settling_velocity(d_p, rho_p, rho_f, mu, g=9.81):
     # Intermediate regime (0.1 < Re < 1000)
     # Iterative approach to solve for velocity since Cd depends on Re
     v_s = v_s_stokes  # Initial guess
-    for _ in range(10):  # Iterate for better accuracy
+    for _ in range(max_iter):  # Iterate until the velocity converges
         Re = (rho_f * v_s * d_p) / mu
         Cd = (24 / Re) * (1 + 0.15 * Re**0.687)  # Empirical drag coefficient
-        v_s = math.sqrt((4 * g * d_p * (rho_p - rho_f)) / (3 * Cd * rho_f))
+        v_new = math.sqrt((4 * g * d_p * (rho_p - rho_f)) / (3 * Cd * rho_f))
+        converged = abs(v_new - v_s) <= tol * v_new
+        v_s = v_new
+        if converged:
+            break
 
     if Re < 1000:
         return v_s  # , "Intermediate regime (empirical drag correction)"
@@ -43,10 +50,7 @@ def calculate_settling_velocity(d_p, rho_p, rho_f, mu, g=9.81):
     return v_s_newton  # , "Newton's Law (turbulent flow)"
 
 
-import math
-
-
-def calculate_rising_velocity(d_p, rho_p, rho_f, mu, g=9.81):
+def calculate_rising_velocity(d_p, rho_p, rho_f, mu, g=9.81, tol=1e-10, max_iter=100):
     """
     Estimates the rising velocity of a particle in water based on its size.
     Automatically selects the correct equation depending on Reynolds number.
@@ -57,6 +61,8 @@ def calculate_rising_velocity(d_p, rho_p, rho_f, mu, g=9.81):
     rho_f : Fluid density (kg/m³) (typically ~1000 kg/m³ for water)
     mu    : Dynamic viscosity of water (Pa·s or kg/(m·s)) (e.g., ~0.001 for water at 20°C)
     g     : Gravitational acceleration (m/s²) (default: 9.81 m/s²)
+    tol   : Relative tolerance of the iteration in the intermediate regime
+    max_iter : Maximum number of iterations in the intermediate regime
 
     Returns:
     v_r   : Rising velocity (m/s)
@@ -74,10 +80,14 @@ def calculate_rising_velocity(d_p, rho_p, rho_f, mu, g=9.81):
     # Intermediate regime (0.1 < Re < 1000)
     # Iterative approach to solve for velocity since Cd depends on Re
     v_s = v_s_stokes  # Initial guess
-    for _ in range(10):  # Iterate for better accuracy
+    for _ in range(max_iter):  # Iterate until the velocity converges
         Re = (rho_f * v_s * d_p) / mu
         Cd = (24 / Re) * (1 + 0.15 * Re**0.687)  # Empirical drag coefficient
-        v_s = math.sqrt((4 * g * d_p * (rho_f - rho_p)) / (3 * Cd * rho_f))
+        v_new = math.sqrt((4 * g * d_p * (rho_f - rho_p)) / (3 * Cd * rho_f))
+        converged = abs(v_new - v_s) <= tol * v_new
+        v_s = v_new
+        if converged:
+            break
 
     if Re < 1000:
         return -v_s
@@ -90,3 +100,74 @@ def calculate_rising_velocity(d_p, rho_p, rho_f, mu, g=9.81):
 
     return -v_s_newton
     # , "Newton's Law (turbulent flow)"  # Negative for rising particles
+
+
+def calculate_settling_velocity_array(d_p, rho_p, rho_f, mu, g=9.81, tol=1e-10, max_iter=100):
+    """
+    Array version of calculate_settling_velocity: estimates the settling velocity of all the particles at once.
+    The flow regime of each particle is selected with masks and the intermediate regime is iterated until all the velocities converge.
+
+    Parameters:
+    d_p   : Particle diameters (m)
+    rho_p : Particle densities (kg/m³)
+    rho_f : Fluid densities (kg/m³)
+    mu    : Dynamic viscosities of the fluid (Pa·s or kg/(m·s))
+    g     : Gravitational acceleration (m/s²) (default: 9.81 m/s²)
+    tol   : Relative tolerance of the iteration in the intermediate regime
+    max_iter : Maximum number of iterations in the intermediate regime
+    (arrays of the same shape or scalars)
+
+    Returns:
+    v_s   : Settling velocities (m/s)
+    """
+    d_p, rho_p, rho_f, mu = np.broadcast_arrays(
+        *[np.asarray(x, dtype=float) for x in (d_p, rho_p, rho_f, mu)]
+    )
+    v_s = terminal_velocity_array(d_p, rho_p - rho_f, rho_f, mu, g, tol, max_iter)
+
+    # Particles lighter than the fluid keep the (negative) Stokes velocity, as in the scalar version
+    return np.where(rho_p - rho_f > 0, v_s, (g * (rho_p - rho_f) * d_p**2) / (18 * mu))
+
+
+def calculate_rising_velocity_array(d_p, rho_p, rho_f, mu, g=9.81, tol=1e-10, max_iter=100):
+    """
+    Array version of calculate_rising_velocity: estimates the rising velocity of all the particles at once (negative for rising particles, see calculate_settling_velocity_array for the parameters).
+    """
+    d_p, rho_p, rho_f, mu = np.broadcast_arrays(
+        *[np.asarray(x, dtype=float) for x in (d_p, rho_p, rho_f, mu)]
+    )
+    v_r = terminal_velocity_array(d_p, rho_f - rho_p, rho_f, mu, g, tol, max_iter)
+
+    # Particles denser than the fluid keep the Stokes velocity, as in the scalar version
+    return -np.where(rho_f - rho_p > 0, v_r, (g * (rho_f - rho_p) * d_p**2) / (18 * mu))
+
+
+def terminal_velocity_array(d_p, delta_rho, rho_f, mu, g=9.81, tol=1e-10, max_iter=100):
+    """Terminal velocities (m/s) of particles with a density difference delta_rho (kg/m³) to the fluid, selecting the Stokes, intermediate or Newton regime of each particle with masks (same equations as calculate_settling_velocity)"""
+
+    # Stokes' Law (Re < 0.1)
+    v_s = (g * delta_rho * d_p**2) / (18 * mu)
+    Re = (rho_f * v_s * d_p) / mu
+
+    # Intermediate regime: only the particles that have not converged yet are updated in each iteration
+    active = Re >= 0.1
+    Re_final = Re.copy()
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        idx = np.flatnonzero(active)
+        Re_i = (rho_f[idx] * v_s[idx] * d_p[idx]) / mu[idx]
+        Cd = (24 / Re_i) * (1 + 0.15 * np.float_power(Re_i, 0.687))
+        v_new = np.sqrt((4 * g * d_p[idx] * delta_rho[idx]) / (3 * Cd * rho_f[idx]))
+        converged = np.abs(v_new - v_s[idx]) <= tol * v_new
+        v_s[idx] = v_new
+        Re_final[idx] = Re_i
+        active[idx[converged]] = False
+
+    # Newton's Law (Re > 1000)
+    newton = (Re >= 0.1) & (Re_final >= 1000)
+    v_s[newton] = np.sqrt(
+        (4 * g * d_p[newton] * delta_rho[newton]) / (3 * 0.44 * rho_f[newton])
+    )
+
+    return v_s
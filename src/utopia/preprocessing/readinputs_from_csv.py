@@ -3,7 +3,15 @@
 import csv
 import pandas as pd
 import numpy as np
-from utopia.preprocessing.objects_generation import *
+from utopia.objects.compartment_classes import (
+    compartment_air,
+    compartment_deep_soil,
+    compartment_sediment,
+    compartment_soil_surface,
+    compartment_surfaceSea_water,
+    compartment_water,
+)
+from utopia.objects.particulate_classes import Particulates
 
 
 def instantiate_compartments(inputs_path_file, compartment_types):
@@ -132,6 +140,30 @@ def set_interactions(compartments, connexions_path_file):
         c.connexions = dict(zip(df_comp["Compartments"], df_comp[c.Cname]))
 
 
+def set_box_connexions(modelBoxes, box_connectivity):
+    # Create the box_connexions attributes of the compartments from the box connectivity table (one row per flow with the columns from_box, to_box, compartment and flow_m3_s): the compartment of the origin box transports particles to the same compartment of the recieving box through the box_transport process
+    boxes = {b.Bname: b for b in modelBoxes}
+
+    for row in box_connectivity.itertuples(index=False):
+        for box in [row.from_box, row.to_box]:
+            if box not in boxes:
+                raise ValueError(f"Box {box} of the box connectivity is not a model box")
+        if row.from_box == row.to_box:
+            raise ValueError(f"Box {row.from_box} can not be connected to itself")
+
+        comp = {c.Cname: c for c in boxes[row.from_box].compartments}.get(row.compartment)
+        if comp is None:
+            raise ValueError(
+                f"Compartment {row.compartment} of the box connectivity is not a model compartment"
+            )
+
+        comp.box_connexions[row.to_box] = comp.box_connexions.get(
+            row.to_box, 0
+        ) + float(row.flow_m3_s)
+        if "box_transport" not in comp.processess:
+            comp.processess.append("box_transport")
+
+
 def instantiateParticles_from_csv(compFile):
     with open(compFile, "r") as f:
         reader = csv.DictReader(f)
@@ -177,9 +209,15 @@ def generate_particles_from_df(particles_df):
 
 
 def generate_system_species_list(
-    system_particle_object_list, MPforms_list, compartmentNames_list, boxNames_list
+    system_particle_object_list,
+    MPforms_list,
+    compartmentNames_list,
+    boxNames_list,
+    particle_sizes_coding=None,
 ):
-    particle_sizes_coding = {"mp1": "a", "mp2": "b", "mp3": "c", "mp4": "d", "mp5": "e"}
+    # particle_sizes_coding maps the names of the size bins in the particles dataframe (mp1, mp2...) to their size codes
+    if particle_sizes_coding is None:
+        particle_sizes_coding = {"mp1": "a", "mp2": "b", "mp3": "c", "mp4": "d", "mp5": "e"}
 
     particle_forms_coding = dict(zip(MPforms_list, ["A", "B", "C", "D"]))
 
@@ -190,7 +228,7 @@ def generate_system_species_list(
     def particle_nameCoding(particle, boxNames_list):
         # if len(boxNames_list) != 1:
 
-        particle_sizeCode = particle_sizes_coding[particle.Pname[0:3]]
+        particle_sizeCode = particle_sizes_coding[particle.Pname.split("_")[0]]
         particle_formCode = particle_forms_coding[particle.Pform]
         particle_compartmentCode = particle_compartmentCoding[
             particle.Pcompartment.Cname
@@ -1,9 +1,7 @@
 import copy
 import pandas as pd
 
-
 # from results_processing.process_results import ResultsProcessor
-import matplotlib.pyplot as plt
 
 dispersing_comp_list = ["Air", "Ocean_Mixed_Water", "Ocean_Surface_Water"]
 
@@ -222,6 +220,7 @@ def emission_fractions_calculations(processor, model_results):
 def plot_emission_fractions(emission_fractions_data, emiss_comp):
     import pandas as pd
     import numpy as np
+    import matplotlib.pyplot as plt
 
     if len(emiss_comp) == 1:
         emiss_comp = emiss_comp[0]
@@ -292,10 +291,20 @@ def plot_emission_fractions(emission_fractions_data, emiss_comp):
     return fig
 
 
-def estimate_emission_fractions(processor):
+def emission_compartments(processor):
+    """Compartments recieving emissions (one entry per emitted size fraction)"""
+    emiss_comp = []
+    for compartment, size_fractions in processor.model.emiss_dict_g_s.items():
+        for fraction, value in size_fractions.items():
+            if value > 0:
+                emiss_comp.append(compartment)
+    return emiss_comp
+
+
+def estimate_emission_fractions(processor, plot=True):
     from utopia.results_processing.process_results import ResultsProcessor
 
-    """Estimate emission fractions"""
+    """Estimate emission fractions (and plot them if plot is True, otherwise the returned figure is None)"""
     # For estimating the emission fractions we need to make emissions to targeted compartments.
 
     # Run model with emissions to specific compartments that can cause emissions to remote regions (dispersing compartments) to estimate the emission fractions
@@ -313,8 +322,9 @@ def estimate_emission_fractions(processor):
             source_compartment = compartment
             break
 
-    # Generate new dictionaries moving emission to each dispersing compartment and run the model
+    # Generate new dictionaries moving emission to each dispersing compartment
 
+    emission_scenarios = {}
     for dispersing_comp in dispersing_comp_list:
         new_dict = copy.deepcopy(base_emiss_dict)
 
@@ -325,12 +335,16 @@ def estimate_emission_fractions(processor):
 
         # Apply the emission pattern to the target compartment
         new_dict[dispersing_comp] = copy.deepcopy(emission_pattern)
+        emission_scenarios[dispersing_comp] = new_dict
 
-        # Create a copy of the model and asign the new emissions dictionary
-        new_model = copy.copy(processor.model)
-        new_model.emiss_dict_g_s = new_dict
-        # run the new model objet to use new results
-        new_model.run()
+    # Only the emissions change between scenarios: solve all of them at once reusing the factorization of the interactions matrix of the model
+    SteadyStateResults = processor.model.solve_emission_scenarios(emission_scenarios)
+
+    for dispersing_comp in dispersing_comp_list:
+        # Create a copy of the model with the new emissions dictionary and its results
+        new_model = processor.model.copy_with_emissions(
+            emission_scenarios[dispersing_comp], SteadyStateResults[dispersing_comp]
+        )
 
         # Process results
         processor_new_model = ResultsProcessor(new_model)  # Pass model with results
@@ -350,13 +364,12 @@ def estimate_emission_fractions(processor):
     emission_fractions_mass_data = emission_fractions_calculations(
         processor, model_results
     )
-    emiss_comp = []
-    for compartment, size_fractions in processor.model.emiss_dict_g_s.items():
-        for fraction, value in size_fractions.items():
-            if value > 0:
-                emiss_comp.append(compartment)
-
-    fig = plot_emission_fractions(emission_fractions_mass_data, emiss_comp)
+    if plot:
+        fig = plot_emission_fractions(
+            emission_fractions_mass_data, emission_compartments(processor)
+        )
+    else:
+        fig = None
 
     return (emission_fractions_mass_data, fig)
 
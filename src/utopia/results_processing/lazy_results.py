@@ -0,0 +1,60 @@
+# This file contains the dictionary of processed results in which figures can be registered as functions that are only called the first time their entry is accessed, so that the numeric results can be processed without building figures (or importing matplotlib) until they are needed
+
+
+class LazyResults(dict):
+    """Dictionary of processed results with lazy entries: set_lazy(key, function) registers a function without arguments that is called the first time the entry is accessed (by indexing, get, items or values) and whose return value is then stored as the entry"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pending = {}
+
+    def set_lazy(self, key, function):
+        super().pop(key, None)
+        self.pending[key] = function
+
+    def __missing__(self, key):
+        if key not in self.pending:
+            raise KeyError(key)
+        value = self.pending.pop(key)()
+        super().__setitem__(key, value)
+        return value
+
+    def __setitem__(self, key, value):
+        self.pending.pop(key, None)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        if self.pending.pop(key, None) is None:
+            super().__delitem__(key)
+
+    def __contains__(self, key):
+        return super().__contains__(key) or key in self.pending
+
+    def __len__(self):
+        return super().__len__() + len(self.pending)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        return list(super().keys()) + list(self.pending)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def render(self):
+        """Calls the functions of all the pending entries"""
+        for key in list(self.pending):
+            self.__missing__(key)
+
+    def items(self):
+        self.render()
+        return super().items()
+
+    def values(self):
+        self.render()
+        return super().values()
+
+    def __reduce__(self):
+        # Copies and pickles keep the pending entries pending
+        return (self.__class__, (dict(super().items()),), {"pending": self.pending})
@@ -12,7 +12,7 @@ def massBalance(model):
 
     for p in model.system_particle_object_list:
 
-        if p.Pcode[0] == "a":
+        if p.Psize_index == 0:
             elimination_rates.append(
                 sum(
                     [
@@ -49,10 +49,11 @@ def compartment_massBalance(
     comp,
     tables_outputFlows,
     PartMass_t0,
-    comp_dict_inverse,
+    species_index,
     dict_comp,
     tables_inputFlows,
 ):
+    """Inflow and outflow (g/s) of a compartment. The compartment and size bin of each species are taken from the model species_index"""
     loss_processess = ["k_discorporation", "k_burial", "k_sequestration_deep_soils"]
 
     # fragmentation is a loss process only for the smallest size bin (a=0.5nm)
@@ -76,14 +77,14 @@ def compartment_massBalance(
     ]
     comp_loss_processess = loss_processess + transfer_processes
 
+    size_index = species_index.coordinates(list(tables_outputFlows[comp].index))[0]
     outputs_frag = sum(
         [
             sum(val)
-            for i, val in zip(
-                tables_outputFlows[comp].index[0],
-                tables_outputFlows[comp]["k_fragmentation"],
+            for Psize_index, val in zip(
+                size_index, tables_outputFlows[comp]["k_fragmentation"]
             )
-            if i == 0.5
+            if Psize_index == 0
         ]
     )
     # output flow from fragmentation should be == 0 as we account fragemntation of the smallest size fraction as dissintegration
@@ -114,7 +115,7 @@ def compartment_massBalance(
     # Emissions
     for i, s in zip(PartMass_t0.index, PartMass_t0.values):
         if sum(s) != 0:
-            if comp_dict_inverse[float(i[2:-7])] == comp:
+            if species_index.compartment_of(i) == comp:
                 emiss_flow_g_s = -sum(s)
             else:
                 emiss_flow_g_s = 0
@@ -0,0 +1,217 @@
+# This file contains the flows of every species through every process as arrays (species x process destination) computed from the rate constants and the steady state results, and the tables of output and input flows per compartment derived from them
+
+import numpy as np
+import pandas as pd
+
+
+class ProcessFlows:
+    """Flows in mass (g/s) and particle number (#/s) of every species (rows, in the order of the SpeciesList) through every process (columns). The list-valued rate constants (e.g. fragmentation into every smaller size bin, dry deposition to every surface compartment) are expanded into one column per destination: the columns are the (process, position) pairs of the column index. Species whose compartment does not include a process have NaN flows for it."""
+
+    def __init__(
+        self,
+        SpeciesList,
+        compartments,
+        columns,
+        list_length,
+        rate_constants,
+        mass_g,
+        number,
+        compartment_processes=None,
+    ):
+        self.SpeciesList = list(SpeciesList)
+        self.compartments = np.asarray(compartments, dtype=object)
+        self.columns = pd.MultiIndex.from_tuples(columns, names=["process", "position"])
+        self.processes = list(dict.fromkeys(self.columns.get_level_values(0)))
+        self.column_start = {
+            process: self.columns.get_loc((process, 0)) for process in self.processes
+        }
+        # Length of the list-valued rate constants of each species and process (0 for the scalar ones)
+        self.list_length = list_length
+        self.rate_constants = rate_constants
+        self.mass = rate_constants * np.asarray(mass_g, dtype=float)[:, None]
+        self.number = rate_constants * np.asarray(number, dtype=float)[:, None]
+        # Processes of each compartment in the order of the RateConstants dictionaries (by default in the order of the columns)
+        if compartment_processes is None:
+            starts = [self.column_start[process] for process in self.processes]
+            present = ~np.isnan(rate_constants[:, starts])
+            compartment_processes = {
+                comp: [
+                    process
+                    for process, has_process in zip(
+                        self.processes, present[self.compartments == comp].any(axis=0)
+                    )
+                    if has_process
+                ]
+                for comp in dict.fromkeys(self.compartments)
+            }
+        self.compartment_processes = compartment_processes
+
+    @classmethod
+    def from_particles(cls, system_particle_object_list, mass_g=None, number=None):
+        """Flows from the RateConstants dictionaries of the particle objects and the steady state mass and particle number of every species (by default the Pmass_g_SS and Pnum_SS of the particle objects)"""
+        widths = {}
+        compartment_processes = {}
+        for p in system_particle_object_list:
+            processes = compartment_processes.setdefault(p.Pcompartment.Cname, {})
+            processes.update(dict.fromkeys(p.RateConstants))
+            for process, k in p.RateConstants.items():
+                widths[process] = max(
+                    widths.get(process, 1), len(k) if isinstance(k, list) else 1
+                )
+        columns = [
+            (process, position)
+            for process, width in widths.items()
+            for position in range(width)
+        ]
+        column_start = {process: columns.index((process, 0)) for process in widths}
+        process_position = {process: n for n, process in enumerate(widths)}
+
+        rate_constants = np.full(
+            (len(system_particle_object_list), len(columns)), np.nan
+        )
+        list_length = np.zeros(
+            (len(system_particle_object_list), len(widths)), dtype=int
+        )
+        for i, p in enumerate(system_particle_object_list):
+            for process, k in p.RateConstants.items():
+                start = column_start[process]
+                if isinstance(k, list):
+                    rate_constants[i, start : start + len(k)] = k
+                    list_length[i, process_position[process]] = len(k)
+                else:
+                    rate_constants[i, start] = k
+
+        return cls(
+            [p.Pcode for p in system_particle_object_list],
+            [p.Pcompartment.Cname for p in system_particle_object_list],
+            columns,
+            list_length,
+            rate_constants,
+            (
+                [p.Pmass_g_SS for p in system_particle_object_list]
+                if mass_g is None
+                else mass_g
+            ),
+            (
+                [p.Pnum_SS for p in system_particle_object_list]
+                if number is None
+                else number
+            ),
+            {
+                comp: list(processes)
+                for comp, processes in compartment_processes.items()
+            },
+        )
+
+    def flows(self, unit):
+        """Array of flows (species x columns) in mass or particle number (unit "mass" or "number")"""
+        if unit == "mass":
+            return self.mass
+        elif unit == "number":
+            return self.number
+        raise ValueError("Unit must be 'mass' or 'number'.")
+
+    def to_dataframe(self, unit):
+        """Dataframe of the flows with the expanded (process, position) columns indexed by species code"""
+        return pd.DataFrame(
+            self.flows(unit), index=self.SpeciesList, columns=self.columns
+        )
+
+    def process_values(self, unit, process, rows=slice(None)):
+        """Flows of a process as in the RateConstants dictionaries: a float array or, if the process has list-valued rate constants, an object array of floats and lists (one element per destination)"""
+        flows = self.flows(unit)[rows]
+        start = self.column_start[process]
+        list_length = self.list_length[rows, self.processes.index(process)]
+        if not list_length.any():
+            return flows[:, start]
+        width = list_length.max()
+        values = np.empty(len(flows), dtype=object)
+        for n, (row, length) in enumerate(
+            zip(flows[:, start : start + width].tolist(), list_length)
+        ):
+            values[n] = row[:length] if length else row[0]
+        return values
+
+    def destination_values(self, unit, process, position, rows=slice(None)):
+        """Flows of a process to the destination given by its position in the list-valued rate constants (the flows of the species with a scalar rate constant are taken as they are)"""
+        flows = self.flows(unit)[rows]
+        start = self.column_start[process]
+        is_list = self.list_length[rows, self.processes.index(process)] > 0
+        return np.where(is_list, flows[:, start + position], flows[:, start])
+
+    def process_totals(self, unit, process):
+        """Flows of every species through a process summed over its destinations (0 for the species whose compartment does not include the process)"""
+        if process not in self.column_start:
+            return np.zeros(len(self.SpeciesList))
+        start = self.column_start[process]
+        width = self.list_length[:, self.processes.index(process)].max() or 1
+        return np.nansum(self.flows(unit)[:, start : start + width], axis=1)
+
+    def process_rate_constants(self, process, position=None):
+        """Rate constants (1/s) of every species for a process summed over its destinations, or those to the destination given by its position in the list-valued rate constants (0 for the species whose compartment does not include the process)"""
+        if process not in self.column_start:
+            return np.zeros(len(self.SpeciesList))
+        start = self.column_start[process]
+        if position is not None:
+            return np.nan_to_num(self.rate_constants[:, start + position])
+        width = self.list_length[:, self.processes.index(process)].max() or 1
+        return np.nansum(self.rate_constants[:, start : start + width], axis=1)
+
+    def output_tables(self, unit):
+        """Tables of output flows per compartment (species x processes of the compartment) with the values of the list-valued rate constants kept as lists, built from a single groupby over the compartments of the species"""
+        table = pd.DataFrame(
+            {process: self.process_values(unit, process) for process in self.processes},
+            index=self.SpeciesList,
+        )
+        tables = {}
+        positions = pd.Series(np.arange(len(self.SpeciesList)))
+        for comp, rows in positions.groupby(self.compartments, sort=False):
+            tables[comp] = table.iloc[rows.to_numpy()][self.compartment_processes[comp]]
+        return tables
+
+    def input_tables(self, unit, dict_comp, surfComp_list):
+        """Tables of input flows per compartment (flows recieved through transport from the connected compartments, one row per species of the origin compartment and one column per process). The flows of the list-valued processes are those to the recieving compartment: deposition flows by position of the compartment in the list of surface compartments, mixing flows of the ocean mixed water to the surface (first) and column (second) water and other flows by position of the compartment among the connexions of the origin compartment through the same process"""
+        rows_of = {
+            comp: np.flatnonzero(self.compartments == comp) for comp in dict_comp
+        }
+        species = np.asarray(self.SpeciesList, dtype=object)
+
+        tables = {}
+        for comp in dict_comp:
+            comp_input_flows = []
+            for e_comp in dict_comp:
+                connexions = dict_comp[e_comp].connexions
+                if comp not in connexions:
+                    continue
+                rows = rows_of[e_comp]
+                inpProc = connexions[comp]
+                columns = {}
+                if type(inpProc) == list:
+                    for proc in inpProc:
+                        if proc == "dry_deposition" or proc == "wet_deposition":
+                            position = surfComp_list.index(comp)
+                        elif proc == "mixing" and e_comp == "Ocean_Mixed_Water":
+                            position = {
+                                "Ocean_Surface_Water": 0,
+                                "Ocean_Column_Water": 1,
+                            }.get(comp)
+                        else:
+                            position = None
+                        columns["k_" + proc] = (
+                            self.process_values(unit, "k_" + proc, rows)
+                            if position is None
+                            else self.destination_values(
+                                unit, "k_" + proc, position, rows
+                            )
+                        )
+                else:
+                    connecting_comp = [
+                        key for key, value in connexions.items() if value == inpProc
+                    ]
+                    columns["k_" + inpProc] = self.destination_values(
+                        unit, "k_" + inpProc, connecting_comp.index(comp), rows
+                    )
+                comp_input_flows.append(pd.DataFrame(columns, index=species[rows]))
+
+            tables[comp] = pd.concat(comp_input_flows).fillna(0)
+        return tables
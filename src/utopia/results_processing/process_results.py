@@ -1,22 +1,30 @@
-import matplotlib.pyplot as plt
+from functools import partial
 import numpy as np
-import seaborn as sns
-from matplotlib.colors import LogNorm
 import pandas as pd
-from utopia.helpers import *
-from utopia.preprocessing.fill_interactions_dictionaries import *
-from utopia.results_processing.exposure_indicators_calculation import *
-from utopia.solver_steady_state import *
-from utopia.results_processing.emission_fractions_calculation import *
+from utopia.helpers import handle_value, mass_to_num
+from utopia.preprocessing.fill_interactions_dictionaries import (
+    process_interaction_matrices,
+)
+from utopia.results_processing.exposure_indicators_calculation import (
+    Exposure_indicators_calculation,
+)
+from utopia.solver_steady_state import emissions_by_box
+from utopia.results_processing.emission_fractions_calculation import (
+    emission_compartments,
+    estimate_emission_fractions,
+    plot_emission_fractions,
+)
+from utopia.results_processing.process_flows import ProcessFlows
+from utopia.results_processing.lazy_results import LazyResults
 
 # from utopia.results_processing.pdf_reporting import *
 
 
 class ResultsProcessor:
-    """Provides functionalities for restructuring, analysing and plotting the UTOPIA model results."""
+    """Provides functionalities for restructuring, analysing and plotting the UTOPIA model results. matplotlib and seaborn are only imported when a figure is built."""
 
     def __init__(self, model):
-        self.processed_results = {}  # empty dictionary to store results
+        self.processed_results = LazyResults()  # empty dictionary to store results
         self.model = model
         self.R = model.R
         self.Results_extended = None
@@ -24,12 +32,18 @@ class ResultsProcessor:
     def process_results(self):
         """Reformat results dataframe for easier analysis by specifying size fractions, MP forms and compartments and deriving mass and number fractions, input and outup flows."""
         # Reformat results (R) dataframe
-        self.R["Size_Fraction_um"] = [self.model.size_dict[x[0]] for x in self.R.index]
+        species_index = self.model.species_index
+        size, form, compartment, box = species_index.coordinates(
+            species_index.positions(self.R.index)
+        )
+        self.R["Size_Fraction_um"] = [
+            self.model.size_dict[species_index.size_codes[s]] for s in size
+        ]
         self.R["MP_Form"] = [
-            self.model.MP_form_dict_reverse[x[1]] for x in self.R.index
+            self.model.MP_form_dict_reverse[species_index.form_codes[f]] for f in form
         ]
         self.R["Compartment"] = [
-            self.model.comp_dict_inverse[float(x[2:-7])] for x in self.R.index
+            species_index.compartment_names[c] for c in compartment
         ]
 
         Results = self.R[
@@ -64,148 +78,101 @@ class ResultsProcessor:
 
         """ Add input and output flows dict to results extended dataframe"""
 
-        Results_extended2 = self.addFlows_to_results_df(Results_extended)
-
-        """ Fix input flows dict to results extended dataframe"""
-
-        interactions_pp_df = fillInteractions_fun_OOP_dict(
-            self.model.system_particle_object_list,
-            self.model.SpeciesList,
-            self.surfComp_list,
+        # Inflows of each species by process: the interactions matrix decomposed by process times the steady state mass and particle number vectors
+        particles = self.model.system_particle_object_list
+        self.process_matrices, receiving_processes = process_interaction_matrices(
+            particles, self.model.SpeciesList, self.surfComp_list
+        )
+        particle_table = self.model.particle_table
+        mass_g = particle_table.mass_SS
+        # Pnum_SS (particle number at steady state) estimated from the volume and density of each particle object
+        number = mass_to_num(
+            mass_g, particle_table.volume_m3, particle_table.density_kg_m3
+        )
+        for p, n in zip(particles, number.tolist()):
+            p.Pnum_SS = n
+        inflows_mass = {k: M @ mass_g for k, M in self.process_matrices.items()}
+        inflows_number = {k: M @ number for k, M in self.process_matrices.items()}
+
+        # Emission rate of each species (emissions of its box, compartment and size fraction)
+        emission_rate_g_s = np.zeros(len(particles))
+        species_index = self.model.species_index
+        for box, box_emissions in emissions_by_box(
+            self.model, self.model.emiss_dict_g_s
+        ).items():
+            for comp, comp_emissions in box_emissions.items():
+                for size, emission in comp_emissions.items():
+                    emission_rate_g_s[
+                        species_index.select(size=size, compartment=comp, box=box)
+                    ] = emission
+        emission_rate_num_s = mass_to_num(
+            emission_rate_g_s, particle_table.volume_m3, particle_table.density_kg_m3
         )
-        # Estimate Pnum_SS (particle number at steady state) for each particle object in the system
-        for p in self.model.system_particle_object_list:
-            p.Pnum_SS = mass_to_num(p.Pmass_g_SS, p.Pvolume_m3, p.Pdensity_kg_m3)
-        # Create a dictionary of recieving inflows per particle taking the values from the interactions matrix
-        particle_inflows_dict_mass = {}
-        particle_inflows_dict_number = {}
-        for p in self.model.system_particle_object_list:
-            inflows_p_mass = []
-            inflows_p_num = []
-            emission_rate_g_s = self.model.emiss_dict_g_s[p.Pcompartment.Cname][
-                p.Pcode[0]
-            ]
-            emission_rate_num_s = mass_to_num(
-                emission_rate_g_s, p.Pvolume_m3, p.Pdensity_kg_m3
-            )
-            for p2 in self.model.system_particle_object_list:
-                interaction_rate = interactions_pp_df[p2.Pcode][p.Pcode]
-                if type(interaction_rate) == dict:
-                    inflow = {k: v * p2.Pmass_g_SS for k, v in interaction_rate.items()}
-                    inflows_p_mass.append(inflow)
-                    inflows_p_num.append(
-                        {k: v * p2.Pnum_SS for k, v in interaction_rate.items()}
-                    )
-                else:
-                    inflows_p_mass.append(interaction_rate * p2.Pmass_g_SS)
-                    inflows_p_num.append(interaction_rate * p2.Pnum_SS)
-            dict_list = [item for item in inflows_p_mass if isinstance(item, dict)]
-            dict_list_num = [item for item in inflows_p_num if isinstance(item, dict)]
-            merged_dict = {}
-            merged_dict_num = {}
-            for d in dict_list:
-                for k, v in d.items():
-                    if k in merged_dict:
-                        merged_dict[k] += v
-                    else:
-                        merged_dict[k] = v
-            for d in dict_list_num:
-                for k, v in d.items():
-                    if k in merged_dict_num:
-                        merged_dict_num[k] += v
-                    else:
-                        merged_dict_num[k] = v
-
-            particle_inflows_dict_mass[p.Pcode] = merged_dict
-            particle_inflows_dict_number[p.Pcode] = merged_dict_num
-            # Add the emission rate to the inflow dictionary
-            merged_dict["Emission_flow"] = emission_rate_g_s
-            merged_dict_num["Emission_flow"] = emission_rate_num_s
-
-        # Substitute the inputflow values in the results_extended dataframe:
-        for ele in particle_inflows_dict_mass:
-            Results_extended2.at[ele, "inflows_g_s"] = particle_inflows_dict_mass[ele]
-        for ele in particle_inflows_dict_number:
-            Results_extended.at[ele, "inflows_num_s"] = particle_inflows_dict_number[
-                ele
-            ]
-        # Add total input and putput flows to Results extended dataframe
-        Results_extended2["Total_inflows_g_s"] = [
-            sum(Results_extended2.iloc[i].inflows_g_s.values())
-            for i in range(len(Results_extended2))
-        ]
 
-        Results_extended2["Total_outflows_g_s"] = [
-            sum(Results_extended2.iloc[i].outflows_g_s.values())
-            for i in range(len(Results_extended2))
-        ]
+        # Dictionaries of recieving inflows per particle
+        particle_inflows_dict_mass = []
+        particle_inflows_dict_number = []
+        for i, processes in enumerate(receiving_processes):
+            merged_dict = {k: inflows_mass[k][i] for k in processes}
+            merged_dict["Emission_flow"] = emission_rate_g_s[i]
+            particle_inflows_dict_mass.append(merged_dict)
+            merged_dict_num = {k: inflows_number[k][i] for k in processes}
+            merged_dict_num["Emission_flow"] = emission_rate_num_s[i]
+            particle_inflows_dict_number.append(merged_dict_num)
+
+        Results_extended["inflows_g_s"] = particle_inflows_dict_mass
+        Results_extended["inflows_num_s"] = particle_inflows_dict_number
+        Results_extended = self.addFlows_to_results_df(Results_extended)
 
-        Results_extended2["Total_inflows_num_s"] = [
-            sum(Results_extended2.iloc[i].inflows_num_s.values())
-            for i in range(len(Results_extended2))
-        ]
-
-        Results_extended2["Total_outflows_num_s"] = [
-            sum(Results_extended2.iloc[i].outflows_num_s.values())
-            for i in range(len(Results_extended2))
-        ]
-        self.Results_extended = Results_extended2
-        self.processed_results["Results_extended"] = Results_extended2
+        # Add total input and putput flows to Results extended dataframe
+        for column, flows in [
+            ("Total_inflows_g_s", "inflows_g_s"),
+            ("Total_outflows_g_s", "outflows_g_s"),
+            ("Total_inflows_num_s", "inflows_num_s"),
+            ("Total_outflows_num_s", "outflows_num_s"),
+        ]:
+            Results_extended[column] = [
+                sum(flows_dict.values()) for flows_dict in Results_extended[flows]
+            ]
+        self.Results_extended = Results_extended
+        self.processed_results["Results_extended"] = Results_extended
 
     def addFlows_to_results_df(self, Results_extended):
-        """Calculate inflows and outflows (mass and number) and update Results_extended."""
-        inflows_mass_list = []
-        inflows_num_list = []
-        outflows_mass_list = []
-        outflows_num_list = []
-
-        for n in range(len(Results_extended)):
-            compartment = Results_extended.iloc[n]["Compartment"]
-            size_fraction = Results_extended.iloc[n]["Size_Fraction_um"]
-            mp_form = Results_extended.iloc[n]["MP_Form"]
-
-            # Calculate inflows and outflows for mass
-            inflows_mass = process_flows(
-                compartment, size_fraction, mp_form, "input_flows", self.flows_dict_mass
-            )
-            outflows_mass = process_flows(
-                compartment,
-                size_fraction,
-                mp_form,
-                "output_flows",
-                self.flows_dict_mass,
-            )
-            inflows_mass_list.append(inflows_mass)
-            outflows_mass_list.append(outflows_mass)
-
-            # Calculate inflows and outflows for number
-            inflows_num = process_flows(
-                compartment,
-                size_fraction,
-                mp_form,
-                "input_flows",
-                self.flows_dict_number,
-            )
-            outflows_num = process_flows(
-                compartment,
-                size_fraction,
-                mp_form,
-                "output_flows",
-                self.flows_dict_number,
-            )
-            inflows_num_list.append(inflows_num)
-            outflows_num_list.append(outflows_num)
-
-        # Update the Results_extended DataFrame with the calculated flows
-        Results_extended["inflows_g_s"] = inflows_mass_list
-        Results_extended["inflows_num_s"] = inflows_num_list
-        Results_extended["outflows_g_s"] = outflows_mass_list
-        Results_extended["outflows_num_s"] = outflows_num_list
+        """Add the output flows (mass and number) of each species by process to Results_extended. The flows of the list-valued processes are summed over their destinations and the flows of the species of the same compartment, size fraction and MP form in every box are added together."""
+        flows = self.process_flows
+        species_index = self.model.species_index
+        _, group = np.unique(
+            np.column_stack(
+                [species_index.compartment, species_index.size, species_index.form]
+            ),
+            axis=0,
+            return_inverse=True,
+        )
+        group = group.ravel()
+        positions = species_index.positions(Results_extended.index)
+
+        for unit, column in [("mass", "outflows_g_s"), ("number", "outflows_num_s")]:
+            totals = {
+                process: np.bincount(
+                    group, weights=flows.process_totals(unit, process)
+                )[group].tolist()
+                for process in flows.processes
+            }
+            Results_extended[column] = [
+                {
+                    process: totals[process][i]
+                    for process in flows.compartment_processes[flows.compartments[i]]
+                }
+                for i in positions
+            ]
 
         return Results_extended
 
     def plot_fractionDistribution_heatmaps(self, fraction):
         """Plots the mass and number fractions after they have been extracted to the Results_extended df."""
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+
         if self.Results_extended is None:
             raise ValueError(
                 "Mass and particle number fractions not extracted. Call process_results() first."
@@ -314,6 +281,7 @@ class ResultsProcessor:
         return fig  # , titlename
 
     def generate_flows_dict(self):
+        species_index = self.model.species_index
         for unit in ["mass", "number"]:
             if unit == "mass":
                 tables_inputFlows = self.tables_inputFlows_mass
@@ -332,9 +300,14 @@ class ResultsProcessor:
                 df1 = tables_outputFlows[comp].copy()
                 MP_size_df1 = []
                 MP_form_df1 = []
-                for x in df1.index:
-                    MP_size_df1.append(self.model.size_dict[x[0]])
-                    MP_form_df1.append(self.model.MP_form_dict_reverse[x[1:2]])
+                size, form, _, _ = species_index.coordinates(list(df1.index))
+                for s, f in zip(size, form):
+                    MP_size_df1.append(
+                        self.model.size_dict[species_index.size_codes[s]]
+                    )
+                    MP_form_df1.append(
+                        self.model.MP_form_dict_reverse[species_index.form_codes[f]]
+                    )
 
                 df1.insert(0, "MP_size", MP_size_df1)
                 df1.insert(1, "MP_form", MP_form_df1)
@@ -344,9 +317,14 @@ class ResultsProcessor:
                 df2 = tables_inputFlows[comp].copy()
                 MP_size_df2 = []
                 MP_form_df2 = []
-                for y in df2.index:
-                    MP_size_df2.append(self.model.size_dict[y[0]])
-                    MP_form_df2.append(self.model.MP_form_dict_reverse[y[1:2]])
+                size, form, _, _ = species_index.coordinates(list(df2.index))
+                for s, f in zip(size, form):
+                    MP_size_df2.append(
+                        self.model.size_dict[species_index.size_codes[s]]
+                    )
+                    MP_form_df2.append(
+                        self.model.MP_form_dict_reverse[species_index.form_codes[f]]
+                    )
                 df2.insert(0, "MP_size", MP_size_df2)
                 df2.insert(1, "MP_form", MP_form_df2)
                 flows_dict["input_flows"][comp] = df2
@@ -356,293 +334,141 @@ class ResultsProcessor:
                 self.flows_dict_number = flows_dict
 
     def estimate_flows(self):
-
+        """Estimate flows corresponding to each mode process based on the model results: arrays of flows of every species through every process (process_flows) and tables of output and input flows per compartment (in mass and particle number)."""
         self.surfComp_list = [c for c in self.model.dict_comp if "Surface" in c]
-        """Estimate flows corresponding to each mode process based on the model results."""
-        # Outflows ( in mass and particle number)
-        for p in self.model.system_particle_object_list:
-            p.outFlow_mass_g_s = {}
-            p.outFlow_number_g_s = {}
-            for c in p.RateConstants:
-                if type(p.RateConstants[c]) == list:
-                    p.outFlow_mass_g_s[c] = [
-                        R * p.Pmass_g_SS for R in p.RateConstants[c]
-                    ]
-                    p.outFlow_number_g_s[c] = [
-                        R * p.Pnum_SS for R in p.RateConstants[c]
-                    ]
-                else:
-                    p.outFlow_mass_g_s[c] = p.RateConstants[c] * p.Pmass_g_SS
-                    p.outFlow_number_g_s[c] = p.RateConstants[c] * p.Pnum_SS
+        particle_table = self.model.particle_table
+        self.process_flows = ProcessFlows.from_particles(
+            self.model.system_particle_object_list,
+            mass_g=particle_table.mass_SS,
+            number=particle_table.num_SS,
+        )
 
         # Tables of output flows per compartmet
-        tables_outputFlows_mass = {}
-        tables_outputFlows_number = {}
-        for c in list(self.model.dict_comp.keys()):
-            part_dic_mass = {}
-            part_dic_number = {}
-            for p in self.model.system_particle_object_list:
-                if p.Pcompartment.Cname == c:
-                    part_dic_mass[p.Pcode] = pd.DataFrame.from_dict(
-                        p.outFlow_mass_g_s, orient="index"
-                    )
-                    part_dic_number[p.Pcode] = pd.DataFrame.from_dict(
-                        p.outFlow_number_g_s, orient="index"
-                    )
-            tables_outputFlows_mass[c] = pd.concat(part_dic_mass, axis=1).transpose()
-            tables_outputFlows_number[c] = pd.concat(
-                part_dic_number, axis=1
-            ).transpose()
-
-        for k in tables_outputFlows_mass:
-            tables_outputFlows_mass[k] = (
-                tables_outputFlows_mass[k].reset_index(level=1).drop("level_1", axis=1)
-            )
-            tables_outputFlows_number[k] = (
-                tables_outputFlows_number[k]
-                .reset_index(level=1)
-                .drop("level_1", axis=1)
-            )
-        self.tables_outputFlows_mass = tables_outputFlows_mass
-        self.tables_outputFlows_number = tables_outputFlows_number
+        self.tables_outputFlows_mass = self.process_flows.output_tables("mass")
+        self.tables_outputFlows_number = self.process_flows.output_tables("number")
 
         # Inflows: Tables of recieving flows through transport from other compartments
-        tables_inputFlows_mass = {}
-        tables_inputFlows_number = {}
-        for comp in list(self.model.dict_comp.keys()):
-            comp_input_flows_mass = []
-            comp_input_flows_num = []
-            for e_comp in self.model.dict_comp:
-                if comp in self.model.dict_comp[e_comp].connexions:
-                    inpProc = self.model.dict_comp[e_comp].connexions[comp]
-                    if (
-                        type(inpProc) == list
-                    ):  # When there is more than one process of inflow into the compartment
-                        df_inflows = tables_outputFlows_mass[e_comp].loc[
-                            :, ["k_" + ele for ele in inpProc]
-                        ]
-                        df_inflows_num = self.tables_outputFlows_number[e_comp].loc[
-                            :, ["k_" + ele for ele in inpProc]
-                        ]
-
-                        for proc in inpProc:
-                            if proc == "dry_deposition" or proc == "wet_deposition":
-                                position = self.surfComp_list.index(comp)
-                                df_inflows["k_" + proc] = df_inflows["k_" + proc].apply(
-                                    lambda x: x[position] if isinstance(x, list) else x
-                                )
-                                df_inflows_num["k_" + proc] = df_inflows_num[
-                                    "k_" + proc
-                                ].apply(
-                                    lambda x: x[position] if isinstance(x, list) else x
-                                )
-
-                            elif proc == "mixing":
-
-                                if (
-                                    e_comp == "Ocean_Mixed_Water"
-                                    and comp == "Ocean_Surface_Water"
-                                ):
-                                    df_inflows["k_" + proc] = df_inflows[
-                                        "k_" + proc
-                                    ].apply(
-                                        lambda x: x[0] if isinstance(x, list) else x
-                                    )
-                                    df_inflows_num["k_" + proc] = df_inflows_num[
-                                        "k_" + proc
-                                    ].apply(
-                                        lambda x: x[0] if isinstance(x, list) else x
-                                    )
-
-                                elif (
-                                    e_comp == "Ocean_Mixed_Water"
-                                    and comp == "Ocean_Column_Water"
-                                ):
-                                    df_inflows["k_" + proc] = df_inflows[
-                                        "k_" + proc
-                                    ].apply(
-                                        lambda x: x[1] if isinstance(x, list) else x
-                                    )
-                                    df_inflows_num["k_" + proc] = df_inflows_num[
-                                        "k_" + proc
-                                    ].apply(
-                                        lambda x: x[1] if isinstance(x, list) else x
-                                    )
-                                else:
-                                    pass
-                                # Revisit for percollation and tillage
-                            else:
-                                pass
-                        comp_input_flows_mass.append(df_inflows)
-                        comp_input_flows_num.append(df_inflows_num)
-
-                    else:
-                        df_inflows = (
-                            tables_outputFlows_mass[e_comp]
-                            .loc[:, "k_" + inpProc]
-                            .to_frame()
-                        )
-                        df_inflows_num = (
-                            tables_outputFlows_number[e_comp]
-                            .loc[:, "k_" + inpProc]
-                            .to_frame()
-                        )
-                        for ele in df_inflows["k_" + inpProc]:
-                            if type(ele) == list:
-                                connecting_comp = {
-                                    key: value
-                                    for key, value in self.model.dict_comp[
-                                        e_comp
-                                    ].connexions.items()
-                                    if value == inpProc
-                                }
-                                poss_dict = {
-                                    key: index
-                                    for index, key in enumerate(connecting_comp.keys())
-                                }
-                                possition = poss_dict[comp]
-                                df_inflows["k_" + inpProc] = df_inflows[
-                                    "k_" + inpProc
-                                ].apply(
-                                    lambda x: x[possition] if isinstance(x, list) else x
-                                )
-                                df_inflows_num["k_" + inpProc] = df_inflows_num[
-                                    "k_" + inpProc
-                                ].apply(
-                                    lambda x: x[possition] if isinstance(x, list) else x
-                                )
-
-                            else:
-                                pass
-                        comp_input_flows_mass.append(df_inflows)
-                        comp_input_flows_num.append(df_inflows_num)
-                else:
-                    pass
-
-            tables_inputFlows_mass[comp] = pd.concat(comp_input_flows_mass).fillna(0)
-            tables_inputFlows_number[comp] = pd.concat(comp_input_flows_num).fillna(0)
-
-        self.tables_inputFlows_mass = tables_inputFlows_mass
-        self.tables_inputFlows_number = tables_inputFlows_number
+        self.tables_inputFlows_mass = self.process_flows.input_tables(
+            "mass", self.model.dict_comp, self.surfComp_list
+        )
+        self.tables_inputFlows_number = self.process_flows.input_tables(
+            "number", self.model.dict_comp, self.surfComp_list
+        )
 
     def extract_results_by_compartment(self):
+        """Aggregate the results by compartment (mass, particle number, mass and number fractions and concentrations) and the input and output flows of each compartment (excluding heteroaggregation, biofouling and fragmentation) in a single groupby over the species"""
         if self.Results_extended is None:
             raise ValueError(
                 "Mass and particle number fractions not extracted. Call process_results() first."
             )
-        mass_g = []
-        particle_number = []
-        mass_frac_100 = []
-        num_frac_100 = []
-        mass_conc_g_m3 = []
-        num_conc = []
-        for comp in list(self.model.dict_comp.keys()):
-            mass_g.append(
-                sum(
-                    self.Results_extended[self.Results_extended["Compartment"] == comp][
-                        "mass_g"
-                    ]
-                )
-            )
-            particle_number.append(
-                sum(
-                    self.Results_extended[self.Results_extended["Compartment"] == comp][
-                        "number_of_particles"
-                    ]
-                )
-            )
-            mass_frac_100.append(
-                sum(
-                    self.Results_extended[self.Results_extended["Compartment"] == comp][
-                        "mass_fraction"
-                    ]
-                )
-                * 100
-            )
-            num_frac_100.append(
-                sum(
-                    self.Results_extended[self.Results_extended["Compartment"] == comp][
-                        "number_fraction"
-                    ]
-                )
-                * 100
+        compartments = list(self.model.dict_comp.keys())
+        excluded_columns = [
+            "k_heteroaggregation",
+            "k_heteroaggregate_breackup",
+            "k_biofouling",
+            "k_defouling",
+            "k_fragmentation",
+        ]
+        Results_extended = self.Results_extended
+        species_compartment = pd.Categorical(
+            Results_extended["Compartment"], categories=compartments
+        )
+
+        # Numeric columns to aggregate: the results columns and the output flows dictionaries unpacked into one column per process (list-valued flows summed over their destinations)
+        numeric_columns = {
+            column: Results_extended[column].to_numpy(dtype=float)
+            for column in [
+                "mass_g",
+                "number_of_particles",
+                "mass_fraction",
+                "number_fraction",
+                "concentration_g_m3",
+                "concentration_num_m3",
+            ]
+        }
+        for unit, flows in [("g_s", "outflows_g_s"), ("num_s", "outflows_num_s")]:
+            unpacked = pd.DataFrame.from_records(
+                [
+                    {k: handle_value(v) for k, v in flows_dict.items()}
+                    for flows_dict in Results_extended[flows]
+                ]
             )
-            mass_conc_g_m3.append(
-                sum(
-                    self.Results_extended[self.Results_extended["Compartment"] == comp][
-                        "concentration_g_m3"
-                    ]
+            for process in unpacked.columns:
+                numeric_columns[(unit, process)] = unpacked[process].to_numpy(
+                    dtype=float
                 )
-            )
-            num_conc.append(
-                sum(
-                    self.Results_extended[self.Results_extended["Compartment"] == comp][
-                        "concentration_num_m3"
-                    ]
+        by_comp = (
+            pd.DataFrame(numeric_columns)
+            .groupby(species_compartment, observed=False, sort=True)
+            .sum()
+        )
+
+        # Input flows of each compartment: the input flow tables (already numeric) stacked and summed by recieving compartment
+        inflows = {}
+        for unit, flows_dict in [
+            ("g_s", self.flows_dict_mass),
+            ("num_s", self.flows_dict_number),
+        ]:
+            tables = flows_dict["input_flows"]
+            inflows[unit] = (
+                pd.concat(
+                    [
+                        tables[comp].drop(["MP_size", "MP_form"], axis=1)
+                        for comp in tables
+                    ],
+                    keys=list(tables),
+                    names=["Compartment", "species"],
                 )
+                .groupby(level="Compartment", sort=False)
+                .sum()
             )
 
-        results_by_comp = pd.DataFrame(columns=["Compartments"])
-        results_by_comp["Compartments"] = list(self.model.dict_comp.keys())
-        results_by_comp["mass_g"] = mass_g
-        results_by_comp["number_of_particles"] = particle_number
-        results_by_comp["%_mass"] = mass_frac_100
-        results_by_comp["%_number"] = num_frac_100
-        results_by_comp["Concentration_g_m3"] = mass_conc_g_m3
-        results_by_comp["Concentration_num_m3"] = num_conc
-
-        # self.results_by_comp = results_by_comp
-        # return results_by_comp
-        """Calculate inflows and outflows (mass and number) by compartment and update results_by_comp."""
-        inflows_mass_list = []
-        inflows_num_list = []
-        outflows_mass_list = []
-        outflows_num_list = []
-
-        for n in range(len(results_by_comp)):
-            compartment = results_by_comp.iloc[n]["Compartments"]
-
-            # Calculate inflows and outflows for mass
-            inflows_mass = process_flows_comp(
-                compartment, "input_flows", self.flows_dict_mass
-            )
-            outflows_mass = process_flows_comp(
-                compartment, "output_flows", self.flows_dict_mass
+        def flows_by_comp(flow_type, unit):
+            """Dictionaries of flows by process of each compartment (in the order of the processes of the flow tables)"""
+            flows_dict = (
+                self.flows_dict_mass if unit == "g_s" else self.flows_dict_number
             )
-            inflows_mass_list.append(inflows_mass)
-            outflows_mass_list.append(outflows_mass)
+            flows = []
+            for comp in compartments:
+                processes = [
+                    col
+                    for col in flows_dict[flow_type][comp].columns
+                    if col not in ["MP_size", "MP_form"] + excluded_columns
+                ]
+                if flow_type == "input_flows":
+                    values = inflows[unit].loc[comp, processes]
+                else:
+                    values = by_comp.loc[comp, [(unit, col) for col in processes]]
+                flows.append(dict(zip(processes, values.tolist())))
+            return flows
 
-            # Calculate inflows and outflows for number
-            inflows_num = process_flows_comp(
-                compartment, "input_flows", self.flows_dict_number
-            )
-            outflows_num = process_flows_comp(
-                compartment, "output_flows", self.flows_dict_number
-            )
-            inflows_num_list.append(inflows_num)
-            outflows_num_list.append(outflows_num)
-
-        # Update the Results_extended DataFrame with the calculated flows
-        results_by_comp["inflows_g_s"] = inflows_mass_list
-        results_by_comp["inflows_num_s"] = inflows_num_list
-        results_by_comp["outflows_g_s"] = outflows_mass_list
-        results_by_comp["outflows_num_s"] = outflows_num_list
-        results_by_comp["Total_inflows_g_s"] = [
-            sum(results_by_comp.iloc[i].inflows_g_s.values())
-            for i in range(len(results_by_comp))
-        ]
-        results_by_comp["Total_inflows_num_s"] = [
-            sum(results_by_comp.iloc[i].inflows_num_s.values())
-            for i in range(len(results_by_comp))
-        ]
-        results_by_comp["Total_outflows_g_s"] = [
-            sum(results_by_comp.iloc[i].outflows_g_s.values())
-            for i in range(len(results_by_comp))
-        ]
-        results_by_comp["Total_outflows_num_s"] = [
-            sum(results_by_comp.iloc[i].outflows_num_s.values())
-            for i in range(len(results_by_comp))
-        ]
+        results_by_comp = pd.DataFrame(columns=["Compartments"])
+        results_by_comp["Compartments"] = compartments
+        results_by_comp["mass_g"] = by_comp["mass_g"].to_numpy()
+        results_by_comp["number_of_particles"] = by_comp[
+            "number_of_particles"
+        ].to_numpy()
+        results_by_comp["%_mass"] = by_comp["mass_fraction"].to_numpy() * 100
+        results_by_comp["%_number"] = by_comp["number_fraction"].to_numpy() * 100
+        results_by_comp["Concentration_g_m3"] = by_comp["concentration_g_m3"].to_numpy()
+        results_by_comp["Concentration_num_m3"] = by_comp[
+            "concentration_num_m3"
+        ].to_numpy()
+
+        # Inflows and outflows (mass and number) by compartment
+        results_by_comp["inflows_g_s"] = flows_by_comp("input_flows", "g_s")
+        results_by_comp["inflows_num_s"] = flows_by_comp("input_flows", "num_s")
+        results_by_comp["outflows_g_s"] = flows_by_comp("output_flows", "g_s")
+        results_by_comp["outflows_num_s"] = flows_by_comp("output_flows", "num_s")
+        for column, flows in [
+            ("Total_inflows_g_s", "inflows_g_s"),
+            ("Total_inflows_num_s", "inflows_num_s"),
+            ("Total_outflows_g_s", "outflows_g_s"),
+            ("Total_outflows_num_s", "outflows_num_s"),
+        ]:
+            results_by_comp[column] = [
+                sum(flows_dict.values()) for flows_dict in results_by_comp[flows]
+            ]
 
         self.results_by_comp = results_by_comp
         self.processed_results["results_by_comp"] = results_by_comp
@@ -669,6 +495,9 @@ class ResultsProcessor:
         self.processed_results["RateConstants_df"] = df3
 
     def plot_rateConstants(self):
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+
         def sum_if_list(value):
             """Returns the sum of a list if the input is a list, otherwise returns the value itself."""
             return sum(value) if isinstance(value, list) else value
@@ -689,11 +518,14 @@ class ResultsProcessor:
         plt.show()
         fig = plt.gcf()
         self.processed_results["RC_violin_plot"] = fig
+        return fig
 
     def plot_compartment_distribution(
         self, mass_or_number
     ):  # mass_or_number: "%_mass" or ""%_number""
         """Bar chart plot of the mass or particle number distribution of particles by compartment."""
+        import matplotlib.pyplot as plt
+
         compartment_colors = {
             "Ocean_Surface_Water": "#756bb1",
             "Ocean_Mixed_Water": "#756bb1",
@@ -761,32 +593,52 @@ class ResultsProcessor:
         # fig = plt.gcf()
         # return fig
 
-    def process_all(self):
-        """Runs all processing steps in order automatically and stores the results in the processed_results dictionary of the the class."""
+    def process_all(self, plots=True):
+        """Runs all processing steps in order automatically and stores the results in the processed_results dictionary of the the class. plots sets how the figures are generated: True builds them all, "lazy" registers them in processed_results so that each figure is only built (and matplotlib imported) the first time its entry is accessed and False computes only the numeric tables."""
+        if plots not in [True, False, "lazy"]:
+            raise ValueError("plots must be True, False or 'lazy'.")
         self.create_rateConstants_table()
-        self.plot_rateConstants()
+        self.add_figure(
+            self.processed_results, "RC_violin_plot", self.plot_rateConstants, plots
+        )
         self.estimate_flows()
         self.generate_flows_dict()
         self.process_results()
-        fraction_heatmaps = dict()
+        fraction_heatmaps = LazyResults()
         for fraction in ["mass_fraction", "number_fraction"]:
-            fraction_heatmaps[fraction] = self.plot_fractionDistribution_heatmaps(
-                fraction
+            self.add_figure(
+                fraction_heatmaps,
+                fraction,
+                partial(self.plot_fractionDistribution_heatmaps, fraction),
+                plots,
             )
-        self.processed_results["fraction_heatmaps"] = fraction_heatmaps
+        if plots:
+            self.processed_results["fraction_heatmaps"] = fraction_heatmaps
         self.extract_results_by_compartment()
-        comp_distribution_barcharts = dict()
+        comp_distribution_barcharts = LazyResults()
         for fraction in ["%_mass", "%_number"]:
-            comp_distribution_barcharts[fraction] = self.plot_compartment_distribution(
-                fraction
+            self.add_figure(
+                comp_distribution_barcharts,
+                fraction,
+                partial(self.plot_compartment_distribution, fraction),
+                plots,
+            )
+        if plots:
+            self.processed_results["comp_distribution_barcharts"] = (
+                comp_distribution_barcharts
             )
-        self.processed_results["comp_distribution_barcharts"] = (
-            comp_distribution_barcharts
-        )
 
         # Calculate exposure indicators
         self.estimate_exposure_indicators()
-        self.estimate_emission_fractions()
+        self.estimate_emission_fractions(plot=plots)
+
+    @staticmethod
+    def add_figure(figures, name, plot, plots):
+        """Adds the figure returned by the plot function to the figures dictionary: built now (plots True), on first access (plots "lazy") or not at all (plots False)"""
+        if plots == "lazy":
+            figures.set_lazy(name, plot)
+        elif plots:
+            figures[name] = plot()
 
     def estimate_exposure_indicators(self):
         """Estimate overall size dependent exposure indicators"""
@@ -795,15 +647,29 @@ class ResultsProcessor:
             self.processed_results["size_fraction_indicators"],
         ) = Exposure_indicators_calculation(self)
 
-    def estimate_emission_fractions(self):
+    def estimate_emission_fractions(self, plot=True):
         """Estimate mass emission fractions:
         - Environmentally Dispersed Fraction (ϕ1): quantifies the relative extent to which the pollutants (MPs) can reach remote regions.
         - Remotely transferred fraction of mass (ϕ2) expresses the relative extent to which the MPs are (net) transferred to the target remote compartment following environmental dispersion to the remote region.
+        The figure of the emission fractions is built as set by plot (True, "lazy" or False, see process_all).
         """
-        (
-            self.processed_results["emission_fractions_mass_data"],
-            self.processed_results["emission_fractions_mass_figure"],
-        ) = estimate_emission_fractions(self)
+        emission_fractions_mass_data, fig = estimate_emission_fractions(
+            self, plot=plot is True
+        )
+        self.processed_results["emission_fractions_mass_data"] = (
+            emission_fractions_mass_data
+        )
+        if plot == "lazy":
+            self.processed_results.set_lazy(
+                "emission_fractions_mass_figure",
+                partial(
+                    plot_emission_fractions,
+                    emission_fractions_mass_data,
+                    emission_compartments(self),
+                ),
+            )
+        elif plot:
+            self.processed_results["emission_fractions_mass_figure"] = fig
 
     # def generate_pdf_report(self):
     #     # Create and populate the PDF
@@ -11,7 +11,7 @@ from utopia.solver_steady_state import *
 from utopia.results_processing.emission_fractions_calculation import *
 from utopia.results_processing_json.exposure_indicators_calculation_json import *
 
-import re
+from utopia.objects.species_index import SpeciesIndex
 
 # from utopia.results_processing.pdf_reporting import *
 # 之后修改 ✍️
@@ -68,6 +68,24 @@ def plot_rateConstants_json(model_json):
         return RC_df
 
 
+def species_index_json(model_json):
+    """SpeciesIndex of the species of the JSON version of the model (dictionary, or model object with the same entries as attributes) built from its particle dictionaries"""
+    if not isinstance(model_json, dict):
+        model_json = vars(model_json)
+    particles = model_json["system_particle_object_list"]
+    compartment_coding = model_json["particle_compartmentCoding"]
+    particle_forms_coding = model_json["particle_forms_coding"]
+    return SpeciesIndex.from_particle_dicts(
+        particles,
+        size_names=list(model_json["dict_size_coding"]),
+        size_codes=list(model_json["size_dict"]),
+        form_codes=[particle_forms_coding[f] for f in model_json["MPforms_list"]],
+        MPforms_list=model_json["MPforms_list"],
+        compartment_names=sorted(compartment_coding, key=compartment_coding.get),
+        box_names=list(dict.fromkeys(p["Pcompartment_CBox_Bname"] for p in particles)),
+    )
+
+
 def estimate_flows_json(model_json, flow):
 
         model_json["surfComp_list"] = [c for c in model_json["dict_comp"] if "Surface" in c]
@@ -258,19 +276,10 @@ def process_results_json(model_json, result,flow):
 
 
 
-        def extract_compartment(x):
-            match = re.search(r'(\d+)', x)
-            if match:
-                return match.group(1)  
-            else:
-                raise ValueError(f"Cannot extract compartment from {x}")
-
-        #result["result"]["Compartment"] = [
-            #model_json["comp_dict_inverse"][float(x[2:-7])] for x in result["result"].index
-        #]
-        result["result"]["Compartment"] = [
-            model_json["comp_dict_inverse"][extract_compartment(x)] for x in result["result"].index
-            ]
+        species_index = species_index_json(model_json)
+        result["result"]["Compartment"] = species_index.compartment_of(
+            list(result["result"].index)
+        )
 
         Results = result["result"][
             [
@@ -814,9 +823,9 @@ class ResultsProcessor:
         self.R["MP_Form"] = [
             self.model.MP_form_dict_reverse[x[1]] for x in self.R.index
         ]
-        self.R["Compartment"] = [
-            self.model.comp_dict_inverse[float(x[2:-7])] for x in self.R.index
-        ]
+        self.R["Compartment"] = species_index_json(self.model).compartment_of(
+            list(self.R.index)
+        )
 
         Results = self.R[
             [
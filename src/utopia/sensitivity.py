@@ -0,0 +1,373 @@
+# This file contains the global sensitivity analysis driver: Saltelli (Sobol indices) and Morris (elementary effects) designs over the model input parameters and emissions, evaluated in parallel sharing one factorization of the interactions matrix between the runs of the design that only differ in their emissions
+
+import copy
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from scipy.stats import qmc
+from utopia import monte_carlo
+from utopia.helpers import mass_to_num, number_particle
+from utopia.results_processing.exposure_indicators_calculation import (
+    seconds_per_year,
+    system_loss_rate_constants,
+)
+from utopia.solver_steady_state import emission_scenarios_array, solve_SS_scenarios
+
+
+def emission_path(parameter):
+    """Path of an emission parameter in the emissions dictionary: emission parameters are named after their entry in emiss_dict_g_s, e.g. "emiss_dict_g_s.Air.e" (or "emiss_dict_g_s.<box>.Air.e" in the spatial version). Returns None for the other (matrix) parameters"""
+    keys = parameter.split(".")
+    if keys[0] != "emiss_dict_g_s":
+        return None
+    if len(keys) not in [3, 4]:
+        raise ValueError(
+            f"Emission parameter {parameter} should be named emiss_dict_g_s.<compartment>.<size code> or emiss_dict_g_s.<box>.<compartment>.<size code>"
+        )
+    return keys[1:]
+
+
+def set_emission(emiss_dict_g_s, path, value):
+    """Sets the emission (g/s) of the entry of the emissions dictionary given by its path"""
+    for key in path[:-1]:
+        emiss_dict_g_s = emiss_dict_g_s.setdefault(key, {})
+    emiss_dict_g_s[path[-1]] = value
+
+
+def emission_basis(model, emission_parameters):
+    """2-D array of emissions (species x (1 + emission parameters), g/s): the first column holds the model emissions without the entries of the emission parameters and the others the emissions of 1 g/s of each emission parameter. As the steady state is linear in the emissions, the mass of any run is a linear combination of the steady state masses of these columns"""
+    paths = [emission_path(parameter) for parameter in emission_parameters]
+
+    base_emissions = copy.deepcopy(model.emiss_dict_g_s)
+    for path in paths:
+        set_emission(base_emissions, path, 0)
+
+    unit_emissions = []
+    for path in paths:
+        unit_emissions.append({})
+        set_emission(unit_emissions[-1], path, 1.0)
+
+    return emission_scenarios_array(model, [base_emissions] + unit_emissions)
+
+
+def number_per_gram(p):
+    """Number of particles per gram of mass of a particle object, as calculated in steady_state_results (heteroaggregated particles are counted as their free microplastic)"""
+    p = number_particle(p)
+    return mass_to_num(1, p.Pvolume_m3, p.Pdensity_kg_m3)
+
+
+def output_names(model):
+    """Names of the outputs of the sensitivity analysis: total mass per compartment (g) and the overall persistence (Pov) and residence time (Tov) in mass and particle number (years)"""
+    return ["mass_g_" + c for c in model.species_index.compartment_names] + [
+        "Pov_mass_years",
+        "Pov_num_years",
+        "Tov_mass_years",
+        "Tov_num_years",
+    ]
+
+
+def output_weights(model):
+    """Weights (functionals x species) of the linear functionals of the steady state mass from which the outputs are calculated with the current rate constants of the model: the mass of each compartment, the mass and particle number within the system boundaries and their discorporation and system loss flows (see system_loss_rate_constants)."""
+    particles = model.system_particle_object_list
+    species_index = model.species_index
+    compartments = np.array(species_index.compartment_names)[species_index.compartment]
+
+    def rate_constant(name, position=None):
+        k = np.zeros(len(particles))
+        for i, p in enumerate(particles):
+            value = p.RateConstants.get(name, 0)
+            if type(value) == list:
+                value = sum(value) if position is None else value[position]
+            k[i] = value
+        return k
+
+    losses = system_loss_rate_constants(compartments, rate_constant)
+    inside = losses["inside"]
+    k_discorporation = losses["discorporation"]
+    num_per_g = np.array([number_per_gram(p) for p in particles])
+    own_num_per_g = np.array(
+        [mass_to_num(1, p.Pvolume_m3, p.Pdensity_kg_m3) for p in particles]
+    )
+
+    compartment_weights = (
+        species_index.compartment[None, :]
+        == np.arange(len(species_index.compartment_names))[:, None]
+    ).astype(float)
+
+    return np.vstack(
+        [
+            compartment_weights,
+            inside,
+            inside * num_per_g,
+            inside * k_discorporation,
+            inside * k_discorporation * num_per_g,
+            losses["loss_mass"],
+            losses["loss_number"] * num_per_g + losses["net_mixing"] * own_num_per_g,
+        ]
+    )
+
+
+def outputs_from_functionals(functionals):
+    """Outputs (runs x outputs, in the order of output_names) from the linear functionals of the steady state mass of each run (functionals x runs, see output_weights)"""
+    n_compartments = functionals.shape[0] - 6
+    mass_in, num_in, discorporation_mass, discorporation_num, loss_mass, loss_num = (
+        functionals[n_compartments:]
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        indicators = [
+            mass_in / discorporation_mass,
+            num_in / discorporation_num,
+            mass_in / loss_mass,
+            num_in / loss_num,
+        ]
+    return np.vstack(
+        [functionals[:n_compartments]] + [i / seconds_per_year for i in indicators]
+    ).T
+
+
+def evaluate_group(model, matrix_parameters, emission_values, basis):
+    """Outputs of a group of runs sharing the same matrix parameter values (dictionary) and differing in the values of the emission parameters (2-D array runs x emission parameters, g/s): the interactions matrix is built and factorized once and the steady state solved only for the columns of the emission basis (see emission_basis)"""
+    lu_factorization = monte_carlo.factorize_sample(model, matrix_parameters)
+    basis_mass = solve_SS_scenarios(lu_factorization, basis)
+    basis_functionals = output_weights(model) @ basis_mass
+
+    coefficients = np.hstack([np.ones((len(emission_values), 1)), emission_values])
+    return outputs_from_functionals(basis_functionals @ coefficients.T)
+
+
+# Emission basis of each worker process (the model is the warmed-up model of monte_carlo)
+_worker_basis = None
+
+
+def _init_worker(config, data, emission_parameters):
+    global _worker_basis
+    monte_carlo._init_worker(config, data)
+    _worker_basis = emission_basis(monte_carlo._worker_model, emission_parameters)
+
+
+def _evaluate_groups(groups):
+    return [
+        (
+            indices,
+            evaluate_group(
+                monte_carlo._worker_model,
+                matrix_parameters,
+                emission_values,
+                _worker_basis,
+            ),
+        )
+        for indices, matrix_parameters, emission_values in groups
+    ]
+
+
+def evaluate_design(design, config=None, data=None, n_workers=None, chunk_size=None):
+    """Evaluates the outputs (see output_names) of every run of a design (dataframe runs x parameters, see saltelli_design and morris_design) across a pool of n_workers processes (by default the number of CPUs, 1 evaluates the design in the current process). The runs are grouped by the values of their matrix parameters (model data keys) so each interactions matrix is factorized only once for all the values of the emission parameters (entries of emiss_dict_g_s, see emission_path) of its group. chunk_size is the number of groups sent at once to a worker. Returns a dataframe (runs x outputs)."""
+    design = pd.DataFrame(design).reset_index(drop=True)
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+
+    emission_parameters = [p for p in design.columns if emission_path(p) is not None]
+    matrix_parameters = [p for p in design.columns if emission_path(p) is None]
+
+    # Model of the current process (the model run also checks the inputs before starting the workers)
+    _init_worker(config, data, emission_parameters)
+    model = monte_carlo._worker_model
+    for parameter in matrix_parameters:
+        if parameter not in model.data:
+            raise KeyError(f"Unknown model parameter: {parameter}")
+
+    if matrix_parameters:
+        group_indices = list(
+            design.groupby(matrix_parameters, sort=False).indices.values()
+        )
+    else:
+        group_indices = [np.arange(len(design))]
+
+    groups = [
+        (
+            indices,
+            design.loc[indices[0], matrix_parameters].to_dict(),
+            design.loc[indices, emission_parameters].to_numpy(dtype=float),
+        )
+        for indices in group_indices
+    ]
+
+    if chunk_size is None:
+        chunk_size = max(1, int(np.ceil(len(groups) / (4 * n_workers))))
+    chunks = [groups[i : i + chunk_size] for i in range(0, len(groups), chunk_size)]
+
+    outputs = np.empty((len(design), len(output_names(model))))
+    if n_workers <= 1:
+        for chunk in chunks:
+            for indices, group_outputs in _evaluate_groups(chunk):
+                outputs[indices] = group_outputs
+    else:
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            initializer=_init_worker,
+            initargs=(model.config, model.data, emission_parameters),
+        ) as executor:
+            futures = [executor.submit(_evaluate_groups, chunk) for chunk in chunks]
+            for future in as_completed(futures):
+                for indices, group_outputs in future.result():
+                    outputs[indices] = group_outputs
+
+    return pd.DataFrame(outputs, columns=output_names(model))
+
+
+def scale_design(unit_design, bounds):
+    """Scales a design in the unit hypercube (2-D array runs x parameters) to the bounds ({parameter: (low, high)}) of each parameter"""
+    low = np.array([b[0] for b in bounds.values()], dtype=float)
+    high = np.array([b[1] for b in bounds.values()], dtype=float)
+    if np.any(high <= low):
+        raise ValueError("The upper bound of every parameter must be above its lower bound")
+    return pd.DataFrame(low + unit_design * (high - low), columns=list(bounds))
+
+
+def saltelli_design(bounds, n_base, seed=None):
+    """Saltelli design for the estimation of first order and total Sobol indices of the parameters ({parameter: (low, high)}, uniformly distributed) from a scrambled Sobol sequence of n_base points (preferably a power of 2). Returns a dataframe of n_base x (number of parameters + 2) runs: the base matrices A and B followed by the matrices AB_i (A with the column of parameter i taken from B)"""
+    n_parameters = len(bounds)
+    AB = qmc.Sobol(d=2 * n_parameters, scramble=True, seed=seed).random(n_base)
+    A = AB[:, :n_parameters]
+    B = AB[:, n_parameters:]
+
+    blocks = [A, B]
+    for i in range(n_parameters):
+        AB_i = A.copy()
+        AB_i[:, i] = B[:, i]
+        blocks.append(AB_i)
+
+    return scale_design(np.vstack(blocks), bounds)
+
+
+def sobol_indices(outputs, parameters):
+    """First order (S1, Saltelli 2010) and total (ST, Jansen 1999) Sobol indices of the parameters (in the order of the Saltelli design) for every output of a Saltelli design (dataframe runs x outputs). Returns a dataframe indexed by output and parameter"""
+    Y = np.asarray(outputs, dtype=float)
+    n_base = len(Y) // (len(parameters) + 2)
+    if n_base * (len(parameters) + 2) != len(Y):
+        raise ValueError(
+            f"{len(Y)} runs do not correspond to a Saltelli design of {len(parameters)} parameters"
+        )
+
+    f_A = Y[:n_base]
+    f_B = Y[n_base : 2 * n_base]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        variance = np.var(np.vstack([f_A, f_B]), axis=0)
+        S1 = []
+        ST = []
+        for i in range(len(parameters)):
+            f_ABi = Y[(2 + i) * n_base : (3 + i) * n_base]
+            S1.append(np.mean(f_B * (f_ABi - f_A), axis=0) / variance)
+            ST.append(0.5 * np.mean((f_A - f_ABi) ** 2, axis=0) / variance)
+
+    index = pd.MultiIndex.from_product(
+        [list(outputs.columns), list(parameters)], names=["output", "parameter"]
+    )
+    return pd.DataFrame(
+        {"S1": np.array(S1).T.ravel(), "ST": np.array(ST).T.ravel()}, index=index
+    )
+
+
+def morris_design(bounds, n_trajectories, n_levels=4, seed=None):
+    """Morris design of n_trajectories one-at-a-time trajectories over an n_levels grid of the parameter ranges ({parameter: (low, high)}). Each trajectory has (number of parameters + 1) runs, each run changing one parameter by delta = n_levels / (2 (n_levels - 1)) of its range. Returns a dataframe of the runs"""
+    rng = np.random.default_rng(seed)
+    n_parameters = len(bounds)
+    delta = n_levels / (2 * (n_levels - 1))
+    levels = np.arange(n_levels) / (n_levels - 1)
+    start_levels = levels[levels <= 1 - delta + 1e-12]
+
+    runs = []
+    for _ in range(n_trajectories):
+        direction = rng.choice([-1, 1], n_parameters)
+        x = rng.choice(start_levels, n_parameters) + delta * (direction < 0)
+        runs.append(x)
+        for i in rng.permutation(n_parameters):
+            x = x.copy()
+            x[i] += direction[i] * delta
+            runs.append(x)
+
+    return scale_design(np.array(runs), bounds)
+
+
+def morris_indices(design, outputs, bounds):
+    """Mean (mu), mean of the absolute values (mu_star) and standard deviation (sigma) of the elementary effects of the parameters ({parameter: (low, high)}) on every output of a Morris design (dataframes runs x parameters and runs x outputs). The elementary effects are the output changes per change of the parameter in units of its range. Returns a dataframe indexed by output and parameter"""
+    parameters = list(bounds)
+    low = np.array([bounds[p][0] for p in parameters], dtype=float)
+    high = np.array([bounds[p][1] for p in parameters], dtype=float)
+    X = (design[parameters].to_numpy(dtype=float) - low) / (high - low)
+    Y = np.asarray(outputs, dtype=float)
+
+    n_steps = len(parameters) + 1
+    if len(X) % n_steps != 0:
+        raise ValueError(
+            f"{len(X)} runs do not correspond to a Morris design of {len(parameters)} parameters"
+        )
+
+    effects = [[] for _ in parameters]
+    for start in range(0, len(X), n_steps):
+        for step in range(start, start + n_steps - 1):
+            dX = X[step + 1] - X[step]
+            i = int(np.argmax(np.abs(dX)))
+            effects[i].append((Y[step + 1] - Y[step]) / dX[i])
+
+    effects = np.array(effects)  # parameters x trajectories x outputs
+    index = pd.MultiIndex.from_product(
+        [list(outputs.columns), parameters], names=["output", "parameter"]
+    )
+    return pd.DataFrame(
+        {
+            "mu": effects.mean(axis=1).T.ravel(),
+            "mu_star": np.abs(effects).mean(axis=1).T.ravel(),
+            "sigma": effects.std(axis=1, ddof=1).T.ravel()
+            if effects.shape[1] > 1
+            else np.nan,
+        },
+        index=index,
+    )
+
+
+class SensitivityResults:
+    """Results of a sensitivity analysis: the method ("sobol" or "morris"), the parameter bounds, the design (dataframe runs x parameters), the outputs of every run (dataframe runs x outputs) and the sensitivity indices (dataframe indexed by output and parameter)."""
+
+    def __init__(self, method, bounds, design, outputs, indices):
+        self.method = method
+        self.bounds = bounds
+        self.design = design
+        self.outputs = outputs
+        self.indices = indices
+
+    def indices_of(self, output):
+        """Sensitivity indices of every parameter for one output"""
+        return self.indices.xs(output, level="output")
+
+
+def run_sensitivity_analysis(
+    bounds,
+    method="sobol",
+    n=1024,
+    n_levels=4,
+    config=None,
+    data=None,
+    n_workers=None,
+    chunk_size=None,
+    seed=None,
+):
+    """Global sensitivity analysis of the total mass per compartment and the overall persistence and residence times to the parameters given by their bounds ({parameter: (low, high)}): model data keys (e.g. t_half_deg_free, FI, MPdensity_kg_m3) or emission entries (e.g. emiss_dict_g_s.Air.e). With method "sobol" n is the number of base points of the Saltelli design (n x (parameters + 2) runs), with method "morris" the number of trajectories (n x (parameters + 1) runs). Returns a SensitivityResults object."""
+    if method == "sobol":
+        design = saltelli_design(bounds, n, seed=seed)
+    elif method == "morris":
+        design = morris_design(bounds, n, n_levels=n_levels, seed=seed)
+    else:
+        raise ValueError(f"Sensitivity analysis method not implemented: {method}")
+
+    print(f"Evaluating {len(design)} runs of the {method} design")
+    outputs = evaluate_design(
+        design, config=config, data=data, n_workers=n_workers, chunk_size=chunk_size
+    )
+
+    if method == "sobol":
+        indices = sobol_indices(outputs, list(bounds))
+    else:
+        indices = morris_indices(design, outputs, bounds)
+
+    return SensitivityResults(method, bounds, design, outputs, indices)
@@ -0,0 +1,273 @@
+# This file contains the functions that solve the system of ODEs in time (dynamic mode): dM/dt = K·M + E(t)
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse import linalg as sparse_linalg
+from scipy.integrate import solve_ivp
+from utopia.helpers import effective_volume_density, mass_to_num
+from utopia.solver_steady_state import emission_scenarios_array
+
+
+def emission_schedule_function(model, emission_schedule):
+    """Returns the list of times (s) at which the emissions change and a function giving the emission vector (g/s, in the order of SpeciesList) at time t (s).
+
+    The emission schedule can be:
+    - None: constant emissions given by the model emissions dictionary (emiss_dict_g_s)
+    - a list of piecewise-constant emission intervals [{"t_start_days": 0, "emiss_dict_g_s": {...}}, ...] (sorted by start time)
+    - a function of time (days) returning an emissions dictionary with the structure of emiss_dict_g_s
+    """
+    if emission_schedule is None:
+        emission_schedule = [{"t_start_days": 0, "emiss_dict_g_s": model.emiss_dict_g_s}]
+
+    if callable(emission_schedule):
+
+        def emissions_t(t):
+            return emission_scenarios_array(model, [emission_schedule(t / 86400)])[:, 0]
+
+        return [], emissions_t
+
+    t_start_s = np.array([float(e["t_start_days"]) * 86400 for e in emission_schedule])
+    if np.any(np.diff(t_start_s) <= 0):
+        raise ValueError("The emission schedule has to be sorted by t_start_days")
+
+    emissions = emission_scenarios_array(
+        model, [e["emiss_dict_g_s"] for e in emission_schedule]
+    )
+
+    def emissions_t(t):
+        interval = max(np.searchsorted(t_start_s, t, side="right") - 1, 0)
+        return emissions[:, interval]
+
+    return list(t_start_s), emissions_t
+
+
+def solve_ODES_dynamic(
+    interactions_matrix,
+    emissions_t,
+    t_eval_s,
+    m_t0,
+    breakpoints_s=(),
+    method="BDF",
+    rtol=1e-6,
+    atol=1e-9,
+):
+    """Integrates dM/dt = K·M + E(t) with a stiff integrator. The (constant) interactions matrix K is given as the sparse Jacobian of the system so it is reused in every step. The integration is restarted at the breakpoints (times at which the emissions change). Returns the 2-D array of masses (species x output times)"""
+    K = sparse.csc_matrix(interactions_matrix)
+
+    def dMdt(t, m):
+        return K @ m + emissions_t(t)
+
+    # Integrate interval by interval so that the integrator does not step over the changes in the emissions
+    t_end = t_eval_s[-1]
+    limits = [t_eval_s[0]] + [b for b in breakpoints_s if t_eval_s[0] < b < t_end]
+    limits.append(t_end)
+
+    mass_t = np.zeros((K.shape[0], len(t_eval_s)))
+    m = np.asarray(m_t0, dtype=float)
+    for t0, t1 in zip(limits[:-1], limits[1:]):
+        if t1 == t_end:
+            in_interval = (t_eval_s >= t0) & (t_eval_s <= t1)
+        else:
+            in_interval = (t_eval_s >= t0) & (t_eval_s < t1)
+        # The end of the interval is always evaluated to restart from it
+        t_eval_interval = np.append(t_eval_s[in_interval], t1)
+        if len(t_eval_interval) > 1 and t_eval_interval[-2] == t1:
+            t_eval_interval = t_eval_interval[:-1]
+
+        sol = solve_ivp(
+            dMdt,
+            (t0, t1),
+            m,
+            method=method,
+            t_eval=t_eval_interval,
+            jac=K,
+            rtol=rtol,
+            atol=atol,
+        )
+        if not sol.success:
+            raise RuntimeError(f"Dynamic solver failed: {sol.message}")
+        mass_t[:, in_interval] = sol.y[:, : in_interval.sum()]
+        m = sol.y[:, -1]
+
+    return mass_t
+
+
+class ExponentialPropagator:
+    """Exact propagator of dM/dt = K·M + E for emissions that are constant over a time interval dt:
+
+    M(t + dt) = M(t) + B·M(t) + Φ·E, with B = exp(K·dt) - I and Φ = K⁻¹·(exp(K·dt) - I)
+
+    B and Φ are computed by scaling and squaring: a truncated Taylor series for a small step dt/2^s followed by s doublings. Working with exp(K·dt) - I instead of exp(K·dt) keeps the slowest processes, whose rate constants are many orders of magnitude below the fastest ones, from being rounded off against the identity. The propagator matrices are cached per interval length so stepping many years and many scenarios (columns of M and E) costs one matrix product per step.
+
+    The propagator matrices are dense (several N×N arrays per interval length), so they are only built for systems of up to dense_max_species species (default 2000, about 32 MB per matrix). Larger systems are stepped with the sparse scipy.sparse.linalg.expm_multiply applied to the emission-augmented matrix [[K, I], [0, 0]]·dt and the vector [M, E], which never forms a dense matrix but whose cost grows with ‖K‖·dt, so for large and stiff systems over long intervals the BDF integrator is usually faster.
+    """
+
+    def __init__(self, interactions_matrix, max_norm=0.5, dense_max_species=2000):
+        self.K = sparse.csr_matrix(interactions_matrix)
+        self.N = self.K.shape[0]
+        self.max_norm = max_norm
+        self.dense = self.N <= dense_max_species
+        self.propagators = {}
+        self.augmented_matrix = None
+
+    def propagator(self, dt_s):
+        """Dense propagator matrices (exp(K·dt) - I, K⁻¹·(exp(K·dt) - I)) for an interval of dt_s seconds (cached per interval length)"""
+        if dt_s not in self.propagators:
+            K_norm = sparse_linalg.norm(self.K, 1)
+            # No doublings when the step is already small (also for a zero matrix, whose norm is 0)
+            if K_norm * dt_s <= self.max_norm:
+                n_doublings = 0
+            else:
+                n_doublings = int(np.ceil(np.log2(K_norm * dt_s / self.max_norm)))
+            dt_small = dt_s / 2**n_doublings
+
+            # Φ(dt) = dt·(I + K·dt/2! + (K·dt)²/3! + ...)
+            X = self.K.toarray() * dt_small
+            term = np.eye(self.N)
+            phi = np.eye(self.N)
+            for k in range(2, 40):
+                term = term @ X / k
+                phi += term
+                if np.abs(term).max() <= np.finfo(float).eps * np.abs(phi).max():
+                    break
+            phi *= dt_small
+            B = self.K @ phi
+
+            # exp(2K·dt) - I = 2B + B², Φ(2dt) = Φ + exp(K·dt)·Φ = 2Φ + B·Φ
+            for _ in range(n_doublings):
+                phi = 2 * phi + B @ phi
+                B = 2 * B + B @ B
+
+            self.propagators[dt_s] = (B, phi)
+        return self.propagators[dt_s]
+
+    def step(self, m, emissions, dt_s):
+        """Mass after dt_s seconds of constant emissions (g/s) starting from mass m (g). m and emissions can be vectors or 2-D arrays (species x scenarios)"""
+        m = np.asarray(m, dtype=float)
+        emissions = np.asarray(emissions, dtype=float)
+        # Zero-length intervals (e.g. between coinciding emission breakpoints) leave the mass unchanged
+        if dt_s == 0:
+            return m.copy()
+        if not self.dense:
+            return self.step_sparse(m, emissions, dt_s)
+        B, phi = self.propagator(dt_s)
+        return m + B @ m + phi @ emissions
+
+    def step_sparse(self, m, emissions, dt_s):
+        """Mass after dt_s seconds of constant emissions computed with expm_multiply on the sparse emission-augmented matrix: exp([[K, I], [0, 0]]·dt)·[M, E] = [exp(K·dt)·M + Φ·E, E]"""
+        if self.augmented_matrix is None:
+            self.augmented_matrix = sparse.bmat(
+                [
+                    [self.K, sparse.identity(self.N)],
+                    [None, sparse.csr_matrix((self.N, self.N))],
+                ],
+                format="csr",
+            )
+        x = np.concatenate([m.reshape(self.N, -1), emissions.reshape(self.N, -1)])
+        mass = sparse_linalg.expm_multiply(self.augmented_matrix * dt_s, x)[: self.N]
+        return mass.reshape(m.shape)
+
+    def propagate(self, m_t0, emissions, durations_s):
+        """Applies the propagator over consecutive intervals of constant emissions. emissions is a list (one element per interval) of emission vectors or 2-D arrays (species x scenarios) in g/s and durations_s the length of each interval. Returns the list of masses at the end of each interval"""
+        m = np.asarray(m_t0, dtype=float)
+        mass_t = []
+        for emissions_interval, dt_s in zip(emissions, durations_s):
+            m = self.step(m, emissions_interval, dt_s)
+            mass_t.append(m)
+        return mass_t
+
+
+def solve_ODES_expm(
+    interactions_matrix, emissions_t, t_eval_s, m_t0, breakpoints_s=(), propagator=None
+):
+    """Solves dM/dt = K·M + E(t) for piecewise-constant emissions using the exact exponential propagator (no time stepping error). Returns the 2-D array of masses (species x output times)"""
+    if propagator is None:
+        propagator = ExponentialPropagator(interactions_matrix)
+
+    t_end = t_eval_s[-1]
+    times = np.unique(
+        np.concatenate(
+            [t_eval_s, [b for b in breakpoints_s if t_eval_s[0] < b < t_end]]
+        )
+    )
+    # Interval lengths are rounded so that equal intervals share the cached propagator
+    durations_s = np.round(np.diff(times), 6)
+    emissions = [emissions_t(t) for t in times[:-1]]
+
+    mass_times = [np.asarray(m_t0, dtype=float)] + propagator.propagate(
+        m_t0, emissions, durations_s
+    )
+    mass_times = np.column_stack(mass_times)
+
+    return mass_times[:, np.searchsorted(times, t_eval_s)]
+
+
+def solver_dynamic(model, emission_schedule=None):
+    """Solves the system of ODEs in time using the sparse interactions matrix of the model. The simulation is set up through the optional config keys "simulation_time_days" (default 100 years), "n_output_times", "dynamic_method" ("BDF" or "Radau" stiff integrators, or "expm" for the exact exponential propagator for piecewise-constant emissions), "expm_dense_max_species" (largest system for which the expm method builds dense propagator matrices, see ExponentialPropagator), "dynamic_rtol" and "dynamic_atol". The emissions can change in time following the emission_schedule (see emission_schedule_function), by default the model emission_schedule (data key "emission_schedule") or constant emissions. Returns the time series of mass (g) and particle number of each species (dataframes with the time in days as index) and the dataframe of mass at time 0."""
+
+    if emission_schedule is None:
+        emission_schedule = getattr(model, "emission_schedule", None)
+
+    if getattr(model, "interactions_matrix", None) is None:
+        model.interactions_matrix = sparse.csr_matrix(model.interactions_df.to_numpy())
+
+    simulation_time_days = model.config.get("simulation_time_days", 36500)
+    n_output_times = model.config.get("n_output_times", 101)
+    t_eval_days = np.linspace(0, simulation_time_days, n_output_times)
+
+    breakpoints_s, emissions_t = emission_schedule_function(model, emission_schedule)
+
+    # Set initial mass of particles to 0
+    m_t0 = np.zeros(len(model.SpeciesList))
+    for p in model.system_particle_object_list:
+        p.Pmass_g_t0 = 0
+    PartMass_t0 = pd.DataFrame({"species": model.SpeciesList, "mass_g": m_t0})
+    PartMass_t0 = PartMass_t0.set_index("species")
+
+    method = model.config.get("dynamic_method", "BDF")
+    if method == "expm":
+        if callable(emission_schedule):
+            raise ValueError(
+                "The expm dynamic method requires piecewise-constant emissions"
+            )
+        if getattr(model, "exponential_propagator", None) is None:
+            model.exponential_propagator = ExponentialPropagator(
+                model.interactions_matrix,
+                dense_max_species=model.config.get("expm_dense_max_species", 2000),
+            )
+        mass_t = solve_ODES_expm(
+            interactions_matrix=model.interactions_matrix,
+            emissions_t=emissions_t,
+            t_eval_s=t_eval_days * 86400,
+            m_t0=m_t0,
+            breakpoints_s=breakpoints_s,
+            propagator=model.exponential_propagator,
+        )
+    else:
+        mass_t = solve_ODES_dynamic(
+            interactions_matrix=model.interactions_matrix,
+            emissions_t=emissions_t,
+            t_eval_s=t_eval_days * 86400,
+            m_t0=m_t0,
+            breakpoints_s=breakpoints_s,
+            method=method,
+            rtol=model.config.get("dynamic_rtol", 1e-6),
+            atol=model.config.get("dynamic_atol", 1e-9),
+        )
+
+    # Convert mass to particle number
+    volume_m3, density_kg_m3 = effective_volume_density(
+        model.system_particle_object_list
+    )
+    number_t = mass_to_num(mass_t, volume_m3[:, None], density_kg_m3[:, None])
+
+    time_index = pd.Index(t_eval_days, name="time_days")
+    mass_timeseries_g = pd.DataFrame(
+        mass_t.T, index=time_index, columns=model.SpeciesList
+    )
+    number_timeseries = pd.DataFrame(
+        number_t.T, index=time_index, columns=model.SpeciesList
+    )
+
+    return mass_timeseries_g, number_timeseries, PartMass_t0
@@ -1,117 +1,288 @@
 # This file contains the function that solves the steady state ODEs for the system of particles
 
-from utopia.helpers import mass_to_num, num_to_mass
+from utopia.helpers import effective_volume_density, mass_to_num, num_to_mass
 import pandas as pd
 import numpy as np
 
 
-def solver_SS(model):
+def emissions_by_box(model, emiss_dict_g_s):
+    """Emissions of each model box ({box: {compartment: {size code: g/s}}}). In the spatial version the emissions dictionary can be given per box (box names as keys), the emissions given directly per compartment go to the main box (boxName)"""
+    box_emissions = {}
+    for key, emissions in emiss_dict_g_s.items():
+        if key in model.boxNames_list:
+            box_emissions.setdefault(key, {}).update(emissions)
+        else:
+            box_emissions.setdefault(model.boxName, {})[key] = emissions
+    return box_emissions
+
+
+def generate_input_flows(model, emiss_dict_g_s=None):
+    """Read the emissions dictionary (by default the model emissions dictionary) to generate the dictionaries of emissions for the ODES in mass (input_flows_g_s) and particle number (input_flows_num_s)"""
+    if emiss_dict_g_s is None:
+        emiss_dict_g_s = model.emiss_dict_g_s
 
-    # read the emissions dictionary to generate the list of emissions for the ODES (input_flows_g_s)
     sp_imputs = []
     q_mass_g_s = []
-    for compartment in model.emiss_dict_g_s.keys():
-        for size_bin in model.emiss_dict_g_s[compartment].keys():
-
-            sp_imputs.append(
-                size_bin
-                + model.particle_forms_coding[model.MP_form]
-                + str(model.particle_compartmentCoding[compartment])
-                + "_"
-                + model.boxName
-            )
-            q_mass_g_s.append(model.emiss_dict_g_s[compartment][size_bin])
+    for box, box_emiss_dict_g_s in emissions_by_box(model, emiss_dict_g_s).items():
+        for compartment in box_emiss_dict_g_s.keys():
+            for size_bin in box_emiss_dict_g_s[compartment].keys():
+                if size_bin not in model.size_codes:
+                    raise ValueError(
+                        f"Unknown size bin {size_bin} in the emissions to {compartment}, the size codes of the model are {model.size_codes}"
+                    )
+
+                sp_imputs.append(
+                    size_bin
+                    + model.particle_forms_coding[model.MP_form]
+                    + str(model.particle_compartmentCoding[compartment])
+                    + "_"
+                    + box
+                )
+                q_mass_g_s.append(box_emiss_dict_g_s[compartment][size_bin])
 
     input_flows_g_s = dict(zip(sp_imputs, q_mass_g_s))
 
+    particles = [
+        model.system_particle_object_list[model.species_index.position[k]]
+        for k in input_flows_g_s
+    ]
     q_num_s = [
         mass_to_num(v, p.Pvolume_m3, p.Pdensity_kg_m3) if v != 0 else 0
-        for k, v in zip(input_flows_g_s.keys(), input_flows_g_s.values())
-        for p in model.system_particle_object_list
-        if k == p.Pcode
+        for v, p in zip(input_flows_g_s.values(), particles)
     ]
 
     input_flows_num_s = dict(zip(sp_imputs, q_num_s))
 
+    return input_flows_g_s, input_flows_num_s
+
+
+def solver_SS(model):
+
+    # read the emissions dictionary to generate the list of emissions for the ODES (input_flows_g_s)
+    input_flows_g_s, input_flows_num_s = generate_input_flows(model)
+
     R, PartMass_t0 = solve_ODES_SS(
         system_particle_object_list=model.system_particle_object_list,
         q_num_s=0,
         input_flows_g_s=input_flows_g_s,
         interactions_df=model.interactions_df,
+        particle_table=getattr(model, "particle_table", None),
     )
     return R, PartMass_t0, input_flows_g_s, input_flows_num_s
 
 
-def solve_ODES_SS(
-    system_particle_object_list, q_num_s, input_flows_g_s, interactions_df
+def solver_SS_sparse(model):
+    """Solves the steady state with the sparse interactions matrix. The method is selected through the optional config keys "sparse_method" ("direct" sparse LU by default, or the Krylov solvers "gmres" and "bicgstab"), "preconditioner" (None, "ilu" or "jacobi", only used by the Krylov solvers) and "solver_tolerance". The relative residual norm of the solution is stored in model.residual_norm."""
+
+    from scipy import sparse
+
+    input_flows_g_s, input_flows_num_s = generate_input_flows(model)
+
+    if getattr(model, "interactions_matrix", None) is None:
+        model.interactions_matrix = sparse.csr_matrix(model.interactions_df.to_numpy())
+
+    method = model.config.get("sparse_method", "direct")
+    if method == "direct":
+        model.factorize_interactions()
+
+    R, PartMass_t0, model.residual_norm = solve_ODES_SS_sparse(
+        system_particle_object_list=model.system_particle_object_list,
+        input_flows_g_s=input_flows_g_s,
+        interactions_matrix=model.interactions_matrix,
+        method=method,
+        lu_factorization=model.interactions_lu,
+        preconditioner=model.config.get("preconditioner"),
+        tol=model.config.get("solver_tolerance", 1e-12),
+        particle_table=getattr(model, "particle_table", None),
+    )
+    print(f"Relative residual norm of the steady state solution: {model.residual_norm}")
+
+    return R, PartMass_t0, input_flows_g_s, input_flows_num_s
+
+
+def solve_ODES_SS_sparse(
+    system_particle_object_list,
+    input_flows_g_s,
+    interactions_matrix,
+    method="direct",
+    lu_factorization=None,
+    preconditioner=None,
+    tol=1e-12,
+    particle_table=None,
 ):
+    """Solves the steady state mass balance (K·m = -e) with a sparse interactions matrix K. A precomputed LU factorization of K can be given for the direct method. Returns the same results dataframe (R) and initial mass dataframe (PartMass_t0) as solve_ODES_SS together with the relative residual norm of the solution."""
+    from scipy import sparse
+    from scipy.sparse import linalg as sparse_linalg
+
+    if sum(input_flows_g_s.values()) == 0:
+        raise ValueError("No particles have been input to the system")
+
+    PartMass_t0 = generate_PartMass_t0(system_particle_object_list, input_flows_g_s)
+
+    # Input vector
+    inputVector = PartMass_t0["mass_g"].to_numpy(dtype=float)
+
+    matrix = sparse.csc_matrix(interactions_matrix)
+
+    if method == "direct":
+        if lu_factorization is None:
+            lu_factorization = sparse_linalg.splu(matrix)
+        SteadyStateResults = lu_factorization.solve(inputVector)
+
+    elif method in ["gmres", "bicgstab"]:
+        if preconditioner == "ilu":
+            ilu = sparse_linalg.spilu(matrix)
+            M = sparse_linalg.LinearOperator(matrix.shape, ilu.solve)
+        elif preconditioner == "jacobi":
+            M = sparse.diags(1 / matrix.diagonal())
+        elif preconditioner is None:
+            M = None
+        else:
+            raise ValueError(f"Preconditioner not implemented: {preconditioner}")
+
+        krylov_solver = getattr(sparse_linalg, method)
+        SteadyStateResults, info = krylov_solver(
+            matrix, inputVector, rtol=tol, atol=0, M=M
+        )
+        if info > 0:
+            print(
+                f"WARNING: {method} did not converge to the requested tolerance after {info} iterations"
+            )
+        elif info < 0:
+            raise ValueError(f"{method} failed with illegal input (info={info})")
+
+    else:
+        raise ValueError(f"Sparse solver method not implemented: {method}")
+
+    residual_norm = np.linalg.norm(
+        matrix @ SteadyStateResults - inputVector
+    ) / np.linalg.norm(inputVector)
+
+    R = steady_state_results(
+        system_particle_object_list, SteadyStateResults, particle_table
+    )
+
+    return R, PartMass_t0, residual_norm
+
+
+def generate_PartMass_t0(system_particle_object_list, input_flows_g_s):
+    """Dataframe of mass of particles at time 0 with the emissions set as negative values (input vector of the steady state mass balance)"""
     SpeciesList = [p.Pcode for p in system_particle_object_list]
 
+    # set mass of particles for all particles in the system as zero
+    m_t0 = []
+    for p in system_particle_object_list:
+        p.Pmass_g_t0 = 0
+        m_t0.append(p.Pmass_g_t0)
+
+    # dataframe of mass of particles at time 0
+    PartMass_t0 = pd.DataFrame({"species": SpeciesList, "mass_g": m_t0})
+    PartMass_t0 = PartMass_t0.set_index("species")
+
+    # Set emissions
+    for sp_imput in input_flows_g_s.keys():
+        PartMass_t0.at[sp_imput, "mass_g"] = -input_flows_g_s[sp_imput]
+
+    return PartMass_t0
+
+
+def emission_scenarios_array(model, emission_scenarios):
+    """Builds the 2-D array of emissions (species x scenarios, in g/s) from a list of emission dictionaries with the structure of emiss_dict_g_s"""
+    species_position = {sp: i for i, sp in enumerate(model.SpeciesList)}
+
+    emissions = np.zeros((len(model.SpeciesList), len(emission_scenarios)))
+    for n, emiss_dict_g_s in enumerate(emission_scenarios):
+        input_flows_g_s, _ = generate_input_flows(model, emiss_dict_g_s)
+        for sp_imput, q_mass_g_s in input_flows_g_s.items():
+            emissions[species_position[sp_imput], n] = q_mass_g_s
+
+    return emissions
+
+
+def solve_SS_scenarios(lu_factorization, emissions):
+    """Solves the steady state mass balance (K·m = -e) for a batch of emission vectors (columns of the 2-D emissions array, in g/s) reusing the LU factorization of the interactions matrix. Returns the 2-D array of steady state masses (g)"""
+    emissions = np.asarray(emissions, dtype=float)
+    return lu_factorization.solve(-emissions)
+
+
+def steady_state_results(
+    system_particle_object_list, SteadyStateResults, particle_table=None
+):
+    """Builds the steady state results dataframe (R) from the solution of the mass balance in mass (g) and assigns the steady state mass, particle number and concentrations to the particle objects. The mass to number conversion and the concentrations are computed as array operations from the conversion volume and density and the compartment volume of every species, taken from the particle table of the model if given (its steady state columns are set too)"""
+    SpeciesList = [p.Pcode for p in system_particle_object_list]
+    mass_g = np.asarray(SteadyStateResults, dtype=float).reshape(-1)
+
+    if particle_table is not None:
+        particle_table.set_steady_state(mass_g)
+        number = particle_table.num_SS
+        C_g_m3 = particle_table.C_g_m3_SS
+        C_num_m3 = particle_table.C_num_m3_SS
+    else:
+        volume_m3, density_kg_m3 = effective_volume_density(
+            system_particle_object_list
+        )
+        compartment_volume_m3 = np.array(
+            [p.Pcompartment.Cvolume_m3 for p in system_particle_object_list],
+            dtype=float,
+        )
+        number = mass_to_num(mass_g, volume_m3, density_kg_m3)
+        C_g_m3 = mass_g / compartment_volume_m3
+        C_num_m3 = number / compartment_volume_m3
+
+    R = pd.DataFrame(
+        {
+            "mass_g": mass_g,
+            "number_of_particles": number,
+            "concentration_g_m3": C_g_m3,
+            "concentration_num_m3": C_num_m3,
+        },
+        index=pd.Index(SpeciesList, name="species"),
+    )
+
+    # Add the results to the particles
+    for p, m, n, c_m, c_n in zip(
+        system_particle_object_list,
+        mass_g.tolist(),
+        number.tolist(),
+        C_g_m3.tolist(),
+        C_num_m3.tolist(),
+    ):
+        p.Pmass_g_SS = m
+        p.Pnum_SS = n
+        p.C_g_m3_SS = c_m
+        p.C_num_m3_SS = c_n
+
+    return R
+
+
+def solve_ODES_SS(
+    system_particle_object_list,
+    q_num_s,
+    input_flows_g_s,
+    interactions_df,
+    particle_table=None,
+):
     # Set initial mass of particles to 0
     # Set SS mass of particles to =???
     if sum(input_flows_g_s.values()) != 0:
-        # set mass of particles for all particles in the system as zero
-        m_t0 = []
-        for p in system_particle_object_list:
-            p.Pmass_g_t0 = 0
-            m_t0.append(p.Pmass_g_t0)
-
-        # dataframe of mass of particles at time 0
-        PartMass_t0 = pd.DataFrame({"species": SpeciesList, "mass_g": m_t0})
-        PartMass_t0 = PartMass_t0.set_index("species")
-
-        # Set emissions
-        for sp_imput in input_flows_g_s.keys():
-            PartMass_t0.at[sp_imput, "mass_g"] = -input_flows_g_s[sp_imput]
+        PartMass_t0 = generate_PartMass_t0(system_particle_object_list, input_flows_g_s)
 
         # Input vector
-        inputVector = PartMass_t0["mass_g"].to_list()
+        inputVector = PartMass_t0["mass_g"].to_numpy(dtype=float)
 
         matrix = interactions_df.to_numpy()
 
         SteadyStateResults = np.linalg.solve(matrix, inputVector)
 
-        Results = pd.DataFrame({"species": SpeciesList, "mass_g": SteadyStateResults})
-
-        R = Results.set_index("species")
-        for p in system_particle_object_list:
-            p.Pmass_g_SS = R.loc[p.Pcode]["mass_g"]
-
-        # Convert results in mass to particle number and add to the particle objects
-        for p in system_particle_object_list:
-            if "SPM" in p.Pname:
-                if "BF" in p.Pname:
-                    p.Pnum_SS = mass_to_num(
-                        mass_g=p.Pmass_g_SS,
-                        volume_m3=p.parentMP.parentMP.Pvolume_m3,
-                        density_kg_m3=p.parentMP.parentMP.Pdensity_kg_m3,
-                    )
-                else:
-                    p.Pnum_SS = mass_to_num(
-                        mass_g=p.Pmass_g_SS,
-                        volume_m3=p.parentMP.Pvolume_m3,
-                        density_kg_m3=p.parentMP.Pdensity_kg_m3,
-                    )
-            else:
-                p.Pnum_SS = mass_to_num(
-                    mass_g=p.Pmass_g_SS,
-                    volume_m3=p.Pvolume_m3,
-                    density_kg_m3=p.Pdensity_kg_m3,
-                )
-
-        # Add to Results dataframe
-        for p in system_particle_object_list:
-            R.loc[p.Pcode, "number_of_particles"] = p.Pnum_SS
-        ### Estimate SS concentration and add to particles
-        for p in system_particle_object_list:
-            p.C_g_m3_SS = p.Pmass_g_SS / float(p.Pcompartment.Cvolume_m3)
-            R.loc[p.Pcode, "concentration_g_m3"] = p.C_g_m3_SS
-            p.C_num_m3_SS = p.Pnum_SS / float(p.Pcompartment.Cvolume_m3)
-            R.loc[p.Pcode, "concentration_num_m3"] = p.C_num_m3_SS
+        R = steady_state_results(
+            system_particle_object_list, SteadyStateResults, particle_table
+        )
 
     elif (
         q_num_s != 0
     ):  # By default the inputs are always given in mass this piece of code only needed if inputs given in particle numbers but this is has to be included in the imputs sections and updated to reflect the same structure as the mass inputs (list of inputs and not a single value)
+        SpeciesList = [p.Pcode for p in system_particle_object_list]
+
         # Set number of particles for all particles in the system as zero
         N_t0 = []
         for p in system_particle_object_list:
@@ -131,48 +302,21 @@ def solve_ODES_SS(
 
         SteadyStateResults = np.linalg.solve(matrix, inputVector)
 
-        Results = pd.DataFrame(
-            {"species": SpeciesList, "number_of_particles": SteadyStateResults}
+        # Convert results in particle number to mass and build the results as for the mass inputs
+        volume_m3, density_kg_m3 = effective_volume_density(
+            system_particle_object_list
         )
-
-        # Assign steady state (SS) results to paticles in particle number
-
-        R = Results.set_index("species")
-        for p in system_particle_object_list:
-            p.Pnum_SS = R.loc[p.Pcode]["number_of_particles"]
-
-        # Convert results in particle number to mass and add to the particle objects
-        for p in system_particle_object_list:
-            if "SPM" in p.Pname:
-                if "BF" in p.Pname:
-                    p.Pmass_g_SS = num_to_mass(
-                        number=p.Pnum_SS,
-                        volume_m3=p.parentMP.parentMP.Pvolume_m3,
-                        density_kg_m3=p.parentMP.parentMP.Pdensity_kg_m3,
-                    )
-                else:
-                    p.Pmass_g_SS = num_to_mass(
-                        number=p.Pnum_SS,
-                        volume_m3=p.parentMP.Pvolume_m3,
-                        density_kg_m3=p.parentMP.Pdensity_kg_m3,
-                    )
-            else:
-                p.Pmass_g_SS = num_to_mass(
-                    number=p.Pnum_SS,
-                    volume_m3=p.Pvolume_m3,
-                    density_kg_m3=p.Pdensity_kg_m3,
-                )
-
-        # Add to Results dataframe
-        for p in system_particle_object_list:
-            R.loc[p.Pcode, "mass_g"] = p.Pmass_g_SS
-
-        ### Estimate SS concentration and add to particles
-        for p in system_particle_object_list:
-            p.C_g_m3_SS = p.Pmass_g_SS / float(p.Pcompartment.Cvolume_m3)
-            R.loc[p.Pcode, "concentration_g_m3"] = p.C_g_m3_SS
-            p.C_num_m3_SS = p.Pnum_SS / float(p.Pcompartment.Cvolume_m3)
-            R.loc[p.Pcode, "concentration_num_m3"] = p.C_num_m3_SS
+        mass_g = num_to_mass(
+            number=SteadyStateResults, volume_m3=volume_m3, density_kg_m3=density_kg_m3
+        )
+        R = steady_state_results(system_particle_object_list, mass_g, particle_table)[
+            [
+                "number_of_particles",
+                "mass_g",
+                "concentration_g_m3",
+                "concentration_num_m3",
+            ]
+        ]
 
     else:
         print("ERROR: No particles have been input to the system")
@@ -1,18 +1,34 @@
 import copy
-import string
 import json
 import pandas as pd
 import os
-from datetime import datetime
 import math
 import numpy as np
 from pathlib import Path
-from utopia.preprocessing.objects_generation import *
-from utopia.preprocessing.generate_rate_constants import *
-from utopia.preprocessing.fill_interactions_df import *
-from utopia.solver_steady_state import *
-
-import json
+from utopia.preprocessing.objects_generation import generate_objects
+from utopia.preprocessing.generate_rate_constants import (
+    generate_rate_constants,
+    generate_rate_constants_vectorized,
+)
+from utopia.preprocessing.fill_interactions_df import (
+    fillInteractions_fun_OOP,
+    fillInteractions_fun_OOP_sparse,
+)
+from utopia.solver_steady_state import (
+    emission_scenarios_array,
+    emissions_by_box,
+    generate_input_flows,
+    generate_PartMass_t0,
+    solve_SS_scenarios,
+    solver_SS,
+    solver_SS_sparse,
+    steady_state_results,
+)
+
+# scipy (the sparse matrices, the sparse LU factorization and the dynamic solver), the adjoint sensitivities and the incremental updates are imported when they are first used to keep the import of the model light
+from utopia.model_cache import get_cache, model_inputs_key, restore_from_cache
+from utopia.helpers import generate_size_codes, object_attributes
+from utopia.objects.particle_table import ParticleTable
 
 
 class utopiaModel:
@@ -171,6 +187,11 @@ class utopiaModel:
         self.comp_input_file_name = self.config["comp_input_file_name"]
         self.comp_interactFile_name = self.config["comp_interactFile_name"]
         self.boxName = self.config["boxName"]
+        # Spatial version: names of the model boxes (i.e. river sections or regions, all with the compartments of the UTOPIA box) and table of flows between them (list of records or csv file with the columns from_box, to_box, compartment and flow_m3_s). The emissions given per compartment go to the boxName box
+        self.boxNames_list = list(self.config.get("boxes", [self.boxName]))
+        if self.boxName not in self.boxNames_list:
+            raise ValueError(f"boxName {self.boxName} is not one of the model boxes")
+        self.box_connectivity = self.config.get("box_connectivity")
 
         self.MPforms_list = self.config["MPforms_list"]
 
@@ -180,7 +201,18 @@ class utopiaModel:
             self.comp_input_file_name, "Cname"
         )
         self.solver = self.config["solver"]
+        self.matrix_assembly = self.config.get(
+            "matrix_assembly",
+            (
+                "sparse"
+                if self.solver in ["SteadyStateSparse", "Dynamic"]
+                or len(self.boxNames_list) > 1
+                else "dense"
+            ),
+        )
         self.compartment_types = self.config["compartment_types"]
+        # Rate constants engine: "vectorized" (all particles at once) or "loop" (one call per particle and process)
+        self.rate_constants_engine = self.config.get("rate_constants_engine", "vectorized")
 
         # Derived environmental parameters
         self.radius_algae_m = ((3.0 / 4.0) * (self.vol_algal_cell_m3 / math.pi)) ** (
@@ -190,6 +222,8 @@ class utopiaModel:
 
         # Emission scenario
         self.emiss_dict_g_s = self.data["emiss_dict_g_s"]
+        # Time-varying emissions for the dynamic solver (list of piecewise-constant intervals or function of time in days returning an emissions dictionary)
+        self.emission_schedule = self.data.get("emission_schedule")
 
     def generate_particles_dataframe(self):
         """Generates the microplastics input DataFrame from Utopia model attributes."""
@@ -230,8 +264,8 @@ class utopiaModel:
             zip(self.particles_df["Name"], self.particles_df["dimensionX_um"] * 2)
         )
 
-        # Generate size codes (a-z based on number of bins)
-        self.size_codes = list(string.ascii_lowercase[: self.N_sizeBins])
+        # Generate size codes (a-z based on number of bins, aa, ab... for more than 26 bins)
+        self.size_codes = generate_size_codes(self.N_sizeBins)
 
         # Dictionary mapping size codes to sizes
         self.size_dict = dict(zip(self.size_codes, self.dict_size_coding.values()))
@@ -254,16 +288,49 @@ class utopiaModel:
         }
 
     def run(self):
-        """Runs the UTOPIA model with the configured parameters."""
-        # Generate model objects based on model configuration and input data
+        """Runs the UTOPIA model with the configured parameters. With the config key "use_cache" the model objects, rate constants and interactions matrix (and its factorization) are taken from the cache of a previous run with the same inputs other than the emissions (see model_cache)."""
         print("Running UTOPIA model with configured parameters...")
+        cache = get_cache(self.config) if self.config.get("use_cache", False) else None
+        cache_entry = None
+        if cache is not None:
+            cache_key = model_inputs_key(self)
+            cache_entry = cache.get(cache_key)
+
+        if cache_entry is not None:
+            restore_from_cache(self, cache_entry)
+            self.exponential_propagator = None
+            print("Loaded model objects and matrix of interactions from the cache.")
+        else:
+            self.build_model()
+            if cache is not None:
+                cache_entry = cache.put(cache_key, self)
+        # Dependencies of the rate constants and matrix entries on the inputs (computed on the first incremental update)
+        self.process_dependencies = None
+        self.process_matrix_entries = None
+
+        self.solve()
+        if self.solver == "Dynamic":
+            return
+
+        # Keep the factorization of the interactions matrix computed by the solver for the next runs with the same inputs
+        if cache_entry is not None and cache_entry["interactions_lu"] is None:
+            cache_entry["interactions_lu"] = self.interactions_lu
+
+    def build_model(self):
+        """Generates the model objects (compartments and particles), their rate constants and the matrix of interactions. With the config key "print_particles" (False by default) the attributes of every biofouled particle are printed as JSON, which the model did on every build before the multi-box mode"""
+        # Generate model objects based on model configuration and input data
         (
             self.system_particle_object_list,
             self.SpeciesList,
             self.spm,
             self.dict_comp,
             self.particles_properties_df,
+            self.species_index,
         ) = generate_objects(self)
+        # Columnar store of the particle properties and steady state results
+        self.particle_table = ParticleTable.from_particles(
+            self.system_particle_object_list, self.species_index, self.MPforms_list
+        )
         print("Generated model objects.")
         # Print particles whose Pform is 'heterBiofMP'
 
@@ -279,27 +346,56 @@ class utopiaModel:
                 return {k: to_dict(v, visited) for k, v in obj.items()}
             elif isinstance(obj, list):
                 return [to_dict(item, visited) for item in obj]
-            elif hasattr(obj, "__dict__"):
-                return {k: to_dict(v, visited) for k, v in obj.__dict__.items()}
+            elif hasattr(obj, "__dict__") or hasattr(obj, "__slots__"):
+                return {
+                    k: to_dict(v, visited) for k, v in object_attributes(obj).items()
+                }
             else:
                 return obj
 
-        for p in self.system_particle_object_list:
+        # The dump of every particle (with its compartment and box) is only printed on request (config key "print_particles") as it grows with the square of the number of species
+        if self.config.get("print_particles", False):
+            for p in self.system_particle_object_list:
                 if hasattr(p, "Pform") and p.Pform == "biofMP":
-        # 递归转 dict 再美观打印
+                    # 递归转 dict 再美观打印
                     print(json.dumps(to_dict(p), indent=4, ensure_ascii=False))
 
         # Estimate rate contants for all processess for each particle in the system
-        generate_rate_constants(self)
+        if self.rate_constants_engine == "vectorized":
+            generate_rate_constants_vectorized(self)
+        elif self.rate_constants_engine == "loop":
+            generate_rate_constants(self)
+        else:
+            raise ValueError(
+                f"Rate constants engine not supported: {self.rate_constants_engine}"
+            )
         print("Generated rate constants for model particles.")
 
         # Build matrix of interactions
-        self.interactions_df = fillInteractions_fun_OOP(
-            system_particle_object_list=self.system_particle_object_list,
-            SpeciesList=self.SpeciesList,
-            dict_comp=self.dict_comp,
-        )
+        if self.matrix_assembly == "sparse":
+            self.interactions_matrix, self.interactions_df = (
+                fillInteractions_fun_OOP_sparse(
+                    system_particle_object_list=self.system_particle_object_list,
+                    SpeciesList=self.SpeciesList,
+                    dict_comp=self.dict_comp,
+                )
+            )
+        elif self.matrix_assembly == "dense":
+            self.interactions_df = fillInteractions_fun_OOP(
+                system_particle_object_list=self.system_particle_object_list,
+                SpeciesList=self.SpeciesList,
+                dict_comp=self.dict_comp,
+            )
+        else:
+            raise ValueError(
+                f"Matrix assembly mode not supported: {self.matrix_assembly}"
+            )
+        self.interactions_lu = None
+        self.exponential_propagator = None
         print("Built matrix of interactions.")
+
+    def solve(self):
+        """Solves the model with the configured solver (steady state or dynamic) from its interactions matrix"""
         # Solve system of ODEs
         if self.solver == "SteadyState":
 
@@ -307,6 +403,19 @@ class utopiaModel:
                 solver_SS(self)
             )
             print("Solved system of ODEs for steady state.")
+        elif self.solver == "SteadyStateSparse":
+            (self.R, self.PartMass_t0, self.input_flows_g_s, self.input_flows_num_s) = (
+                solver_SS_sparse(self)
+            )
+            print("Solved sparse system of ODEs for steady state.")
+        elif self.solver == "Dynamic":
+            from utopia.solver_dynamic import solver_dynamic
+
+            (self.mass_timeseries_g, self.number_timeseries, self.PartMass_t0) = (
+                solver_dynamic(self, self.emission_schedule)
+            )
+            print("Solved system of ODEs in time.")
+            return
         else:
             raise ValueError("Solver not implemented yet")
 
@@ -317,6 +426,104 @@ class utopiaModel:
             else:
                 pass
 
+    def update_parameters(self, parameters):
+        """Updates the model after a change of some input parameters ({data key: value}, e.g. {"t_half_deg_free": 6600}) and solves it again (the model has to be run first). Only the rate constants of the processes that depend on the changed parameters are recomputed and only the entries of the interactions matrix they populate are patched (see incremental_update)."""
+        from utopia.incremental_update import update_parameters
+
+        update_parameters(self, parameters)
+        print("Updated rate constants and matrix of interactions.")
+        self.solve()
+
+    def factorize_interactions(self):
+        """Computes (once) and keeps the sparse LU factorization of the interactions matrix so that new emission scenarios can be solved without rebuilding the model."""
+        if getattr(self, "interactions_lu", None) is None:
+            from scipy import sparse
+            from scipy.sparse import linalg as sparse_linalg
+
+            if getattr(self, "interactions_matrix", None) is None:
+                self.interactions_matrix = sparse.csr_matrix(
+                    self.interactions_df.to_numpy()
+                )
+
+            self.interactions_lu = sparse_linalg.splu(
+                sparse.csc_matrix(self.interactions_matrix)
+            )
+        return self.interactions_lu
+
+    def solve_emission_scenarios(self, emission_scenarios):
+        """Solves the steady state for a batch of emission scenarios reusing the LU factorization of the interactions matrix (the model has to be run first).
+
+        Parameters
+        ----------
+        emission_scenarios : dict, list or numpy.ndarray
+            Emission dictionaries with the structure of emiss_dict_g_s (as a list or as a dictionary of named scenarios) or a 2-D array of emissions in g/s (species x scenarios, in the order of SpeciesList).
+
+        Returns
+        -------
+        pandas.DataFrame
+            Steady state mass (g) of each species (rows) for each scenario (columns).
+        """
+        if isinstance(emission_scenarios, dict):
+            scenario_names = list(emission_scenarios.keys())
+            emission_scenarios = list(emission_scenarios.values())
+        else:
+            scenario_names = None
+
+        if isinstance(emission_scenarios, np.ndarray):
+            emissions = emission_scenarios
+        else:
+            emissions = emission_scenarios_array(self, emission_scenarios)
+
+        if emissions.ndim == 1:
+            emissions = emissions.reshape(-1, 1)
+
+        masses = solve_SS_scenarios(self.factorize_interactions(), emissions)
+
+        return pd.DataFrame(masses, index=self.SpeciesList, columns=scenario_names)
+
+    def sensitivities(self, output):
+        """Derivatives of a scalar output of the steady state with respect to every rate constant of every particle and every emission, from one adjoint solve reusing the LU factorization of the interactions matrix (the model has to be run first).
+
+        Parameters
+        ----------
+        output : str, list, dict or numpy.ndarray
+            Compartment name (total mass in the compartment), list of species codes (their total mass), dictionary of weights by species code or array of weights of every species (in the order of SpeciesList).
+
+        Returns
+        -------
+        tuple of pandas.DataFrame and pandas.Series
+            Derivatives (and elasticities) of the output with respect to each rate constant entry and derivatives with respect to the emission (g/s) of each species (see adjoint_sensitivities).
+        """
+        from utopia.adjoint_sensitivity import adjoint_sensitivities
+
+        return adjoint_sensitivities(self, output)
+
+    def copy_with_emissions(self, emiss_dict_g_s, SteadyStateResults=None):
+        """Returns a copy of the model with a new emission scenario and its steady state results without regenerating the model objects, rate constants and interactions matrix. The particle objects are copied so that the steady state values of this model are not modified."""
+        if SteadyStateResults is None:
+            SteadyStateResults = self.solve_emission_scenarios([emiss_dict_g_s])
+        SteadyStateResults = np.asarray(SteadyStateResults, dtype=float).reshape(-1)
+
+        new_model = copy.copy(self)
+        new_model.emiss_dict_g_s = emiss_dict_g_s
+        new_model.system_particle_object_list = copy.deepcopy(
+            self.system_particle_object_list
+        )
+        new_model.input_flows_g_s, new_model.input_flows_num_s = generate_input_flows(
+            new_model
+        )
+        new_model.PartMass_t0 = generate_PartMass_t0(
+            new_model.system_particle_object_list, new_model.input_flows_g_s
+        )
+        new_model.particle_table = copy.deepcopy(self.particle_table)
+        new_model.R = steady_state_results(
+            new_model.system_particle_object_list,
+            SteadyStateResults,
+            new_model.particle_table,
+        )
+
+        return new_model
+
     def summarize(self):
         """Prints a summary of the model's key parameters."""
         print(f"Model: UTOPIA")
@@ -336,9 +543,11 @@ class utopiaModel:
         print_fragmentation_style(self.FI)
         print("Fragmetation timescale (days): ", self.t_frag_gen_FreeSurfaceWater)
         print("Discorporation timescale (days): ", self.t_half_deg_free)
-        for compartment, size_fractions in self.emiss_dict_g_s.items():
-            for fraction, value in size_fractions.items():
-                if value > 0:
-                    print(
-                        f"Emissions to {compartment} for size fraction {self.size_dict[fraction]} {chr(181)}m: {value} g/s"
-                    )
+        for box, box_emissions in emissions_by_box(self, self.emiss_dict_g_s).items():
+            for compartment, size_fractions in box_emissions.items():
+                for fraction, value in size_fractions.items():
+                    if value > 0:
+                        print(
+                            f"Emissions to {compartment} for size fraction {self.size_dict[fraction]} {chr(181)}m: {value} g/s"
+                            + (f" (box {box})" if len(self.boxNames_list) > 1 else "")
+                        )
@@ -0,0 +1,13 @@
+import subprocess
+import sys
+import textwrap
+
+
+def run_script(script):
+    """Runs a Python script in a fresh interpreter and returns the last line it prints"""
+    return subprocess.run(
+        [sys.executable, "-c", textwrap.dedent(script)],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.splitlines()[-1]
@@ -0,0 +1,47 @@
+import numpy as np
+from scipy.sparse import linalg as sparse_linalg
+from utopia.utopia import utopiaModel
+from utopia.preprocessing.fill_interactions_df import fillInteractions_fun_OOP_sparse
+
+
+def test_adjoint_sensitivities_match_finite_differences():
+    model = utopiaModel(config=None, data=None)
+    model.run()
+
+    rc_sensitivities, emission_sensitivities = model.sensitivities("Sediment_Ocean")
+    n_entries = sum(
+        len(v) if type(v) == list else 1
+        for p in model.system_particle_object_list
+        for v in p.RateConstants.values()
+    )
+    assert len(rc_sensitivities) == n_entries
+
+    sediment = model.species_index.select(compartment="Sediment_Ocean")
+    output = model.R["mass_g"].to_numpy()[sediment].sum()
+    emissions = np.zeros(len(model.SpeciesList))
+    for sp, q_mass_g_s in model.input_flows_g_s.items():
+        emissions[model.species_index.position[sp]] = q_mass_g_s
+
+    # The steady state is linear in the emissions
+    assert np.isclose(emission_sensitivities @ emissions, output, rtol=1e-10)
+
+    largest = rc_sensitivities["elasticity"].abs().sort_values(ascending=False)
+    for idx in largest.index[:5]:
+        row = rc_sensitivities.loc[idx]
+        p = model.system_particle_object_list[model.species_index.position[row.species]]
+        original = p.RateConstants[row.rate_constant]
+        h = 1e-5 * row.value
+        if row.position >= 0:
+            perturbed = list(original)
+            perturbed[row.position] += h
+        else:
+            perturbed = original + h
+        p.RateConstants[row.rate_constant] = perturbed
+        K, _ = fillInteractions_fun_OOP_sparse(
+            model.system_particle_object_list, model.SpeciesList, model.dict_comp
+        )
+        p.RateConstants[row.rate_constant] = original
+
+        mass = sparse_linalg.spsolve(K.tocsc(), -emissions)
+        finite_difference = (mass[sediment].sum() - output) / h
+        assert np.isclose(row.derivative, finite_difference, rtol=1e-3)
@@ -0,0 +1,108 @@
+import numpy as np
+from utopia.solver_dynamic import ExponentialPropagator
+from utopia.utopia import utopiaModel
+
+
+def test_dynamic_solver_reaches_steady_state():
+    model = utopiaModel(config=None, data=None)
+    model.run()
+
+    config = utopiaModel.load_json_file("data/default_config.json")
+    config["solver"] = "Dynamic"
+    config["simulation_time_days"] = 365 * 1e6
+    config["n_output_times"] = 5
+    dynamic_model = utopiaModel(config=config, data=None)
+    dynamic_model.run()
+
+    assert dynamic_model.mass_timeseries_g.shape == (5, len(model.SpeciesList))
+    assert np.allclose(
+        dynamic_model.mass_timeseries_g.iloc[-1], model.R["mass_g"], rtol=1e-4, atol=1e-6
+    )
+    assert np.allclose(
+        dynamic_model.number_timeseries.iloc[-1],
+        model.R["number_of_particles"],
+        rtol=1e-4,
+        atol=1e-6,
+    )
+
+
+def test_expm_dynamic_solver_matches_steady_state_and_bdf():
+    model = utopiaModel(config=None, data=None)
+    model.run()
+
+    config = utopiaModel.load_json_file("data/default_config.json")
+    config["solver"] = "Dynamic"
+    config["simulation_time_days"] = 3650
+    config["n_output_times"] = 11
+    bdf_model = utopiaModel(config=config, data=None)
+    bdf_model.run()
+
+    config["dynamic_method"] = "expm"
+    expm_model = utopiaModel(config=config, data=None)
+    expm_model.run()
+
+    # All output intervals have the same length so a single propagator is computed
+    assert len(expm_model.exponential_propagator.propagators) == 1
+    assert np.allclose(
+        expm_model.mass_timeseries_g,
+        bdf_model.mass_timeseries_g,
+        rtol=1e-3,
+        atol=1e-6 * bdf_model.mass_timeseries_g.to_numpy().max(),
+    )
+
+    # Many scenarios (columns) are propagated at once and tend to the steady state
+    emissions = np.column_stack(
+        [np.zeros(len(model.SpeciesList)), model.R["mass_g"] * 0]
+    )
+    emissions[:, 0] = -(model.interactions_df.to_numpy() @ model.R["mass_g"].to_numpy())
+    mass_t = expm_model.exponential_propagator.propagate(
+        np.zeros_like(emissions), [emissions], [365 * 86400 * 1e6]
+    )
+    assert np.allclose(mass_t[-1][:, 0], model.R["mass_g"], rtol=1e-6, atol=1e-9)
+    assert np.allclose(mass_t[-1][:, 1], 0)
+
+
+def test_sparse_propagator_matches_dense_propagator():
+    rng = np.random.default_rng(0)
+    n_species = 30
+    K = rng.random((n_species, n_species)) * (rng.random((n_species, n_species)) < 0.2)
+    np.fill_diagonal(K, 0)
+    K -= np.diag(K.sum(axis=0) + rng.random(n_species))
+    m_t0 = rng.random((n_species, 2))
+    emissions = rng.random((n_species, 2))
+
+    dense = ExponentialPropagator(K)
+    sparse = ExponentialPropagator(K, dense_max_species=0)
+    assert dense.dense and not sparse.dense
+
+    for dt_s in [0.1, 1.0, 10.0]:
+        assert np.allclose(
+            sparse.step(m_t0, emissions, dt_s),
+            dense.step(m_t0, emissions, dt_s),
+            rtol=1e-10,
+        )
+        assert np.allclose(
+            sparse.step(m_t0[:, 0], emissions[:, 0], dt_s),
+            dense.step(m_t0[:, 0], emissions[:, 0], dt_s),
+            rtol=1e-10,
+        )
+    assert not sparse.propagators
+
+
+def test_propagator_of_zero_matrix_and_zero_interval():
+    n_species = 4
+    m_t0 = np.arange(n_species, dtype=float)
+    emissions = np.ones(n_species)
+
+    for propagator in [
+        ExponentialPropagator(np.zeros((n_species, n_species))),
+        ExponentialPropagator(np.zeros((n_species, n_species)), dense_max_species=0),
+    ]:
+        # Without interactions the mass grows with the emissions
+        assert np.allclose(propagator.step(m_t0, emissions, 10.0), m_t0 + 10.0)
+        assert np.array_equal(propagator.step(m_t0, emissions, 0.0), m_t0)
+
+    K = -np.eye(n_species)
+    propagator = ExponentialPropagator(K)
+    assert np.array_equal(propagator.step(m_t0, emissions, 0.0), m_t0)
+    assert 0.0 not in propagator.propagators
@@ -0,0 +1,29 @@
+from helpers import run_script
+
+# Modules the core path (model build and solve) must not import
+HEAVY_MODULES = ["matplotlib", "seaborn", "fpdf", "scipy.integrate"]
+
+# Modules that importing the model must not load (scipy is only imported when the model is built or solved)
+IMPORT_HEAVY_MODULES = HEAVY_MODULES + ["scipy"]
+
+
+def test_import_does_not_load_heavy_modules():
+    output = run_script(f"""
+        import sys
+        import utopia.utopia
+
+        print([m for m in {IMPORT_HEAVY_MODULES} if m in sys.modules])
+        """)
+    assert output == "[]"
+
+
+def test_model_run_does_not_import_plotting():
+    output = run_script(f"""
+        import sys
+        from utopia.utopia import utopiaModel
+
+        model = utopiaModel(config=None, data=None)
+        model.run()
+        print([m for m in {HEAVY_MODULES} if m in sys.modules])
+        """)
+    assert output == "[]"
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from utopia.utopia import utopiaModel
+from utopia.incremental_update import parameter_processes
+
+
+@pytest.mark.parametrize(
+    "solver, engine",
+    [("SteadyStateSparse", "vectorized"), ("SteadyState", "loop")],
+)
+def test_update_parameters_matches_full_rebuild(solver, engine):
+    config = utopiaModel.load_json_file("data/default_config.json")
+    config["solver"] = solver
+    config["rate_constants_engine"] = engine
+    model = utopiaModel(config=config, data=None)
+    model.run()
+
+    for parameters in [
+        {"t_half_deg_free": 6600},
+        {"FI": 0.8},
+        {"MPdensity_kg_m3": 1380},
+    ]:
+        model.update_parameters(parameters)
+
+        data = utopiaModel.load_json_file("data/default_data.json")
+        data.update(model.data)
+        reference = utopiaModel(config=config, data=data)
+        reference.run()
+
+        assert np.array_equal(
+            model.interactions_df.to_numpy(), reference.interactions_df.to_numpy()
+        )
+        assert np.allclose(model.R["mass_g"], reference.R["mass_g"], rtol=1e-10)
+
+
+def test_parameter_dependencies():
+    model = utopiaModel(config=None, data=None)
+    model.run()
+
+    assert parameter_processes(model, ["t_half_deg_free"]) == ["discorporation"]
+    assert parameter_processes(model, ["FI"]) == ["fragmentation"]
+    assert "settling" in parameter_processes(model, ["MPdensity_kg_m3"])
+    assert "discorporation" not in parameter_processes(model, ["MPdensity_kg_m3"])
+
+    # Only the diagonal (losses) changes with the discorporation rate constants
+    K = model.interactions_df.to_numpy().copy()
+    model.update_parameters({"t_half_deg_free": 6600})
+    changed = model.interactions_df.to_numpy() != K
+    assert changed.any()
+    assert not (changed & ~np.eye(len(K), dtype=bool)).any()
+
+    with pytest.raises(KeyError):
+        model.update_parameters({"t_half": 6600})
+
+
+def test_update_parameters_rejects_inputs_it_cannot_update():
+    data = utopiaModel.load_json_file("data/default_data.json")
+    model = utopiaModel(config=None, data=data)
+    model.run()
+
+    for parameters in [
+        {"MP_composition": "PP"},
+        {"emiss_dict_g_s": {}},
+        {"t_half_deg_free": "long"},
+    ]:
+        with pytest.raises(ValueError, match="model parameter"):
+            model.update_parameters(parameters)
+
+    # The data given to the model is not modified by the updates
+    t_half_deg_free = data["t_half_deg_free"]
+    model.update_parameters({"t_half_deg_free": 6600})
+    assert model.data["t_half_deg_free"] == 6600
+    assert data["t_half_deg_free"] == t_half_deg_free
@@ -0,0 +1,51 @@
+from helpers import run_script
+
+
+def test_numeric_processing_does_not_import_matplotlib():
+    output = run_script(
+        """
+        import sys
+        from utopia.utopia import utopiaModel
+        from utopia.results_processing.process_results import ResultsProcessor
+
+        model = utopiaModel(config=None, data=None)
+        model.run()
+        processor = ResultsProcessor(model)
+        processor.process_all(plots=False)
+        results = processor.processed_results
+        assert "fraction_heatmaps" not in results
+        assert "emission_fractions_mass_figure" not in results
+        assert len(results["results_by_comp"]) == 17
+        print("matplotlib" in sys.modules, "seaborn" in sys.modules)
+        """
+    )
+    assert output == "False False"
+
+
+def test_lazy_figures():
+    output = run_script(
+        """
+        import sys
+        import matplotlib
+
+        matplotlib.use("Agg")
+        from utopia.utopia import utopiaModel
+        from utopia.results_processing.process_results import ResultsProcessor
+
+        model = utopiaModel(config=None, data=None)
+        model.run()
+        processor = ResultsProcessor(model)
+        processor.process_all(plots="lazy")
+        results = processor.processed_results
+        built_before = "matplotlib.pyplot" in sys.modules
+        heatmaps = results["fraction_heatmaps"]
+        assert set(heatmaps) == {"mass_fraction", "number_fraction"}
+        assert heatmaps.pending.keys() == {"mass_fraction", "number_fraction"}
+        figure = heatmaps["mass_fraction"]
+        assert heatmaps["mass_fraction"] is figure
+        assert list(heatmaps.pending) == ["number_fraction"]
+        assert "emission_fractions_mass_figure" in results
+        print(built_before, type(figure).__name__)
+        """
+    )
+    assert output == "False Figure"
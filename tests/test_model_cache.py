@@ -0,0 +1,64 @@
+import numpy as np
+from utopia.utopia import utopiaModel
+from utopia.model_cache import InteractionsCache, get_cache, model_inputs_key
+
+
+def cached_config(**options):
+    config = utopiaModel.load_json_file("data/default_config.json")
+    config["solver"] = "SteadyStateSparse"
+    config["use_cache"] = True
+    config.update(options)
+    return config
+
+
+def test_cache_hit_for_new_emissions(tmp_path):
+    config = cached_config(cache_dir=str(tmp_path))
+    cache = get_cache(config)
+    model = utopiaModel(config=config, data=None)
+    model.run()
+    key = model_inputs_key(model)
+    assert key in cache and cache.entries[key]["interactions_lu"] is not None
+    R = model.R.copy()
+
+    data = utopiaModel.load_json_file("data/default_data.json")
+    data["emiss_dict_g_s"]["Air"]["c"] = 10
+    hits = cache.hits
+    cached_model = utopiaModel(config=config, data=data)
+    cached_model.run()
+    assert cache.hits == hits + 1
+    assert model_inputs_key(cached_model) == key
+    assert cached_model.interactions_lu is cache.entries[key]["interactions_lu"]
+    # The particle objects are not shared between models
+    assert model.R.equals(R)
+    assert model.system_particle_object_list[0] is not (
+        cached_model.system_particle_object_list[0]
+    )
+
+    reference = utopiaModel(config=cached_config(use_cache=False), data=data)
+    reference.run()
+    assert np.allclose(cached_model.R.to_numpy(), reference.R.to_numpy(), rtol=1e-12)
+
+    # On-disk entries are found by a new cache
+    disk_cache = InteractionsCache(cache_dir=tmp_path)
+    entry = disk_cache.get(key)
+    assert entry is not None and entry["interactions_lu"] is None
+
+
+def test_cache_key_and_eviction():
+    model = utopiaModel(config=cached_config(), data=None)
+    key = model_inputs_key(model)
+
+    data = utopiaModel.load_json_file("data/default_data.json")
+    data["t_half_deg_free"] = 6600
+    assert model_inputs_key(utopiaModel(config=cached_config(), data=data)) != key
+    data = utopiaModel.load_json_file("data/default_data.json")
+    data["emiss_dict_g_s"]["Air"]["e"] = 1
+    assert model_inputs_key(utopiaModel(config=cached_config(), data=data)) == key
+
+    cache = InteractionsCache(maxsize=2)
+    for k in ["a", "b", "c"]:
+        cache.add(k, {})
+    assert list(cache.entries) == ["b", "c"]
+    cache.get("b")
+    cache.add("d", {})
+    assert list(cache.entries) == ["b", "d"]
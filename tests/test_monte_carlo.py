@@ -0,0 +1,53 @@
+import numpy as np
+from utopia.utopia import utopiaModel
+from utopia.monte_carlo import sample_parameters, run_monte_carlo
+
+
+def test_sample_parameters():
+    samples = sample_parameters(
+        {
+            "FI": {"distribution": "uniform", "loc": 0, "scale": 1},
+            "t_half_deg_free": {"distribution": "lognorm", "s": 0.5, "scale": 66000},
+            "MPdensity_kg_m3": [980, 1050, 1380],
+        },
+        n_samples=3,
+        seed=1,
+    )
+    assert list(samples.columns) == ["FI", "t_half_deg_free", "MPdensity_kg_m3"]
+    assert len(samples) == 3
+    assert samples["FI"].between(0, 1).all()
+    assert (samples["t_half_deg_free"] > 0).all()
+
+    again = sample_parameters(
+        {"FI": {"distribution": "uniform", "loc": 0, "scale": 1}}, 3, seed=1
+    )
+    assert np.array_equal(again["FI"], samples["FI"])
+
+
+def test_monte_carlo_matches_full_runs(tmp_path):
+    samples = sample_parameters(
+        {
+            "FI": [0.2, 0.9, 0.5],
+            "MPdensity_kg_m3": [980, 1380, 1050],
+            "t_frag_gen_FreeSurfaceWater": [36.5, 365, 3650],
+        },
+        n_samples=3,
+    )
+    results = run_monte_carlo(
+        samples, n_workers=2, chunk_size=2, output_file=tmp_path / "mass.npy"
+    )
+    assert results.mass_g.shape == (3, len(results.SpeciesList))
+    assert np.array_equal(np.load(tmp_path / "mass.npy"), results.mass_g)
+
+    for i, parameters in samples.iterrows():
+        data = utopiaModel.load_json_file("data/default_data.json")
+        data.update(parameters.to_dict())
+        model = utopiaModel(config=None, data=data)
+        model.run()
+        assert np.allclose(results.mass_g[i], model.R["mass_g"], rtol=1e-8)
+
+    mass_comp = results.mass_by_compartment()
+    assert np.allclose(mass_comp.sum(axis=1), results.mass_g.sum(axis=1))
+
+    serial_results = run_monte_carlo(samples, n_workers=1)
+    assert np.allclose(serial_results.mass_g, results.mass_g, rtol=1e-12)
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+from utopia.utopia import utopiaModel
+from utopia.preprocessing.fill_interactions_df import fillInteractions_fun_OOP
+
+
+def river_sections_config(n_boxes, solver="SteadyStateSparse"):
+    config = utopiaModel.load_json_file("data/default_config.json")
+    boxes = [f"RS{i}" for i in range(n_boxes)]
+    config["boxes"] = boxes
+    config["boxName"] = boxes[0]
+    config["solver"] = solver
+    config["box_connectivity"] = [
+        {
+            "from_box": boxes[i],
+            "to_box": boxes[i + 1],
+            "compartment": comp,
+            "flow_m3_s": flow_m3_s,
+        }
+        for i in range(n_boxes - 1)
+        for comp, flow_m3_s in [
+            ("Surface_Freshwater", 100.0),
+            ("Bulk_Freshwater", 100.0),
+            ("Sediment_Freshwater", 1e-3),
+        ]
+    ]
+    return config
+
+
+def test_multibox_interactions_matrix():
+    model = utopiaModel(config=river_sections_config(3), data=None)
+    model.run()
+
+    n_species = len(model.SpeciesList) // 3
+    assert len(model.SpeciesList) == 3 * n_species
+    assert model.matrix_assembly == "sparse"
+
+    # The sparse (block) assembly gives the same matrix as the dense one
+    interactions_df = fillInteractions_fun_OOP(
+        model.system_particle_object_list, model.SpeciesList, model.dict_comp
+    )
+    K = model.interactions_matrix.toarray()
+    assert np.array_equal(interactions_df.to_numpy(), K)
+
+    # Only downstream transport between consecutive river sections
+    assert not K[:n_species, n_species:].any()
+    assert not K[2 * n_species :, :n_species].any()
+    assert K[n_species : 2 * n_species, :n_species].any()
+
+    sediment = model.species_index.compartment_names.index("Sediment_Freshwater")
+    sp2, sp1 = [
+        model.system_particle_object_list[model.species_index.lookup(0, 0, sediment, box)]
+        for box in [0, 1]
+    ]
+    assert sp2.Pcompartment.Cname == sp1.Pcompartment.Cname == "Sediment_Freshwater"
+    assert sp2.RateConstants["k_box_transport"] == pytest.approx(
+        1e-3 / float(sp2.Pcompartment.Cvolume_m3)
+    )
+    assert K[sp1.Pindex, sp2.Pindex] == sp2.RateConstants["k_box_transport"]
+
+    # Emissions given per compartment go to the first box and are transported downstream
+    R = model.R["mass_g"]
+    box_mass = [R[R.index.str.endswith(f"_RS{i}")].sum() for i in range(3)]
+    assert box_mass[0] > box_mass[1] > box_mass[2] > 0
+
+
+def test_multibox_without_connectivity_matches_single_box():
+    model = utopiaModel(config=None, data=None)
+    model.run()
+
+    config = river_sections_config(2)
+    config["box_connectivity"] = None
+    data = utopiaModel.load_json_file("data/default_data.json")
+    data["emiss_dict_g_s"] = {
+        "RS0": model.emiss_dict_g_s,
+        "RS1": model.emiss_dict_g_s,
+    }
+    multibox_model = utopiaModel(config=config, data=data)
+    multibox_model.run()
+
+    for box in ["RS0", "RS1"]:
+        box_R = multibox_model.R[multibox_model.R.index.str.endswith("_" + box)]
+        assert np.allclose(box_R["mass_g"].to_numpy(), model.R["mass_g"].to_numpy())
+
+
+def test_box_connectivity_unknown_box():
+    config = river_sections_config(2)
+    config["box_connectivity"][0]["to_box"] = "RS5"
+    with pytest.raises(ValueError):
+        utopiaModel(config=config, data=None).run()
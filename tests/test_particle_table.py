@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utopia.utopia import utopiaModel
+from utopia.solver_steady_state import steady_state_results
+
+
+def test_particle_table_matches_particle_objects():
+    model = utopiaModel(config=None, data=None)
+    model.run()
+
+    table = model.particle_table
+    assert len(table) == len(model.SpeciesList)
+    assert list(table.to_dataframe().index) == model.SpeciesList
+
+    for p, view in zip(model.system_particle_object_list, table):
+        assert view.Pcode == p.Pcode
+        assert view.Pform == p.Pform
+        assert view.Pindex == p.Pindex
+        assert view.Pcomp_index == p.Pcomp_index
+        assert view.Pvolume_m3 == p.Pvolume_m3
+        assert view.Pdensity_kg_m3 == p.Pdensity_kg_m3
+        assert view.Cvolume_m3 == float(p.Pcompartment.Cvolume_m3)
+        assert view.Pmass_g_SS == pytest.approx(p.Pmass_g_SS, rel=1e-12)
+        assert view.Pnum_SS == pytest.approx(p.Pnum_SS, rel=1e-12)
+        assert view.C_num_m3_SS == pytest.approx(p.C_num_m3_SS, rel=1e-12)
+
+    assert np.allclose(table.mass_SS, model.R["mass_g"].to_numpy(), rtol=1e-12)
+    assert np.allclose(
+        table.num_SS, model.R["number_of_particles"].to_numpy(), rtol=1e-12
+    )
+    assert table["eA0_Utopia"].Pcode == "eA0_Utopia"
+
+    view = table[0]
+    view.Pmass_g_SS = 1.0
+    assert table.mass_SS[0] == 1.0
+    with pytest.raises(AttributeError):
+        view.Pcode = "aA0_Utopia"
+
+
+def test_steady_state_results_with_and_without_particle_table():
+    model = utopiaModel(config=None, data=None)
+    model.run()
+
+    R = steady_state_results(model.system_particle_object_list, model.R["mass_g"])
+    pd.testing.assert_frame_equal(R, model.R, rtol=1e-12)
+
+    model.update_parameters({"MPdensity_kg_m3": 1500})
+    p = model.system_particle_object_list[-1]
+    assert model.particle_table[-1].Pdensity_kg_m3 == p.Pdensity_kg_m3
+    assert model.particle_table[-1].Pnum_SS == pytest.approx(p.Pnum_SS, rel=1e-12)
+    assert np.allclose(
+        model.R["number_of_particles"].to_numpy(), model.particle_table.num_SS
+    )
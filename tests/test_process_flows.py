@@ -0,0 +1,145 @@
+import numpy as np
+import pytest
+from utopia.utopia import utopiaModel
+from utopia.results_processing.process_results import ResultsProcessor
+from utopia.helpers import process_flows_comp
+from utopia.results_processing.exposure_indicators_calculation import (
+    Exposure_indicators_calculation,
+)
+
+
+def test_flow_tables_match_rate_constants():
+    model = utopiaModel(config=None, data=None)
+    model.run()
+    processor = ResultsProcessor(model)
+    processor.estimate_flows()
+
+    flows = processor.process_flows
+    assert flows.mass.shape == (len(model.SpeciesList), len(flows.columns))
+    assert flows.columns.get_level_values(0).tolist().count("k_dry_deposition") == 6
+
+    for p in model.system_particle_object_list:
+        table = processor.tables_outputFlows_mass[p.Pcompartment.Cname]
+        assert list(table.columns) == list(p.RateConstants)
+        for process, k in p.RateConstants.items():
+            value = table.loc[p.Pcode, process]
+            if isinstance(k, list):
+                assert value == pytest.approx([r * p.Pmass_g_SS for r in k])
+            else:
+                assert value == pytest.approx(k * p.Pmass_g_SS)
+
+    # Deposition flows from air to each surface compartment
+    air = [
+        p for p in model.system_particle_object_list if p.Pcompartment.Cname == "Air"
+    ]
+    for comp in ["Ocean_Surface_Water", "Impacted_Soil_Surface"]:
+        position = processor.surfComp_list.index(comp)
+        inflows = processor.tables_inputFlows_number[comp]
+        for p in air:
+            assert inflows.loc[p.Pcode, "k_wet_deposition"] == pytest.approx(
+                p.RateConstants["k_wet_deposition"][position] * p.Pnum_SS
+            )
+
+    # Mixing of the ocean mixed water to the surface and column water
+    mixing = flows.to_dataframe("mass")["k_mixing"]
+    omw = [
+        p
+        for p in model.system_particle_object_list
+        if p.Pcompartment.Cname == "Ocean_Mixed_Water"
+    ]
+    for comp, position in [("Ocean_Surface_Water", 0), ("Ocean_Column_Water", 1)]:
+        codes = [p.Pcode for p in omw]
+        assert np.allclose(
+            processor.tables_inputFlows_mass[comp].loc[codes, "k_mixing"],
+            mixing.loc[codes, position],
+        )
+
+
+def test_inflows_from_process_matrices():
+    model = utopiaModel(config=None, data=None)
+    model.run()
+    processor = ResultsProcessor(model)
+    processor.estimate_flows()
+    processor.generate_flows_dict()
+    processor.process_results()
+
+    # The process matrices add up to the off-diagonal part of the interactions matrix
+    total = sum(processor.process_matrices.values()).toarray()
+    interactions = model.interactions_df.to_numpy()
+    off_diagonal = interactions - np.diag(np.diag(interactions))
+    assert np.allclose(total, off_diagonal, rtol=1e-12, atol=0)
+
+    mass_g = model.R["mass_g"].to_numpy()
+    inflows = processor.Results_extended["inflows_g_s"]
+    for i, code in enumerate(model.SpeciesList):
+        received = sum(v for k, v in inflows[code].items() if k != "Emission_flow")
+        assert received == pytest.approx(off_diagonal[i] @ mass_g, rel=1e-9, abs=1e-30)
+    assert (
+        inflows["eA0_Utopia"]["Emission_flow"]
+        == model.emiss_dict_g_s["Ocean_Surface_Water"]["e"]
+    )
+
+
+def test_results_by_compartment():
+    model = utopiaModel(config=None, data=None)
+    model.run()
+    processor = ResultsProcessor(model)
+    processor.estimate_flows()
+    processor.generate_flows_dict()
+    processor.process_results()
+    processor.extract_results_by_compartment()
+
+    results = processor.Results_extended
+    by_comp = processor.results_by_comp.set_index("Compartments")
+    assert list(by_comp.index) == list(model.dict_comp)
+    assert by_comp["%_mass"].sum() == pytest.approx(100)
+    for comp in model.dict_comp:
+        comp_results = results[results["Compartment"] == comp]
+        assert by_comp.loc[comp, "mass_g"] == pytest.approx(
+            comp_results["mass_g"].sum()
+        )
+        assert by_comp.loc[comp, "Concentration_num_m3"] == pytest.approx(
+            comp_results["concentration_num_m3"].sum()
+        )
+        for column, flow_type, flows_dict in [
+            ("inflows_g_s", "input_flows", processor.flows_dict_mass),
+            ("outflows_num_s", "output_flows", processor.flows_dict_number),
+        ]:
+            expected = process_flows_comp(comp, flow_type, flows_dict)
+            assert list(by_comp.loc[comp, column]) == list(expected)
+            assert list(by_comp.loc[comp, column].values()) == pytest.approx(
+                list(expected.values())
+            )
+
+
+def test_exposure_indicators_by_size():
+    model = utopiaModel(config=None, data=None)
+    model.run()
+    processor = ResultsProcessor(model)
+    processor.estimate_flows()
+    processor.generate_flows_dict()
+    processor.process_results()
+    _, size_indicators = Exposure_indicators_calculation(processor)
+
+    flows = processor.process_flows
+    fragmentation = flows.process_totals("mass", "k_fragmentation")
+    for p, total in zip(model.system_particle_object_list, fragmentation):
+        assert total == pytest.approx(
+            sum(p.RateConstants["k_fragmentation"]) * p.Pmass_g_SS
+        )
+
+    # Persistence of the largest size class within the system boundaries
+    inside = [
+        p
+        for p in model.system_particle_object_list
+        if p.Pcompartment.Cname not in ["Ocean_Column_Water", "Sediment_Ocean"]
+        and model.size_codes[p.Psize_index] == "e"
+    ]
+    loss = sum(
+        (sum(p.RateConstants["k_fragmentation"]) + p.RateConstants["k_discorporation"])
+        * p.Pmass_g_SS
+        for p in inside
+    )
+    Pov_years = sum(p.Pmass_g_SS for p in inside) / loss / 86400 / 365
+    assert size_indicators["Size (um)"].tolist() == [0.5, 5, 50, 500, 5000]
+    assert size_indicators["Pov (years)"].iloc[-1] == pytest.approx(Pov_years)
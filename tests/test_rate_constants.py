@@ -0,0 +1,83 @@
+import numpy as np
+from utopia.utopia import utopiaModel
+from utopia.preprocessing.generate_rate_constants import (
+    generate_rate_constants,
+    generate_rate_constants_vectorized,
+)
+
+
+def test_vectorized_rate_constants_match_loop():
+    model = utopiaModel(config=None, data=None)
+    model.run()
+
+    generate_rate_constants(model)
+    rate_constants = {
+        p.Pcode: dict(p.RateConstants) for p in model.system_particle_object_list
+    }
+
+    generate_rate_constants_vectorized(model)
+    for p in model.system_particle_object_list:
+        assert p.RateConstants == rate_constants[p.Pcode]
+
+    assert model.rate_constants_arrays["k_fragmentation"].shape == (
+        len(model.system_particle_object_list),
+        len(model.size_codes),
+    )
+
+
+def test_settling_velocity_arrays_match_scalar_functions():
+    from utopia.preprocessing.rc_settling import (
+        calculate_settling_velocity,
+        calculate_rising_velocity,
+        calculate_settling_velocity_array,
+        calculate_rising_velocity_array,
+    )
+
+    # Diameters covering the Stokes, intermediate and Newton regimes
+    d_p = np.array([1e-7, 1e-5, 5e-4, 2e-3, 2e-2, 2e-2, 5e-4])
+    rho_p = np.array([1500, 980, 1100, 2500, 2500, 900, 900])
+    rho_f = np.array([998, 1026.2, 998, 1026.2, 998, 998, 1026.2])
+    mu = 0.9764e-3
+
+    v_s = calculate_settling_velocity_array(d_p, rho_p, rho_f, mu)
+    v_r = calculate_rising_velocity_array(d_p, rho_p, rho_f, mu)
+
+    assert v_s.shape == d_p.shape
+    assert np.allclose(
+        v_s,
+        [calculate_settling_velocity(*x, mu) for x in zip(d_p, rho_p, rho_f)],
+        rtol=1e-12,
+        atol=0,
+    )
+    assert np.allclose(
+        v_r,
+        [calculate_rising_velocity(*x, mu) for x in zip(d_p, rho_p, rho_f)],
+        rtol=1e-12,
+        atol=0,
+    )
+
+
+def test_cached_dry_deposition_settling_velocities():
+    from utopia.preprocessing import dry_deposition_MS
+    from utopia.preprocessing.dry_deposition_MS import (
+        ReynoldsNumberFromStokes,
+        kineticCstdrySettlingNewtonSphere,
+        get_settling,
+        cached_settling_velocities,
+    )
+
+    d = np.array([1e-7, 5e-6, 5e-5, 5e-4, 5e-6])
+    rho = np.array([980, 1580, 1580, 1100, 1580])
+
+    expected = []
+    for d_i, rho_i in zip(d, rho):
+        Rep = ReynoldsNumberFromStokes(d_i, rho_i)
+        initial_Settling = kineticCstdrySettlingNewtonSphere(d_i, rho_i, Rep)
+        expected.append(float(get_settling(initial_Settling, d_i, rho_i, Rep)))
+
+    dry_deposition_MS.settling_velocity_cache.clear()
+    v = cached_settling_velocities(d, rho)
+    assert np.array_equal(v, expected)
+    # Repeated pairs are solved once
+    assert len(dry_deposition_MS.settling_velocity_cache) == 4
+    assert cached_settling_velocities(d[1], rho[1]) == expected[1]
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+from utopia.utopia import utopiaModel
+from utopia.results_processing.process_results import ResultsProcessor
+from utopia.results_processing.exposure_indicators_calculation import (
+    Exposure_indicators_calculation,
+)
+from utopia.sensitivity import (
+    evaluate_design,
+    saltelli_design,
+    morris_design,
+    run_sensitivity_analysis,
+)
+
+
+def test_outputs_match_full_runs():
+    design = pd.DataFrame(
+        {
+            "FI": [0.2, 0.2, 0.7],
+            "t_half_deg_free": [66000, 66000, 6600],
+            "emiss_dict_g_s.Air.c": [5.0, 0.0, 1.0],
+        }
+    )
+    outputs = evaluate_design(design, n_workers=1)
+
+    for i, row in design.iterrows():
+        data = utopiaModel.load_json_file("data/default_data.json")
+        data["FI"] = row["FI"]
+        data["t_half_deg_free"] = row["t_half_deg_free"]
+        data["emiss_dict_g_s"]["Air"]["c"] = row["emiss_dict_g_s.Air.c"]
+        model = utopiaModel(config=None, data=data)
+        model.run()
+
+        processor = ResultsProcessor(model)
+        processor.estimate_flows()
+        processor.generate_flows_dict()
+        processor.process_results()
+        overall_indicators, _ = Exposure_indicators_calculation(processor)
+        Pov = overall_indicators["Overall persistence (years)"]
+        Tov = overall_indicators["Overall residence time (years)"]
+        assert np.allclose(
+            outputs.loc[i, ["Pov_mass_years", "Pov_num_years"]], Pov, rtol=1e-8
+        )
+        assert np.allclose(
+            outputs.loc[i, ["Tov_mass_years", "Tov_num_years"]], Tov, rtol=1e-8
+        )
+
+        mass_comp = processor.Results_extended.groupby("Compartment")["mass_g"].sum()
+        assert np.allclose(
+            outputs.loc[i, ["mass_g_" + c for c in mass_comp.index]], mass_comp
+        )
+
+
+def test_sobol_indices():
+    bounds = {"FI": (0.1, 0.9), "emiss_dict_g_s.Ocean_Surface_Water.e": (10, 100)}
+    design = saltelli_design(bounds, 8, seed=1)
+    assert design.shape == (8 * 4, 2)
+    assert design["FI"].between(0.1, 0.9).all()
+
+    results = run_sensitivity_analysis(bounds, method="sobol", n=8, n_workers=2, seed=1)
+    assert results.outputs.shape[0] == len(design)
+    indices = results.indices_of("Pov_mass_years")
+    assert list(indices.index) == list(bounds)
+    # With a single emission source the persistence does not depend on the emission rate
+    assert indices.loc["emiss_dict_g_s.Ocean_Surface_Water.e", "ST"] < 1e-8
+    assert indices.loc["FI", "ST"] > 0.5
+
+    serial_outputs = evaluate_design(results.design, n_workers=1)
+    assert np.allclose(serial_outputs, results.outputs, rtol=1e-12, equal_nan=True)
+
+
+def test_morris_indices():
+    bounds = {
+        "t_half_deg_free": (6600, 660000),
+        "emiss_dict_g_s.Ocean_Surface_Water.e": (10, 100),
+    }
+    design = morris_design(bounds, 4, seed=2)
+    assert design.shape == (4 * 3, 2)
+
+    results = run_sensitivity_analysis(bounds, method="morris", n=4, n_workers=1, seed=2)
+    indices = results.indices_of("Pov_mass_years")
+    assert (indices["mu_star"] >= indices["mu"].abs() - 1e-12).all()
+    assert indices.loc["t_half_deg_free", "mu_star"] > 0
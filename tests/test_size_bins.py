@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from utopia.utopia import utopiaModel
+from utopia.helpers import generate_fsd_matrix, generate_size_codes
+
+
+def test_fsd_matrix_any_number_of_size_bins():
+    for FI in [0, 0.3, 0.5, 0.8, 1]:
+        fsd = generate_fsd_matrix(FI, 12)
+        assert fsd.shape == (12, 12)
+        assert np.all(fsd >= 0)
+        assert np.allclose(fsd[1:].sum(axis=1), 1)
+        assert not fsd[0].any()
+        # Particles only fragment into smaller size bins
+        assert not np.triu(fsd).any()
+        assert np.array_equal(fsd[:5, :5], generate_fsd_matrix(FI))
+        assert np.array_equal(generate_fsd_matrix(FI, 3), generate_fsd_matrix(FI)[:3, :3])
+
+
+def test_size_codes():
+    assert generate_size_codes(5) == ["a", "b", "c", "d", "e"]
+    codes = generate_size_codes(40)
+    assert len(set(codes)) == 40
+    assert codes[0] == "aa"
+
+
+def test_model_with_more_size_bins():
+    config = utopiaModel.load_json_file("data/default_config.json")
+    config["N_sizeBins"] = 7
+    config["solver"] = "SteadyStateSparse"
+    data = utopiaModel.load_json_file("data/default_data.json")
+    data["emiss_dict_g_s"]["Air"]["g"] = 10
+    model = utopiaModel(config=config, data=data)
+    model.run()
+
+    assert model.size_codes == list("abcdefg")
+    assert len(model.SpeciesList) == 7 * 4 * 17
+    assert model.residual_norm < 1e-9
+    assert np.all(model.R["mass_g"] >= 0)
+    assert model.R.loc["gA0_Utopia", "mass_g"] > 0
+    assert model.R.filter(regex="^f", axis=0)["mass_g"].sum() > 0
+
+    # Emissions to size bins that are not in the model
+    data["emiss_dict_g_s"]["Air"]["h"] = 10
+    with pytest.raises(ValueError):
+        utopiaModel(config=config, data=data).run()
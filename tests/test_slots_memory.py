@@ -0,0 +1,54 @@
+import copy
+import tracemalloc
+from utopia.utopia import utopiaModel
+from utopia.helpers import object_attributes
+
+
+def allocated_bytes(make_copies):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    copies = make_copies()
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del copies
+    return allocated
+
+
+def dict_copies(objects):
+    """Copies of the objects as instances of classes without slots (attributes stored in the instance __dict__, as before the particle and compartment classes had slots)"""
+    dict_classes = {}
+    copies = []
+    for o in objects:
+        cls = dict_classes.setdefault(type(o), type(type(o).__name__, (), {}))
+        obj = cls()
+        for name, value in object_attributes(o).items():
+            setattr(obj, name, value)
+        copies.append(obj)
+    return copies
+
+
+def slots_memory(objects):
+    """Memory (bytes) allocated by copies of the objects with slots and with their attributes stored in a __dict__. The attribute values are shared by the copies so only the per-object storage is compared"""
+    slots_bytes = allocated_bytes(lambda: [copy.copy(o) for o in objects])
+    dict_bytes = allocated_bytes(lambda: dict_copies(objects))
+    return slots_bytes, dict_bytes
+
+
+def test_slots_memory_saving():
+    # Particle objects (with rate constants and steady state results) and compartments of the solved default model (340 species)
+    model = utopiaModel(config=None, data=None)
+    model.run()
+    particles = model.system_particle_object_list
+    compartments = list({id(p.Pcompartment): p.Pcompartment for p in particles}.values())
+
+    # The 10k-species system repeats the objects of the default model (as in a spatial model of 30 boxes)
+    for n_species, objects in [
+        (340, particles + compartments),
+        (10200, (particles + compartments) * 30),
+    ]:
+        slots_bytes, dict_bytes = slots_memory(objects)
+        print(
+            f"{n_species} species: {slots_bytes / 1e6:.2f} MB with slots, "
+            f"{dict_bytes / 1e6:.2f} MB with __dict__ ({1 - slots_bytes / dict_bytes:.0%} saved)"
+        )
+        assert slots_bytes < 0.5 * dict_bytes
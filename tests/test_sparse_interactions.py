@@ -0,0 +1,60 @@
+import numpy as np
+from utopia.utopia import utopiaModel
+from utopia.preprocessing.fill_interactions_df import (
+    fillInteractions_fun_OOP,
+    fillInteractions_fun_OOP_sparse,
+)
+
+
+def test_sparse_assembly_matches_dense():
+    model = utopiaModel(config=None, data=None)
+    model.run()
+
+    interactions_df = fillInteractions_fun_OOP(
+        model.system_particle_object_list, model.SpeciesList, model.dict_comp
+    )
+    interactions_matrix, interactions_sparse_df = fillInteractions_fun_OOP_sparse(
+        model.system_particle_object_list, model.SpeciesList, model.dict_comp
+    )
+
+    assert interactions_matrix.format == "csr"
+    assert interactions_matrix.nnz == np.count_nonzero(interactions_df.to_numpy())
+    assert np.array_equal(interactions_matrix.toarray(), interactions_df.to_numpy())
+    assert list(interactions_sparse_df.index) == model.SpeciesList
+    assert list(interactions_sparse_df.columns) == model.SpeciesList
+
+
+def test_sparse_steady_state_matches_dense():
+    model = utopiaModel(config=None, data=None)
+    model.run()
+
+    config = utopiaModel.load_json_file("data/default_config.json")
+    config["solver"] = "SteadyStateSparse"
+    sparse_model = utopiaModel(config=config, data=None)
+    sparse_model.run()
+
+    assert sparse_model.residual_norm < 1e-9
+    assert sparse_model.PartMass_t0.equals(model.PartMass_t0)
+    assert list(sparse_model.R.columns) == list(model.R.columns)
+    assert np.allclose(sparse_model.R.to_numpy(), model.R.to_numpy(), rtol=1e-8)
+
+
+def test_emission_scenarios_reuse_factorization():
+    model = utopiaModel(config=None, data=None)
+    model.run()
+
+    data = utopiaModel.load_json_file("data/default_data.json")
+    data["emiss_dict_g_s"]["Ocean_Surface_Water"]["e"] = 0
+    data["emiss_dict_g_s"]["Air"]["c"] = 50
+    new_model = utopiaModel(config=None, data=data)
+    new_model.run()
+
+    masses = model.solve_emission_scenarios(
+        {"base": model.emiss_dict_g_s, "air": data["emiss_dict_g_s"]}
+    )
+    assert np.allclose(masses["base"], model.R["mass_g"], rtol=1e-8)
+    assert np.allclose(masses["air"], new_model.R["mass_g"], rtol=1e-8)
+
+    scenario_model = model.copy_with_emissions(data["emiss_dict_g_s"])
+    assert np.allclose(scenario_model.R.to_numpy(), new_model.R.to_numpy(), rtol=1e-8)
+    assert model.system_particle_object_list[0].Pmass_g_SS == model.R["mass_g"].iloc[0]
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from utopia.objects.species_index import SpeciesIndex
+from utopia.utopia import utopiaModel
+
+
+def test_species_index_matches_species_codes():
+    model = utopiaModel(config=None, data=None)
+    model.run()
+
+    species_index = model.species_index
+    assert len(species_index) == len(model.SpeciesList)
+    assert list(species_index.codes) == model.SpeciesList
+
+    positions = species_index.positions(model.SpeciesList)
+    assert np.array_equal(positions, np.arange(len(model.SpeciesList)))
+
+    size, form, compartment, box = species_index.coordinates(model.SpeciesList)
+    assert np.array_equal(species_index.lookup(size, form, compartment, box), positions)
+
+    for i, p in enumerate(model.system_particle_object_list):
+        assert p.Pindex == i
+        assert species_index.size_codes[size[i]] == p.Pcode[0]
+        assert species_index.form_codes[form[i]] == p.Pcode[1]
+        assert species_index.compartment_names[compartment[i]] == p.Pcompartment.Cname
+        assert species_index.code(size[i], form[i], compartment[i], box[i]) == p.Pcode
+
+    air = species_index.select(compartment="Air", size="a")
+    assert list(species_index.codes[air]) == [
+        p.Pcode
+        for p in model.system_particle_object_list
+        if p.Pcompartment.Cname == "Air" and p.Pcode[0] == "a"
+    ]
+
+
+def test_code_of_missing_coordinates_raises():
+    species_index = SpeciesIndex(
+        ["aA0_Utopia", "bA0_Utopia"],
+        ["a", "b"],
+        ["A", "B"],
+        ["Air"],
+        ["Utopia"],
+        [(0, 0, 0, 0), (1, 0, 0, 0)],
+    )
+    assert species_index.code(1, 0, 0) == "bA0_Utopia"
+    assert list(species_index.code([0, 1], 0, 0)) == ["aA0_Utopia", "bA0_Utopia"]
+    with pytest.raises(KeyError, match=r"\(1, 1, 0, 0\)"):
+        species_index.code(1, 1, 0)
+    with pytest.raises(KeyError, match=r"\(0, 1, 0, 0\), \(1, 1, 0, 0\)"):
+        species_index.code([0, 1, 1], 1, 0)